@@ -0,0 +1,137 @@
+"""Inverted-file (IVF) approximate nearest-neighbour index for index shards.
+
+Rows are clustered with spherical k-means; a query only scores the rows in
+its `nprobe` closest clusters. nlist (clusters) and nprobe are the recall /
+latency knobs: more probes means higher recall and slower queries. New rows
+are assigned to the existing centroids, and the shard is retrained once it
+has grown well past the size it was trained on.
+
+Pure NumPy, so it builds and runs offline.
+"""
+
+from __future__ import annotations
+
+import math
+import os
+from typing import Optional
+
+import numpy as np
+
+from row_files import append_rows, read_rows
+
+CENTROIDS_FILE = "ivf_centroids.npy"
+ASSIGNMENTS_FILE = "ivf_assignments.npy"
+# Rows used to train centroids, per cluster
+TRAIN_ROWS_PER_LIST = 64
+# Retrain once this many times the trained row count has been inserted
+RETRAIN_GROWTH = 2.0
+ASSIGN_BLOCK_ROWS = 8192
+
+
+def default_nlist(rows: int) -> int:
+    """Roughly 4 * sqrt(n) clusters (a common IVF starting point)."""
+    return max(1, min(rows, int(4 * math.sqrt(rows))))
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (matrix / norms).astype(np.float32)
+
+
+def _assign(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    assignments = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), ASSIGN_BLOCK_ROWS):
+        block = np.asarray(vectors[start : start + ASSIGN_BLOCK_ROWS], dtype=np.float32)
+        assignments[start : start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+    return assignments
+
+
+def kmeans(vectors: np.ndarray, nlist: int, iterations: int = 10, seed: int = 0) -> np.ndarray:
+    """Spherical k-means over (a sample of) unit-length rows; returns centroids."""
+    rng = np.random.default_rng(seed)
+    sample_size = min(len(vectors), nlist * TRAIN_ROWS_PER_LIST)
+    rows = np.sort(rng.choice(len(vectors), size=sample_size, replace=False))
+    sample = np.asarray(vectors[rows], dtype=np.float32)
+    centroids = sample[rng.choice(len(sample), size=nlist, replace=False)].copy()
+    for _ in range(iterations):
+        assignments = _assign(sample, centroids)
+        order = np.argsort(assignments, kind="stable")
+        counts = np.bincount(assignments, minlength=nlist)
+        sums = np.zeros_like(centroids)
+        nonempty = np.flatnonzero(counts)
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]])[nonempty]
+        sums[nonempty] = np.add.reduceat(sample[order], starts, axis=0)
+        empty = counts == 0
+        if empty.any():
+            # Re-seed empty clusters from random sample rows
+            sums[empty] = sample[rng.choice(len(sample), size=int(empty.sum()))]
+        centroids = _normalize(sums)
+    return centroids
+
+
+class IVFIndex:
+    """Centroids plus the cluster of every shard row (row-aligned, tombstones included)."""
+
+    def __init__(self, centroids: np.ndarray, assignments: np.ndarray, trained_rows: Optional[int] = None):
+        self.centroids = np.asarray(centroids, dtype=np.float32)
+        self.assignments = np.asarray(assignments, dtype=np.int32)
+        self.trained_rows = trained_rows if trained_rows is not None else len(self.assignments)
+        self._order = np.argsort(self.assignments, kind="stable").astype(np.int64)
+        counts = np.bincount(self.assignments, minlength=len(self.centroids))
+        self._offsets = np.concatenate([[0], np.cumsum(counts)])
+
+    @property
+    def nlist(self) -> int:
+        return len(self.centroids)
+
+    @classmethod
+    def train(cls, vectors: np.ndarray, nlist: Optional[int] = None, iterations: int = 10) -> "IVFIndex":
+        nlist = min(len(vectors), nlist or default_nlist(len(vectors)))
+        centroids = kmeans(vectors, nlist, iterations=iterations)
+        return cls(centroids, _assign(vectors, centroids), trained_rows=len(vectors))
+
+    def needs_retrain(self) -> bool:
+        return len(self.assignments) > self.trained_rows * RETRAIN_GROWTH
+
+    def probe(self, query: np.ndarray, nprobe: int) -> np.ndarray:
+        """Row ids in the nprobe clusters closest to the (unit-length) query."""
+        nprobe = max(1, min(nprobe, self.nlist))
+        sims = self.centroids @ query
+        lists = np.argpartition(-sims, nprobe - 1)[:nprobe]
+        rows = [self._order[self._offsets[c] : self._offsets[c + 1]] for c in lists]
+        return np.sort(np.concatenate(rows)) if rows else np.zeros(0, dtype=np.int64)
+
+    def extend(self, vectors: np.ndarray) -> "IVFIndex":
+        """Return an index with new (appended) rows assigned to existing centroids."""
+        if not len(vectors):
+            return self
+        added = _assign(vectors, self.centroids)
+        return IVFIndex(self.centroids, np.concatenate([self.assignments, added]), self.trained_rows)
+
+    def select(self, rows: list[int]) -> "IVFIndex":
+        """Return an index for a compacted shard keeping only `rows`."""
+        return IVFIndex(self.centroids, self.assignments[rows], self.trained_rows)
+
+    def save(self, path: str) -> None:
+        np.save(os.path.join(path, CENTROIDS_FILE), self.centroids)
+        np.save(os.path.join(path, ASSIGNMENTS_FILE), self.assignments)
+
+    def append(self, path: str, start: int) -> None:
+        """Append the assignments of rows from `start` on to a saved index with the same centroids."""
+        append_rows(os.path.join(path, ASSIGNMENTS_FILE), start, self.assignments[start:])
+
+    @classmethod
+    def load(
+        cls, path: str, trained_rows: Optional[int] = None, rows: Optional[int] = None
+    ) -> Optional["IVFIndex"]:
+        """Load a saved index; `rows` reads just that prefix of an appended file."""
+        try:
+            centroids = np.load(os.path.join(path, CENTROIDS_FILE))
+            assignments = read_rows(os.path.join(path, ASSIGNMENTS_FILE), rows, mmap=False)
+        except (OSError, ValueError):
+            return None
+        return cls(centroids, assignments, trained_rows=trained_rows)
+
+    def memory_bytes(self) -> int:
+        return int(self.centroids.nbytes + self.assignments.nbytes + self._order.nbytes + self._offsets.nbytes)
@@ -0,0 +1,231 @@
+"""Field-aware BM25 inverted index over index shard documents.
+
+Built from the same text the rag_index.create_*_document functions emit
+("Label: value" lines). Matches in the title line (student / org / event /
+post name) and other short descriptive fields count more than free text, and
+course codes ("CSC 101", "csc-101") and @usernames are kept as single terms so
+exact-keyword queries can be answered without an embedding call.
+"""
+
+from __future__ import annotations
+
+import math
+import re
+from collections import defaultdict
+from typing import Optional
+
+import numpy as np
+
+K1 = 1.2
+B = 0.75
+# Title line of each document type ("Student: ...", "Organization: ...")
+TITLE_LABELS = {"student", "organization", "event", "post"}
+FIELD_WEIGHTS = {
+    "name": 3.0,
+    "tags": 2.0,
+    "interests": 2.0,
+    "category": 1.5,
+    "major": 1.5,
+    "forum": 1.5,
+    "type": 1.5,
+}
+DEFAULT_FIELD_WEIGHT = 1.0
+# Score reported for hits that contain every course code / @username in the query
+EXACT_MATCH_SCORE = 0.9
+
+COURSE_CODE_RE = re.compile(r"\b([a-z]{2,5})[\s\-]?(\d{3,4}[a-z]?)\b")
+USERNAME_RE = re.compile(r"@([a-z0-9_.]{2,})")
+WORD_RE = re.compile(r"[a-z0-9]+")
+STOPWORDS = {
+    "a", "an", "and", "any", "are", "at", "be", "by", "can", "do", "does", "for", "from", "get",
+    "has", "have", "how", "i", "in", "is", "it", "know", "looking", "me", "my", "of", "on", "or",
+    "some", "someone", "that", "the", "there", "this", "to", "what", "when", "where", "who",
+    "whos", "with", "you",
+}
+
+
+def special_terms(text: str) -> list[str]:
+    """Course codes and @usernames in the text, normalised to index terms."""
+    text = (text or "").lower()
+    terms = [f"{m.group(1)}{m.group(2)}" for m in COURSE_CODE_RE.finditer(text)]
+    terms += [f"@{m.group(1).rstrip('.')}" for m in USERNAME_RE.finditer(text)]
+    return list(dict.fromkeys(terms))
+
+
+def tokenize(text: str) -> list[str]:
+    """Lowercased word terms plus course-code / username terms."""
+    text = (text or "").lower()
+    terms = special_terms(text)
+    # Words already covered by a course code or username aren't repeated
+    text = USERNAME_RE.sub(" ", COURSE_CODE_RE.sub(" ", text))
+    terms += [w for w in WORD_RE.findall(text) if w not in STOPWORDS]
+    return terms
+
+
+def parse_fields(text: str) -> dict[str, str]:
+    """Split "Label: value" lines into fields; the title line becomes `name`."""
+    fields: dict[str, str] = defaultdict(str)
+    for line in (text or "").splitlines():
+        label, sep, value = line.partition(":")
+        field = label.strip().lower()
+        if not sep or " " in field:
+            field, value = "body", line
+        elif field in TITLE_LABELS:
+            field = "name"
+        fields[field] += f" {value}"
+    return fields
+
+
+class BM25Index:
+    """BM25F-style index; rows align with the shard's node rows (None = tombstone)."""
+
+    def __init__(self, texts: list[Optional[str]]):
+        postings, lengths = _index_texts(texts, 0)
+        self._set(
+            len(texts),
+            {term: _posting(rows) for term, rows in postings.items()},
+            lengths,
+            np.array([text is not None for text in texts], dtype=bool),
+        )
+
+    def _set(self, size: int, postings: dict, lengths: np.ndarray, live: np.ndarray) -> None:
+        self.size = size
+        self._postings = postings
+        self._lengths = lengths
+        self._live = live
+        self.doc_count = int(live.sum())
+        self.avg_length = float(lengths[live].sum() / self.doc_count) if self.doc_count else 0.0
+
+    def apply(
+        self, dead_rows: list[int], dead_texts: list[Optional[str]], new_texts: list[Optional[str]]
+    ) -> "BM25Index":
+        """New index with `dead_rows` removed and `new_texts` appended as rows
+        size, size+1, ... (mirrors Shard.apply).
+
+        Only the removed and added texts are tokenized; `dead_texts` are the
+        removed rows' texts. Postings of untouched terms are shared.
+        """
+        removed: dict[str, list[int]] = defaultdict(list)
+        live = np.concatenate([self._live, np.array([text is not None for text in new_texts], dtype=bool)])
+        for row, text in zip(dead_rows, dead_texts):
+            if text is None or not self._live[row]:
+                continue
+            live[row] = False
+            for term in {term for value in parse_fields(text).values() for term in tokenize(value)}:
+                removed[term].append(row)
+        added, added_lengths = _index_texts(new_texts, self.size)
+        lengths = np.concatenate([self._lengths, added_lengths])
+        lengths[~live] = 0.0
+
+        postings = dict(self._postings)
+        for term, rows in removed.items():
+            posting_rows, tf = postings[term]
+            keep = ~np.isin(posting_rows, rows)
+            if keep.any():
+                postings[term] = (posting_rows[keep], tf[keep])
+            else:
+                del postings[term]
+        for term, rows in added.items():
+            extra = _posting(rows)
+            current = postings.get(term)
+            postings[term] = extra if current is None else (
+                np.concatenate([current[0], extra[0]]), np.concatenate([current[1], extra[1]])
+            )
+        index = object.__new__(BM25Index)
+        index._set(self.size + len(new_texts), postings, lengths, live)
+        return index
+
+    def select(self, rows: list[int]) -> "BM25Index":
+        """New index keeping only `rows`, renumbered (mirrors Shard.compact)."""
+        rows = np.asarray(rows, dtype=np.int64)
+        remap = np.full(self.size, -1, dtype=np.int32)
+        remap[rows] = np.arange(len(rows), dtype=np.int32)
+        postings = {}
+        for term, (posting_rows, tf) in self._postings.items():
+            mapped = remap[posting_rows]
+            keep = mapped >= 0
+            if keep.any():
+                postings[term] = (mapped[keep], tf[keep])
+        index = object.__new__(BM25Index)
+        index._set(len(rows), postings, self._lengths[rows], self._live[rows])
+        return index
+
+    def __len__(self) -> int:
+        return self.doc_count
+
+    def idf(self, term: str) -> float:
+        posting = self._postings.get(term)
+        df = len(posting[0]) if posting else 0
+        return math.log(1 + (self.doc_count - df + 0.5) / (df + 0.5))
+
+    def search(
+        self, query: str, top_k: int, allowed: Optional[np.ndarray] = None
+    ) -> list[tuple[int, float, float]]:
+        """Top rows as (row, bm25 score, coverage), optionally limited to
+        rows where the boolean mask `allowed` is set.
+
+        Coverage is the idf-weighted share of query terms the row contains,
+        a 0..1 confidence comparable with cosine scores.
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms or not self.doc_count or top_k <= 0:
+            return []
+        scores = np.zeros(self.size, dtype=np.float32)
+        matched = np.zeros(self.size, dtype=np.float32)
+        total_idf = 0.0
+        norm = K1 * (1 - B + B * self._lengths / (self.avg_length or 1.0))
+        for term in terms:
+            idf = self.idf(term)
+            total_idf += idf
+            posting = self._postings.get(term)
+            if not posting:
+                continue
+            rows, tf = posting
+            scores[rows] += idf * tf * (K1 + 1) / (tf + norm[rows])
+            matched[rows] += idf
+        if allowed is not None:
+            scores[~allowed] = 0.0
+        hit_rows = np.flatnonzero(scores)
+        if not len(hit_rows):
+            return []
+        k = min(top_k, len(hit_rows))
+        top = hit_rows[np.argpartition(-scores[hit_rows], k - 1)[:k]]
+        top = top[np.argsort(-scores[top])]
+        return [(int(row), float(scores[row]), float(matched[row] / total_idf)) for row in top]
+
+    def contains_all(self, row: int, terms: list[str]) -> bool:
+        for term in terms:
+            posting = self._postings.get(term)
+            if posting is None or row not in posting[0]:
+                return False
+        return True
+
+
+def _index_texts(texts: list[Optional[str]], offset: int) -> tuple[dict[str, dict[int, float]], np.ndarray]:
+    """Weighted term frequencies per row (rows numbered from `offset`) and row lengths."""
+    postings: dict[str, dict[int, float]] = defaultdict(dict)
+    lengths = np.zeros(len(texts), dtype=np.float32)
+    for i, text in enumerate(texts):
+        if text is None:
+            continue
+        row = offset + i
+        for field, value in parse_fields(text).items():
+            weight = FIELD_WEIGHTS.get(field, DEFAULT_FIELD_WEIGHT)
+            terms = tokenize(value)
+            lengths[i] += weight * len(terms)
+            for term in terms:
+                postings[term][row] = postings[term].get(row, 0.0) + weight
+    return postings, lengths
+
+
+def _posting(rows: dict[int, float]) -> tuple[np.ndarray, np.ndarray]:
+    return np.fromiter(rows.keys(), dtype=np.int32), np.fromiter(rows.values(), dtype=np.float32)
+
+
+def reciprocal_rank_fusion(rankings: list[list[str]], k: int = 60) -> dict[str, float]:
+    """Fuse ranked key lists: score(key) = sum(1 / (k + rank))."""
+    fused: dict[str, float] = defaultdict(float)
+    for ranking in rankings:
+        for rank, key in enumerate(ranking, start=1):
+            fused[key] += 1.0 / (k + rank)
+    return fused
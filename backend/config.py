@@ -13,6 +13,29 @@ class Settings:
     SUPABASE_URL: str = os.getenv("SUPABASE_URL", "")
     SUPABASE_SERVICE_KEY: str = os.getenv("SUPABASE_SERVICE_ROLE_KEY", "")
     SUPABASE_ANON_KEY: str = os.getenv("SUPABASE_ANON_KEY", "")
+    # Async PostgREST pool used by request handlers (supabase_async)
+    DB_TIMEOUT_SECONDS: float = float(os.getenv("LINK_DB_TIMEOUT_SECONDS", "10"))
+    DB_MAX_CONNECTIONS: int = int(os.getenv("LINK_DB_MAX_CONNECTIONS", "100"))
+    DB_MAX_KEEPALIVE_CONNECTIONS: int = int(os.getenv("LINK_DB_MAX_KEEPALIVE_CONNECTIONS", "20"))
+    DB_KEEPALIVE_SECONDS: float = float(os.getenv("LINK_DB_KEEPALIVE_SECONDS", "30"))
+    DB_HTTP2: bool = os.getenv("LINK_DB_HTTP2", "true").lower() == "true"
+    # Per-user (RLS) Supabase clients: how many tokens to keep, and the longest
+    # a client is kept when the token's exp is later or missing
+    RLS_CLIENT_CACHE_SIZE: int = int(os.getenv("LINK_RLS_CLIENT_CACHE_SIZE", "256"))
+    RLS_CLIENT_TTL_SECONDS: float = float(os.getenv("LINK_RLS_CLIENT_TTL_SECONDS", "3600"))
+    # Read-through cache for near-static per-university lookups (Link system
+    # profile, entity counts)
+    UNIVERSITY_CACHE_SIZE: int = int(os.getenv("LINK_UNIVERSITY_CACHE_SIZE", "1024"))
+    UNIVERSITY_CACHE_TTL_SECONDS: float = float(os.getenv("LINK_UNIVERSITY_CACHE_TTL_SECONDS", "600"))
+    # Minimum gap between purges of expired link_verified_facts rows
+    VERIFIED_FACTS_PURGE_SECONDS: float = float(os.getenv("LINK_VERIFIED_FACTS_PURGE_SECONDS", "3600"))
+    # Cross-request cache of user context bundles (profile, classes, clubs)
+    USER_CONTEXT_CACHE_SIZE: int = int(os.getenv("LINK_USER_CONTEXT_CACHE_SIZE", "2048"))
+    USER_CONTEXT_CACHE_MB: int = int(os.getenv("LINK_USER_CONTEXT_CACHE_MB", "32"))
+    USER_CONTEXT_TTL_SECONDS: float = float(os.getenv("LINK_USER_CONTEXT_TTL_SECONDS", "300"))
+    # Direct conversations by user pair (outreach fan-out)
+    DM_CONVERSATION_CACHE_SIZE: int = int(os.getenv("LINK_DM_CONVERSATION_CACHE_SIZE", "4096"))
+    DM_CONVERSATION_CACHE_TTL_SECONDS: float = float(os.getenv("LINK_DM_CONVERSATION_CACHE_TTL_SECONDS", "3600"))
 
     # Provider selection
     LLM_PROVIDER: str = os.getenv("LLM_PROVIDER", "openai")  # "openai" or "gemini"
@@ -31,6 +54,38 @@ class Settings:
     OUTREACH_HARD_CAP: int = int(os.getenv("LINK_OUTREACH_HARD_CAP", "25"))
     OUTREACH_CONFIDENCE_THRESHOLD: float = float(os.getenv("LINK_OUTREACH_CONFIDENCE_THRESHOLD", "0.75"))
     REINDEX_ON_START: bool = os.getenv("LINK_REINDEX_ON_START", "false").lower() == "true"
+    INDEX_DIR: str = os.getenv(
+        "LINK_INDEX_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "index_data")
+    )
+    MAX_LOADED_SHARDS: int = int(os.getenv("LINK_MAX_LOADED_SHARDS", "8"))
+    # Rows fetched per keyset page when streaming tables into the index
+    INDEX_PAGE_SIZE: int = int(os.getenv("LINK_INDEX_PAGE_SIZE", "500"))
+    # Change-feed sync (index_sync): poll interval (0 disables) and how far to
+    # re-read behind each watermark for transactions that commit late
+    INDEX_SYNC_INTERVAL_SECONDS: float = float(os.getenv("LINK_INDEX_SYNC_INTERVAL_SECONDS", "10"))
+    INDEX_SYNC_OVERLAP_SECONDS: float = float(os.getenv("LINK_INDEX_SYNC_OVERLAP_SECONDS", "5"))
+    # Longest the event-expiry sweeper (index_expiry) sleeps between checks (0 disables)
+    INDEX_EXPIRY_CHECK_SECONDS: float = float(os.getenv("LINK_INDEX_EXPIRY_CHECK_SECONDS", "60"))
+    # Scan a float16/int8 copy of the vectors and re-score top_k * RESCORE_FACTOR in float32
+    VECTOR_QUANTIZATION: str = os.getenv("LINK_VECTOR_QUANTIZATION", "none")  # none | float16 | int8
+    RESCORE_FACTOR: int = int(os.getenv("LINK_RESCORE_FACTOR", "4"))
+    # Approximate search: "ivf" clusters shards of at least ANN_MIN_ROWS rows; queries
+    # score the ANN_NPROBE closest of ANN_NLIST clusters (0 = about 4 * sqrt(rows))
+    ANN_MODE: str = os.getenv("LINK_ANN_MODE", "exact")  # exact | ivf
+    ANN_NLIST: int = int(os.getenv("LINK_ANN_NLIST", "0"))
+    ANN_NPROBE: int = int(os.getenv("LINK_ANN_NPROBE", "8"))
+    ANN_MIN_ROWS: int = int(os.getenv("LINK_ANN_MIN_ROWS", "5000"))
+    # Fuse BM25 keyword ranking with vector ranking (reciprocal-rank fusion)
+    HYBRID_SEARCH: bool = os.getenv("LINK_HYBRID_SEARCH", "true").lower() == "true"
+    RRF_K: int = int(os.getenv("LINK_RRF_K", "60"))
+    RETRIEVAL_CACHE_SIZE: int = int(os.getenv("LINK_RETRIEVAL_CACHE_SIZE", "512"))
+    RETRIEVAL_CACHE_TTL_SECONDS: float = float(os.getenv("LINK_RETRIEVAL_CACHE_TTL_SECONDS", "300"))
+    EMBED_BATCH_SIZE: int = int(os.getenv("LINK_EMBED_BATCH_SIZE", "100"))
+    EMBED_CONCURRENCY: int = int(os.getenv("LINK_EMBED_CONCURRENCY", "4"))
+    EMBED_MAX_RETRIES: int = int(os.getenv("LINK_EMBED_MAX_RETRIES", "5"))
+    # Empty path disables the embedding cache
+    EMBED_CACHE_PATH: str = os.getenv("LINK_EMBED_CACHE_PATH", os.path.join(INDEX_DIR, "embeddings.sqlite"))
+    EMBED_CACHE_MAX_ENTRIES: int = int(os.getenv("LINK_EMBED_CACHE_MAX_ENTRIES", "200000"))
     TEST_MODE: bool = os.getenv("TEST_MODE", "false").lower() == "true"
 
     # Admin
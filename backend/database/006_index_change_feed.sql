@@ -0,0 +1,73 @@
+-- Change feed for the RAG index (see index_sync.py)
+-- Every indexed table gets an updated_at column maintained by trigger, and
+-- hard deletes are recorded in link_index_deletions, so the sync loop can
+-- pull only what changed since its watermark.
+
+create or replace function link_touch_updated_at()
+returns trigger
+language plpgsql
+as $$
+begin
+  new.updated_at := now();
+  return new;
+end;
+$$;
+
+create table if not exists link_index_deletions (
+  id bigserial primary key,
+  table_name text not null,
+  row_id uuid not null,
+  university_id uuid,
+  deleted_at timestamptz not null default now()
+);
+
+create index if not exists link_index_deletions_university_idx
+  on link_index_deletions(university_id, deleted_at, id);
+
+create or replace function link_record_index_deletion()
+returns trigger
+language plpgsql
+as $$
+declare
+  row_university uuid;
+begin
+  if tg_table_name = 'posts' then
+    select university_id into row_university from forums where id = old.forum_id;
+  else
+    row_university := (to_jsonb(old) ->> 'university_id')::uuid;
+  end if;
+  insert into link_index_deletions (table_name, row_id, university_id)
+  values (tg_table_name, old.id, row_university);
+  return old;
+end;
+$$;
+
+do $$
+declare
+  t text;
+begin
+  foreach t in array array['profiles', 'organizations', 'events', 'link_facts', 'posts'] loop
+    execute format('alter table %I add column if not exists updated_at timestamptz not null default now()', t);
+    execute format('drop trigger if exists %I on %I', t || '_touch_updated_at', t);
+    execute format(
+      'create trigger %I before update on %I for each row execute function link_touch_updated_at()',
+      t || '_touch_updated_at', t
+    );
+    execute format('drop trigger if exists %I on %I', t || '_record_index_deletion', t);
+    execute format(
+      'create trigger %I after delete on %I for each row execute function link_record_index_deletion()',
+      t || '_record_index_deletion', t
+    );
+  end loop;
+end;
+$$;
+
+-- The sync loop filters by university and orders by (updated_at, id)
+create index if not exists profiles_university_updated_idx on profiles(university_id, updated_at, id);
+create index if not exists organizations_university_updated_idx on organizations(university_id, updated_at, id);
+create index if not exists events_university_updated_idx on events(university_id, updated_at, id);
+create index if not exists link_facts_university_updated_idx on link_facts(university_id, updated_at, id);
+create index if not exists posts_updated_idx on posts(updated_at, id);
+
+-- Deletion records only need to outlive the sync interval; prune them periodically:
+-- delete from link_index_deletions where deleted_at < now() - interval '7 days';
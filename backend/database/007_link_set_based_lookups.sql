@@ -0,0 +1,36 @@
+-- Set-based lookups for the outreach hot path
+-- supabase_client.get_classmates and list_recent_outreach_target_ids used to
+-- run one query per class / per outreach run; these functions answer each in
+-- one round trip, de-duplicated in SQL.
+
+create or replace function link_classmate_ids(p_user_id uuid, p_semester text default null)
+returns table (user_id uuid)
+language sql
+stable
+as $$
+  select distinct other.user_id
+  from user_class_enrollments mine
+  join user_class_enrollments other on other.class_id = mine.class_id
+  where mine.user_id = p_user_id
+    and (p_semester is null or mine.semester = p_semester)
+    and other.user_id <> p_user_id;
+$$;
+
+-- Targets in order of first contact
+create or replace function link_recent_outreach_target_ids(p_requester_user_id uuid, p_since timestamptz)
+returns table (target_user_id uuid)
+language sql
+stable
+as $$
+  select t.target_user_id
+  from link_outreach_runs r
+  join link_outreach_targets t on t.run_id = r.id
+  where r.requester_user_id = p_requester_user_id
+    and r.created_at > p_since
+  group by t.target_user_id
+  order by min(t.sent_at);
+$$;
+
+create index if not exists user_class_enrollments_user_class_idx on user_class_enrollments(user_id, class_id);
+create index if not exists user_class_enrollments_class_user_idx on user_class_enrollments(class_id, user_id);
+create index if not exists link_outreach_runs_requester_created_idx on link_outreach_runs(requester_user_id, created_at);
@@ -0,0 +1,36 @@
+-- One-round-trip verified-fact lookup
+-- get_verified_facts used to run one `fact_value ilike '%tag%'` query per tag;
+-- the btree link_verified_facts_fact_value_idx can't serve a leading wildcard.
+-- A trigram index can, and link_match_verified_facts matches every tag at
+-- once (a case-insensitive regex alternation, which pg_trgm also indexes) and
+-- drops expired rows server-side.
+
+create extension if not exists pg_trgm;
+
+create index if not exists link_verified_facts_fact_value_trgm_idx
+  on link_verified_facts using gin (fact_value gin_trgm_ops);
+
+-- Serves the periodic purge of expired rows
+create index if not exists link_verified_facts_expires_idx
+  on link_verified_facts(expires_at) where expires_at is not null;
+
+create or replace function link_match_verified_facts(p_university_id uuid, p_tags text[], p_limit integer default 10)
+returns setof link_verified_facts
+language sql
+stable
+as $$
+  with pattern as (
+    -- Tags are matched literally: escape regex metacharacters
+    select string_agg(regexp_replace(tag, '([.^$*+?()\[\]{}|\\-])', '\\\1', 'g'), '|') as alternation
+    from unnest(coalesce(p_tags, '{}')) as tag
+    where tag <> ''
+  )
+  select f.*
+  from link_verified_facts f, pattern
+  where f.university_id = p_university_id
+    and f.consent_status = 'opt_in'
+    and (f.expires_at is null or f.expires_at > now())
+    and (pattern.alternation is null or f.fact_value ~* pattern.alternation)
+  order by f.verified_at desc
+  limit p_limit;
+$$;
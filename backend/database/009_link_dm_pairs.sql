@@ -0,0 +1,67 @@
+-- Direct-conversation lookup by user pair
+-- supabase_client.get_or_create_dm_conversation used to load every
+-- conversation one user is in and intersect it with the other's, so its cost
+-- grew with the Link bot's conversation count. link_dm_pairs maps a canonical
+-- (user_a < user_b) pair to its conversation, and link_get_or_create_dm
+-- answers (or creates) in one round trip.
+
+create table if not exists link_dm_pairs (
+  user_a uuid not null,
+  user_b uuid not null,
+  conversation_id uuid not null references conversations(id) on delete cascade,
+  created_at timestamptz default now(),
+  primary key (user_a, user_b),
+  check (user_a <= user_b)
+);
+
+create index if not exists link_dm_pairs_conversation_idx
+  on link_dm_pairs(conversation_id);
+
+-- Serves the one-time lookup of DMs that predate link_dm_pairs
+create index if not exists conversation_participants_user_convo_idx
+  on conversation_participants(user_id, conversation_id);
+
+create or replace function link_get_or_create_dm(p_user_id uuid, p_other_user_id uuid)
+returns setof conversations
+language plpgsql
+as $$
+declare
+  v_a uuid := least(p_user_id, p_other_user_id);
+  v_b uuid := greatest(p_user_id, p_other_user_id);
+  v_id uuid;
+begin
+  select conversation_id into v_id from link_dm_pairs where user_a = v_a and user_b = v_b;
+
+  if v_id is null then
+    -- Concurrent callers for the same pair wait here instead of racing to create
+    perform pg_advisory_xact_lock(hashtextextended(v_a::text || ':' || v_b::text, 0));
+    select conversation_id into v_id from link_dm_pairs where user_a = v_a and user_b = v_b;
+  end if;
+
+  if v_id is null then
+    -- A DM created before this table (or by the app) is adopted, newest first
+    select c.id into v_id
+    from conversations c
+    join conversation_participants pa on pa.conversation_id = c.id and pa.user_id = p_user_id
+    join conversation_participants pb on pb.conversation_id = c.id and pb.user_id = p_other_user_id
+    where c.type = 'direct'
+    order by c.created_at desc
+    limit 1;
+
+    if v_id is null then
+      insert into conversations (type, created_by, is_system_generated)
+      values ('direct', p_user_id, true)
+      returning id into v_id;
+
+      insert into conversation_participants (conversation_id, user_id)
+      select distinct v_id, u from unnest(array[p_user_id, p_other_user_id]) as u;
+    end if;
+
+    insert into link_dm_pairs (user_a, user_b, conversation_id)
+    values (v_a, v_b, v_id)
+    on conflict (user_a, user_b) do nothing;
+  end if;
+
+  return query select * from conversations where id = v_id;
+end;
+$$;
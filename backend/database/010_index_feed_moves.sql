@@ -0,0 +1,86 @@
+-- Change feed across universities (see index_sync.py)
+-- The sync loop reads each table once for every university and routes rows
+-- to their university's index shard. A row whose university changes would
+-- otherwise stay indexed in its old shard, so moves are recorded in
+-- link_index_deletions against the old university, like a hard delete.
+-- Forum changes are pushed down to their posts the same way.
+
+create or replace function link_record_index_move()
+returns trigger
+language plpgsql
+as $$
+declare
+  old_university uuid;
+  new_university uuid;
+begin
+  if tg_table_name = 'posts' then
+    select university_id into old_university from forums where id = old.forum_id;
+    select university_id into new_university from forums where id = new.forum_id;
+  else
+    old_university := (to_jsonb(old) ->> 'university_id')::uuid;
+    new_university := (to_jsonb(new) ->> 'university_id')::uuid;
+  end if;
+  if old_university is distinct from new_university then
+    insert into link_index_deletions (table_name, row_id, university_id)
+    values (tg_table_name, old.id, old_university);
+  end if;
+  return new;
+end;
+$$;
+
+do $$
+declare
+  t text;
+begin
+  foreach t in array array['profiles', 'organizations', 'events', 'link_facts'] loop
+    execute format('drop trigger if exists %I on %I', t || '_record_index_move', t);
+    execute format(
+      'create trigger %I after update of university_id on %I for each row execute function link_record_index_move()',
+      t || '_record_index_move', t
+    );
+  end loop;
+end;
+$$;
+
+drop trigger if exists posts_record_index_move on posts;
+create trigger posts_record_index_move
+  after update of forum_id on posts
+  for each row execute function link_record_index_move();
+
+-- A post's document depends on its forum (name, is_public, university_id), so
+-- a forum change touches the forum's posts to put them back on the feed. A
+-- forum moving to another university also moves its posts' documents out of
+-- the old university's shard.
+create or replace function link_touch_forum_posts()
+returns trigger
+language plpgsql
+as $$
+begin
+  if old.university_id is distinct from new.university_id then
+    insert into link_index_deletions (table_name, row_id, university_id)
+    select 'posts', p.id, old.university_id from posts p where p.forum_id = new.id;
+  end if;
+  update posts set updated_at = now() where forum_id = new.id;
+  return new;
+end;
+$$;
+
+drop trigger if exists forums_touch_posts on forums;
+create trigger forums_touch_posts
+  after update of name, is_public, university_id on forums
+  for each row
+  when (
+    old.name is distinct from new.name
+    or old.is_public is distinct from new.is_public
+    or old.university_id is distinct from new.university_id
+  )
+  execute function link_touch_forum_posts();
+
+create index if not exists posts_forum_idx on posts(forum_id);
+
+-- The sync loop orders each whole table by (updated_at, id)
+create index if not exists profiles_updated_idx on profiles(updated_at, id);
+create index if not exists organizations_updated_idx on organizations(updated_at, id);
+create index if not exists events_updated_idx on events(updated_at, id);
+create index if not exists link_facts_updated_idx on link_facts(updated_at, id);
+create index if not exists link_index_deletions_deleted_idx on link_index_deletions(deleted_at, id);
@@ -0,0 +1,36 @@
+-- Ordered multi-row message inserts
+-- Every row of one insert shares a single now(), so a bulk insert (a Link
+-- answer and its cards, an outreach run's DMs) loses its order. These
+-- functions take a JSON array of rows and stamp created_at on the database
+-- clock, like every other insert: now() plus 1 ms per array position. They
+-- return the inserted rows in array order.
+
+create or replace function link_insert_link_messages(p_rows jsonb)
+returns setof link_messages
+language sql
+as $$
+  with inserted as (
+    insert into link_messages (conversation_id, session_id, sender_type, sender_id, content, metadata, created_at)
+    select r.conversation_id, r.session_id, coalesce(r.sender_type, 'link'), r.sender_id, r.content,
+           coalesce(r.metadata, '{}'::jsonb), now() + (input.position - 1) * interval '1 millisecond'
+    from jsonb_array_elements(p_rows) with ordinality as input(row_json, position)
+    cross join lateral jsonb_populate_record(null::link_messages, input.row_json) as r
+    returning *
+  )
+  select * from inserted order by created_at;
+$$;
+
+create or replace function link_insert_messages(p_rows jsonb)
+returns setof messages
+language sql
+as $$
+  with inserted as (
+    insert into messages (conversation_id, sender_id, content, metadata, created_at)
+    select r.conversation_id, r.sender_id, r.content,
+           coalesce(r.metadata, '{}'::jsonb), now() + (input.position - 1) * interval '1 millisecond'
+    from jsonb_array_elements(p_rows) with ordinality as input(row_json, position)
+    cross join lateral jsonb_populate_record(null::messages, input.row_json) as r
+    returning *
+  )
+  select * from inserted order by created_at;
+$$;
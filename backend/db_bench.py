@@ -0,0 +1,439 @@
+"""Round-trip benchmark for data-layer hot paths.
+
+Runs supabase_client functions against FakeSupabase, an in-memory stand-in
+for the service-role client that counts PostgREST round trips (every
+execute()), and compares them with the query shapes they replaced. Latency
+is estimated as round trips x RTT, which is what dominates these calls.
+
+    python -m db_bench [rtt_ms]
+"""
+
+from __future__ import annotations
+
+import re
+import sys
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Optional
+
+import supabase_client as db
+
+
+class _Result:
+    def __init__(self, data: Any, count: Optional[int] = None):
+        self.data = data
+        self.count = count
+
+
+class FakeQuery:
+    """The subset of the supabase-py builder the data layer uses."""
+
+    def __init__(self, fake: "FakeSupabase", table: str):
+        self.fake = fake
+        self.table = table
+        self.filters: list[Callable[[dict], bool]] = []
+        self.action = "select"
+        self.payload: Any = None
+        self.columns = "*"
+        self.count: Optional[str] = None
+        self.order_by: list[tuple[str, bool]] = []
+        self.max_rows: Optional[int] = None
+        self.single = False
+
+    def select(self, columns: str = "*", count: Optional[str] = None) -> "FakeQuery":
+        self.columns, self.count = columns, count
+        return self
+
+    def insert(self, payload: Any) -> "FakeQuery":
+        self.action, self.payload = "insert", payload
+        return self
+
+    def upsert(self, payload: Any, on_conflict: Optional[str] = None) -> "FakeQuery":
+        self.action, self.payload = "upsert", (payload, on_conflict or "id")
+        return self
+
+    def update(self, payload: dict) -> "FakeQuery":
+        self.action, self.payload = "update", payload
+        return self
+
+    def delete(self) -> "FakeQuery":
+        self.action = "delete"
+        return self
+
+    def _where(self, fn: Callable[[dict], bool]) -> "FakeQuery":
+        self.filters.append(fn)
+        return self
+
+    def eq(self, column: str, value: Any) -> "FakeQuery":
+        return self._where(lambda row: row.get(column) == value)
+
+    def neq(self, column: str, value: Any) -> "FakeQuery":
+        return self._where(lambda row: row.get(column) != value)
+
+    def gt(self, column: str, value: Any) -> "FakeQuery":
+        return self._where(lambda row: row.get(column) is not None and row[column] > value)
+
+    def gte(self, column: str, value: Any) -> "FakeQuery":
+        return self._where(lambda row: row.get(column) is not None and row[column] >= value)
+
+    def lt(self, column: str, value: Any) -> "FakeQuery":
+        return self._where(lambda row: row.get(column) is not None and row[column] < value)
+
+    def lte(self, column: str, value: Any) -> "FakeQuery":
+        return self._where(lambda row: row.get(column) is not None and row[column] <= value)
+
+    def in_(self, column: str, values: list) -> "FakeQuery":
+        values = set(values)
+        return self._where(lambda row: row.get(column) in values)
+
+    def is_(self, column: str, value: str) -> "FakeQuery":
+        return self._where(lambda row: row.get(column) is None if value == "null" else True)
+
+    def ilike(self, column: str, pattern: str) -> "FakeQuery":
+        regex = re.compile("^" + ".*".join(re.escape(part) for part in pattern.split("%")) + "$", re.I | re.S)
+        return self._where(lambda row: bool(regex.match(str(row.get(column) or ""))))
+
+    def order(self, column: str, desc: bool = False) -> "FakeQuery":
+        self.order_by.append((column, desc))
+        return self
+
+    def limit(self, count: int) -> "FakeQuery":
+        self.max_rows = count
+        return self
+
+    def maybe_single(self) -> "FakeQuery":
+        self.single = True
+        return self
+
+    def execute(self) -> _Result:
+        self.fake.round_trips += 1
+        rows = self.fake.tables.setdefault(self.table, [])
+        if self.action in ("insert", "upsert"):
+            payload, key = self.payload if self.action == "upsert" else (self.payload, None)
+            new_rows = [dict(row) for row in (payload if isinstance(payload, list) else [payload])]
+            for row in new_rows:
+                row.setdefault("id", f"{self.table}-{self.fake.next_id()}")
+                row.setdefault("created_at", self.fake.now())
+                existing = next((r for r in rows if key and r.get(key) == row.get(key)), None)
+                if existing is not None:
+                    existing.update(row)
+                else:
+                    rows.append(row)
+            return _Result(new_rows)
+        matched = [row for row in rows if all(fn(row) for fn in self.filters)]
+        if self.action == "update":
+            for row in matched:
+                row.update(self.payload)
+            return _Result([dict(row) for row in matched])
+        if self.action == "delete":
+            self.fake.tables[self.table] = [row for row in rows if row not in matched]
+            return _Result(matched)
+        for column, desc in reversed(self.order_by):
+            matched.sort(key=lambda row: row.get(column) or "", reverse=desc)
+        count = len(matched) if self.count else None
+        if self.max_rows is not None:
+            matched = matched[: self.max_rows]
+        data = [dict(row) for row in matched]
+        if self.single:
+            return _Result(data[0] if data else None, count)
+        return _Result(data, count)
+
+
+class _FakeRPC:
+    def __init__(self, fake: "FakeSupabase", fn: Callable[..., Any], params: dict):
+        self.fake, self.fn, self.params = fake, fn, params
+
+    def execute(self) -> _Result:
+        self.fake.round_trips += 1
+        return _Result(self.fn(self.fake, **self.params))
+
+
+class FakeSupabase:
+    """In-memory tables plus Python versions of the repo's Postgres functions."""
+
+    def __init__(self):
+        self.tables: dict[str, list[dict]] = {}
+        self.round_trips = 0
+        self._ids = 0
+
+    def next_id(self) -> int:
+        self._ids += 1
+        return self._ids
+
+    @staticmethod
+    def now() -> str:
+        return datetime.now(timezone.utc).isoformat()
+
+    def rows(self, table: str) -> list[dict]:
+        return self.tables.setdefault(table, [])
+
+    def table(self, name: str) -> FakeQuery:
+        return FakeQuery(self, name)
+
+    def rpc(self, name: str, params: Optional[dict] = None) -> _FakeRPC:
+        return _FakeRPC(self, RPCS[name], params or {})
+
+
+# ============ Postgres Functions (database/*.sql) ============
+
+def _link_classmate_ids(fake: FakeSupabase, p_user_id: str, p_semester: Optional[str] = None) -> list[dict]:
+    enrollments = fake.rows("user_class_enrollments")
+    classes = {
+        row["class_id"] for row in enrollments
+        if row["user_id"] == p_user_id and (p_semester is None or row.get("semester") == p_semester)
+    }
+    others = {row["user_id"] for row in enrollments if row["class_id"] in classes and row["user_id"] != p_user_id}
+    return [{"user_id": user_id} for user_id in sorted(others)]
+
+
+def _link_recent_outreach_target_ids(fake: FakeSupabase, p_requester_user_id: str, p_since: str) -> list[dict]:
+    runs = {
+        row["id"] for row in fake.rows("link_outreach_runs")
+        if row["requester_user_id"] == p_requester_user_id and row["created_at"] > p_since
+    }
+    first_contact: dict[str, str] = {}
+    for row in fake.rows("link_outreach_targets"):
+        if row["run_id"] in runs:
+            sent_at = first_contact.get(row["target_user_id"])
+            if sent_at is None or row["sent_at"] < sent_at:
+                first_contact[row["target_user_id"]] = row["sent_at"]
+    return [{"target_user_id": tid} for tid in sorted(first_contact, key=first_contact.get)]
+
+
+def _link_match_verified_facts(fake: FakeSupabase, p_university_id: str, p_tags: list[str], p_limit: int = 10) -> list[dict]:
+    now = fake.now()
+    tags = [tag.lower() for tag in p_tags if tag]
+    rows = [
+        row for row in fake.rows("link_verified_facts")
+        if row["university_id"] == p_university_id
+        and row["consent_status"] == "opt_in"
+        and (row.get("expires_at") is None or row["expires_at"] > now)
+        and (not tags or any(tag in row["fact_value"].lower() for tag in tags))
+    ]
+    return sorted(rows, key=lambda row: row["verified_at"], reverse=True)[:p_limit]
+
+
+def _link_get_or_create_dm(fake: FakeSupabase, p_user_id: str, p_other_user_id: str) -> list[dict]:
+    pair = db.dm_pair_key(p_user_id, p_other_user_id)
+    entry = next((row for row in fake.rows("link_dm_pairs") if (row["user_a"], row["user_b"]) == pair), None)
+    if entry is None:
+        mine = {row["conversation_id"] for row in fake.rows("conversation_participants") if row["user_id"] == p_user_id}
+        theirs = {row["conversation_id"] for row in fake.rows("conversation_participants") if row["user_id"] == p_other_user_id}
+        existing = sorted(
+            (row for row in fake.rows("conversations") if row["id"] in mine & theirs and row.get("type") == "direct"),
+            key=lambda row: row.get("created_at") or "", reverse=True,
+        )
+        if existing:
+            convo_id = existing[0]["id"]
+        else:
+            convo_id = f"conversations-{fake.next_id()}"
+            fake.rows("conversations").append({
+                "id": convo_id, "type": "direct", "created_by": p_user_id,
+                "is_system_generated": True, "created_at": fake.now(),
+            })
+            for uid in dict.fromkeys((p_user_id, p_other_user_id)):
+                fake.rows("conversation_participants").append({"conversation_id": convo_id, "user_id": uid})
+        entry = {"user_a": pair[0], "user_b": pair[1], "conversation_id": convo_id}
+        fake.rows("link_dm_pairs").append(entry)
+    return [dict(row) for row in fake.rows("conversations") if row["id"] == entry["conversation_id"]]
+
+
+RPCS: dict[str, Callable[..., Any]] = {
+    "link_classmate_ids": _link_classmate_ids,
+    "link_recent_outreach_target_ids": _link_recent_outreach_target_ids,
+    "link_match_verified_facts": _link_match_verified_facts,
+    "link_get_or_create_dm": _link_get_or_create_dm,
+}
+
+
+# ============ Replaced Query Shapes ============
+
+def _legacy_get_classmates(client: FakeSupabase, user_id: str) -> list[str]:
+    class_ids = [
+        row["class_id"]
+        for row in client.table("user_class_enrollments").select("class_id").eq("user_id", user_id).execute().data
+    ]
+    classmates: list[str] = []
+    for class_id in class_ids:
+        rows = client.table("user_class_enrollments").select("user_id").eq("class_id", class_id).execute().data
+        classmates.extend(row["user_id"] for row in rows if row["user_id"] != user_id)
+    return list(set(classmates))
+
+
+def _legacy_list_recent_outreach_target_ids(client: FakeSupabase, requester_user_id: str, days: int = 7) -> list[str]:
+    since = (datetime.now(timezone.utc) - timedelta(days=days)).isoformat()
+    runs = (
+        client.table("link_outreach_runs").select("id")
+        .eq("requester_user_id", requester_user_id).gt("created_at", since).execute().data
+    )
+    target_ids: list[str] = []
+    for run in runs:
+        rows = client.table("link_outreach_targets").select("target_user_id").eq("run_id", run["id"]).execute().data
+        for row in rows:
+            if row["target_user_id"] not in target_ids:
+                target_ids.append(row["target_user_id"])
+    return target_ids
+
+
+def _legacy_get_verified_facts(client: FakeSupabase, university_id: str, tags: list[str], limit: int = 10) -> list[dict]:
+    # lookup_verified_facts purged expired rows first, on every call. The reused
+    # builder also kept each tag's ilike, so later tags could only narrow
+    client.table("link_verified_facts").delete().lt("expires_at", client.now()).execute()
+    query = client.table("link_verified_facts").select("*").eq("university_id", university_id).eq("consent_status", "opt_in")
+    results: list[dict] = []
+    seen: set[str] = set()
+    for tag in tags:
+        for row in query.ilike("fact_value", f"%{tag}%").limit(limit).execute().data:
+            if row["id"] not in seen:
+                results.append(row)
+                seen.add(row["id"])
+        if len(results) >= limit:
+            break
+    return results[:limit]
+
+
+def _legacy_get_or_create_dm_conversation(client: FakeSupabase, user_id: str, other_user_id: str) -> dict:
+    convo_ids = [
+        row["conversation_id"]
+        for row in client.table("conversation_participants").select("conversation_id").eq("user_id", user_id).execute().data
+    ]
+    if convo_ids:
+        shared = (
+            client.table("conversation_participants").select("conversation_id")
+            .eq("user_id", other_user_id).in_("conversation_id", convo_ids).execute().data
+        )
+        shared_ids = [row["conversation_id"] for row in shared]
+        if shared_ids:
+            convo = (
+                client.table("conversations").select("*").in_("id", shared_ids).eq("type", "direct")
+                .order("created_at", desc=True).limit(1).execute().data
+            )
+            if convo:
+                return convo[0]
+    convo = client.table("conversations").insert({"type": "direct", "created_by": user_id, "is_system_generated": True}).execute().data[0]
+    rows = [{"conversation_id": convo["id"], "user_id": uid} for uid in (user_id, other_user_id)]
+    client.table("conversation_participants").insert(rows).execute()
+    return convo
+
+
+# ============ Scenarios ============
+
+def _seed_classes(fake: FakeSupabase, classes: int = 6, students: int = 30) -> str:
+    for c in range(classes):
+        fake.rows("user_class_enrollments").append({"user_id": "me", "class_id": f"class-{c}", "semester": "F25"})
+        for s in range(students):
+            # Students overlap across classes, so de-duplication matters
+            student = f"student-{(c * students // 2 + s) % (classes * students)}"
+            fake.rows("user_class_enrollments").append({"user_id": student, "class_id": f"class-{c}", "semester": "F25"})
+    return "me"
+
+
+def _seed_outreach(fake: FakeSupabase, runs: int = 10, targets: int = 5) -> str:
+    now = datetime.now(timezone.utc)
+    for r in range(runs):
+        created = (now - timedelta(hours=runs - r)).isoformat()
+        fake.rows("link_outreach_runs").append({"id": f"run-{r}", "requester_user_id": "me", "created_at": created})
+        for t in range(targets):
+            fake.rows("link_outreach_targets").append({
+                "run_id": f"run-{r}", "target_user_id": f"target-{(r * 3 + t) % (runs * 2)}", "sent_at": created,
+            })
+    return "me"
+
+
+FACT_TAGS = ["tennis", "chess", "robotics", "debate", "climbing"]
+
+
+def _seed_verified_facts(fake: FakeSupabase) -> str:
+    now = datetime.now(timezone.utc)
+    for n, tag in enumerate(FACT_TAGS * 2):
+        fake.rows("link_verified_facts").append({
+            "id": f"fact-{n}", "university_id": "uni", "consent_status": "opt_in",
+            "fact_value": f"{tag} club meets weekly", "verified_at": (now - timedelta(minutes=n)).isoformat(),
+            "expires_at": (now + timedelta(days=30)).isoformat(),
+        })
+    return "uni"
+
+
+# Ten students the Link bot has already DMed, ten it hasn't
+DM_TARGETS = [f"student-{n}" for n in range(0, 100, 10)] + [f"new-student-{n}" for n in range(10)]
+
+
+def _seed_link_dms(fake: FakeSupabase, students: int = 500) -> str:
+    for n in range(students):
+        convo_id = f"dm-{n}"
+        fake.rows("conversations").append({"id": convo_id, "type": "direct", "created_at": fake.now()})
+        for uid in ("link-bot", f"student-{n}"):
+            fake.rows("conversation_participants").append({"conversation_id": convo_id, "user_id": uid})
+    return "link-bot"
+
+
+def _dm_fan_out(get_or_create: Callable[[str, str], dict], sender: str, cold: bool = False) -> list[dict]:
+    # Outreach reaches the same targets again on a later run
+    if cold:
+        db.dm_conversation_cache.clear()
+    first = [get_or_create(sender, target) for target in DM_TARGETS]
+    again = [get_or_create(sender, target) for target in DM_TARGETS]
+    return first + again
+
+
+SCENARIOS: dict[str, tuple[Callable, Callable, Callable]] = {
+    # name: (seed, before, after)
+    "get_classmates (6 classes)": (
+        _seed_classes, _legacy_get_classmates, lambda _client, user: db.get_classmates(user),
+    ),
+    "list_recent_outreach_target_ids (10 runs)": (
+        _seed_outreach, _legacy_list_recent_outreach_target_ids,
+        lambda _client, user: db.list_recent_outreach_target_ids(user),
+    ),
+    "get_or_create_dm_conversation (20 targets x2)": (
+        _seed_link_dms,
+        lambda client, sender: _dm_fan_out(lambda a, b: _legacy_get_or_create_dm_conversation(client, a, b), sender),
+        lambda _client, sender: _dm_fan_out(db.get_or_create_dm_conversation, sender, cold=True),
+    ),
+    "get_verified_facts (5 tags)": (
+        _seed_verified_facts,
+        lambda client, uni: _legacy_get_verified_facts(client, uni, FACT_TAGS),
+        # The expired-row purge is throttled (LINK_VERIFIED_FACTS_PURGE_SECONDS)
+        lambda _client, uni: db.get_verified_facts(uni, FACT_TAGS),
+    ),
+}
+
+
+def run(rtt_ms: float = 20.0) -> list[dict]:
+    """Count round trips (and rows returned) for each scenario before and after."""
+    results = []
+    original = db.get_supabase_client
+    try:
+        for name, (seed, before, after) in SCENARIOS.items():
+            counts = []
+            outputs = []
+            for fn in (before, after):
+                fake = FakeSupabase()
+                subject = seed(fake)
+                db.get_supabase_client = lambda fake=fake: fake
+                start = fake.round_trips
+                outputs.append(fn(fake, subject))
+                counts.append(fake.round_trips - start)
+            results.append({
+                "scenario": name,
+                "before": counts[0],
+                "after": counts[1],
+                "est_ms_before": round(counts[0] * rtt_ms, 1),
+                "est_ms_after": round(counts[1] * rtt_ms, 1),
+                "rows_before": len(outputs[0]),
+                "rows_after": len(outputs[1]),
+            })
+    finally:
+        db.get_supabase_client = original
+    return results
+
+
+# ============ CLI Entry Point ============
+
+if __name__ == "__main__":
+    rtt = float(sys.argv[1]) if len(sys.argv) > 1 else 20.0
+    print(f"{'scenario':<45} {'before':>6} {'after':>6} {'~ms before':>11} {'~ms after':>10} {'rows':>9}")
+    for row in run(rtt):
+        print(
+            f"{row['scenario']:<45} {row['before']:>6} {row['after']:>6} "
+            f"{row['est_ms_before']:>11} {row['est_ms_after']:>10} {row['rows_before']:>4}/{row['rows_after']:<4}"
+        )
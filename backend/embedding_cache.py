@@ -0,0 +1,248 @@
+"""Persistent, content-addressed embedding cache.
+
+Vectors are stored in SQLite keyed by (model name, sha256 of the text), so an
+unchanged document or a repeated question is never sent to the provider twice.
+The table is bounded: once it grows past max_entries the least recently used
+rows are evicted.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, List, Optional, Sequence
+
+import numpy as np
+from llama_index.core.embeddings import BaseEmbedding
+from pydantic import PrivateAttr
+
+# Evict down to this fraction of max_entries so we don't evict on every put
+EVICT_TO_RATIO = 0.9
+QUERY_NAMESPACE = "query"
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """SQLite-backed LRU of embeddings keyed by (model, text hash)."""
+
+    def __init__(self, path: str, max_entries: int = 200_000):
+        self.path = path
+        self.max_entries = max(1, int(max_entries))
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT NOT NULL,
+                text_hash TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (model, text_hash)
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)")
+        self._conn.commit()
+        self._count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def get_many(self, model: str, texts: Sequence[str]) -> list[Optional[list[float]]]:
+        """Look up texts; misses come back as None."""
+        hashes = [text_hash(t) for t in texts]
+        found: dict[str, list[float]] = {}
+        unique = list(dict.fromkeys(hashes))
+        with self._lock:
+            # Stay well under SQLite's bound-parameter limit
+            for start in range(0, len(unique), 500):
+                chunk = unique[start : start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT text_hash, vector FROM embeddings WHERE model = ? AND text_hash IN ({placeholders})",
+                    [model, *chunk],
+                ).fetchall()
+                for h, blob in rows:
+                    found[h] = np.frombuffer(blob, dtype=np.float32).tolist()
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE model = ? AND text_hash = ?",
+                    [(now, model, h) for h in found],
+                )
+                self._conn.commit()
+            results = [found.get(h) for h in hashes]
+            hits = sum(1 for r in results if r is not None)
+            self.hits += hits
+            self.misses += len(results) - hits
+        return results
+
+    def put_many(self, model: str, texts: Sequence[str], vectors: Sequence[Sequence[float]]) -> None:
+        rows = {}
+        now = time.time()
+        for text, vector in zip(texts, vectors):
+            if vector is None:
+                continue
+            rows[text_hash(text)] = np.asarray(vector, dtype=np.float32).tobytes()
+        if not rows:
+            return
+        with self._lock:
+            before = self._conn.total_changes
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO embeddings (model, text_hash, vector, last_used) VALUES (?, ?, ?, ?)",
+                [(model, h, blob, now) for h, blob in rows.items()],
+            )
+            self._count += self._conn.total_changes - before
+            if self._count > self.max_entries:
+                self._evict_locked()
+            self._conn.commit()
+
+    def _evict_locked(self) -> None:
+        excess = self._count - int(self.max_entries * EVICT_TO_RATIO)
+        self._conn.execute(
+            "DELETE FROM embeddings WHERE rowid IN "
+            "(SELECT rowid FROM embeddings ORDER BY last_used ASC LIMIT ?)",
+            (excess,),
+        )
+        self.evictions += excess
+        self._count -= excess
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM embeddings")
+            self._conn.commit()
+            self._count = 0
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "path": self.path,
+            "entries": self._count,
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+        }
+
+
+class CachedEmbedding(BaseEmbedding):
+    """Wrap any LlamaIndex embed model so it consults an EmbeddingCache first.
+
+    Keeps the wrapped model's name, so snapshots built with or without the
+    cache stay compatible. Query embeddings are cached under their own
+    namespace in case a model embeds queries differently from documents.
+    """
+
+    _inner: Any = PrivateAttr()
+    _cache: Any = PrivateAttr()
+
+    def __init__(self, inner: BaseEmbedding, cache: EmbeddingCache, **kwargs):
+        super().__init__(
+            model_name=getattr(inner, "model_name", "unknown"),
+            embed_batch_size=getattr(inner, "embed_batch_size", 10),
+            **kwargs,
+        )
+        self._inner = inner
+        self._cache = cache
+
+    @property
+    def cache(self) -> EmbeddingCache:
+        return self._cache
+
+    def _query_model(self) -> str:
+        return f"{self.model_name}:{QUERY_NAMESPACE}"
+
+    # Queries
+
+    def _get_query_embedding(self, query: str) -> List[float]:
+        cached = self._cache.get_many(self._query_model(), [query])[0]
+        if cached is not None:
+            return cached
+        vector = self._inner.get_query_embedding(query)
+        self._cache.put_many(self._query_model(), [query], [vector])
+        return vector
+
+    async def _aget_query_embedding(self, query: str) -> List[float]:
+        cached = self._cache.get_many(self._query_model(), [query])[0]
+        if cached is not None:
+            return cached
+        vector = await self._inner.aget_query_embedding(query)
+        self._cache.put_many(self._query_model(), [query], [vector])
+        return vector
+
+    def get_query_embedding_batch(self, queries: List[str]) -> List[List[float]]:
+        """Embed several queries with one provider call for the cache misses.
+
+        The providers we wrap (OpenAI text-embedding-3, Gemini
+        text-embedding-004) embed queries and documents identically, so misses
+        go through the inner model's batched text path.
+        """
+        results, missing = self._lookup(queries, self._query_model())
+        if missing:
+            vectors = self._inner.get_text_embedding_batch(missing)
+            results = self._merge(queries, results, missing, vectors, self._query_model())
+        return results
+
+    # Documents
+
+    def _get_text_embedding(self, text: str) -> List[float]:
+        return self._get_text_embeddings([text])[0]
+
+    async def _aget_text_embedding(self, text: str) -> List[float]:
+        return (await self._aget_text_embeddings([text]))[0]
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        results, missing = self._lookup(texts)
+        if not missing:
+            return results
+        try:
+            vectors = self._inner.get_text_embedding_batch(missing)
+        except Exception as e:
+            self._merge_partial(e, texts, results, missing)
+            raise
+        return self._merge(texts, results, missing, vectors)
+
+    async def _aget_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        results, missing = self._lookup(texts)
+        if not missing:
+            return results
+        try:
+            vectors = await self._inner.aget_text_embedding_batch(missing)
+        except Exception as e:
+            self._merge_partial(e, texts, results, missing)
+            raise
+        return self._merge(texts, results, missing, vectors)
+
+    def _lookup(self, texts: List[str], model: Optional[str] = None) -> tuple[list, list[str]]:
+        results = self._cache.get_many(model or self.model_name, texts)
+        # Identical texts in one batch are embedded once
+        missing = list(dict.fromkeys(t for t, r in zip(texts, results) if r is None))
+        return results, missing
+
+    def _merge(
+        self, texts: List[str], results: list, missing: list[str], vectors: list, model: Optional[str] = None
+    ) -> list:
+        self._cache.put_many(model or self.model_name, missing, vectors)
+        by_text = dict(zip(missing, vectors))
+        return [r if r is not None else by_text.get(t) for t, r in zip(texts, results)]
+
+    def _merge_partial(self, error: Exception, texts: List[str], results: list, missing: list[str]) -> None:
+        """Cache what the provider did return and realign the error's partial
+        results (see gemini_embedder.EmbeddingError) with the caller's texts."""
+        partial = getattr(error, "embeddings", None)
+        if not partial or len(partial) != len(missing):
+            return
+        merged = self._merge(texts, results, missing, partial)
+        error.embeddings = merged
+        error.failed = [i for i, v in enumerate(merged) if v is None]
@@ -1,49 +1,174 @@
 """Minimal Gemini embedding adapter for LlamaIndex (no extra llama-index-gemini deps).
 
-Uses google-generativeai's text-embedding-004.
+Uses google-generativeai's text-embedding-004. Texts are sent in batched
+requests (several in flight at once) and transient errors are retried with
+exponential backoff. Texts that still fail raise EmbeddingError (carrying
+the vectors that did succeed); we never hand back placeholder vectors. The
+index leaves failed documents out and keeps their change-feed watermarks
+where they were, so the next sync pulls and embeds them again.
 """
 from __future__ import annotations
 
+import asyncio
 import os
-from typing import List
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
 
 import google.generativeai as genai
 from llama_index.core.embeddings import BaseEmbedding
 
+try:
+    from google.api_core import exceptions as google_exceptions
+
+    _NON_RETRYABLE: tuple = (
+        google_exceptions.InvalidArgument,
+        google_exceptions.PermissionDenied,
+        google_exceptions.Unauthenticated,
+        google_exceptions.NotFound,
+    )
+except ImportError:  # pragma: no cover - api_core ships with google-generativeai
+    _NON_RETRYABLE = ()
+
+# Provider limit for batchEmbedContents
+MAX_PROVIDER_BATCH = 100
+
+
+class EmbeddingError(RuntimeError):
+    """Raised when texts could not be embedded after all retries.
+
+    `embeddings` is aligned with the input texts; failed positions are None.
+    """
+
+    def __init__(self, message: str, embeddings: Optional[list] = None, failed: Optional[list[int]] = None):
+        super().__init__(message)
+        self.embeddings = embeddings or []
+        self.failed = failed or []
+
 
 class GeminiEmbedder(BaseEmbedding):
     model_name: str = "text-embedding-004"
     api_key: str | None = None
+    batch_size: int = MAX_PROVIDER_BATCH  # texts per provider request
+    max_concurrency: int = 4  # provider requests in flight
+    max_retries: int = 5
+    retry_base_delay: float = 1.0
 
     def model_post_init(self, __context) -> None:
         key = self.api_key or os.getenv("GOOGLE_API_KEY", "")
         if key:
             genai.configure(api_key=key)
+        self.batch_size = max(1, min(self.batch_size, MAX_PROVIDER_BATCH))
+        self.max_concurrency = max(1, self.max_concurrency)
+        # LlamaIndex chunks get_text_embedding_batch by embed_batch_size; make
+        # each chunk big enough to keep every concurrent slot busy.
+        self.embed_batch_size = max(self.embed_batch_size, self.batch_size * self.max_concurrency)
 
     # LlamaIndex abstract methods (sync + async)
     def _get_query_embedding(self, query: str) -> List[float]:
-        return self._embed_one(query)
+        return self._get_text_embeddings([query])[0]
 
     def _get_text_embedding(self, text: str) -> List[float]:
-        return self._embed_one(text)
+        return self._get_text_embeddings([text])[0]
 
     def _get_text_embeddings(self, texts: List[str]) -> List[List[float]]:
-        return [self._embed_one(t) for t in texts]
+        batches = self._batches(texts)
+        if len(batches) == 1:
+            results = [self._embed_batch_safe(batches[0])]
+        else:
+            with ThreadPoolExecutor(max_workers=min(self.max_concurrency, len(batches))) as pool:
+                results = list(pool.map(self._embed_batch_safe, batches))
+        return self._collect(texts, batches, results)
 
     async def _aget_query_embedding(self, query: str) -> List[float]:
-        return self._embed_one(query)
+        return (await self._aget_text_embeddings([query]))[0]
 
     async def _aget_text_embedding(self, text: str) -> List[float]:
-        return self._embed_one(text)
+        return (await self._aget_text_embeddings([text]))[0]
+
+    async def _aget_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        batches = self._batches(texts)
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def run(batch: list[str]) -> Optional[list]:
+            async with semaphore:
+                try:
+                    return await self._aembed_batch(batch)
+                except Exception as e:
+                    print(f"Warning: Gemini embedding failed for {len(batch)} texts: {e}")
+                    return None
 
-    def _embed_one(self, text: str) -> List[float]:
+        results = await asyncio.gather(*(run(batch) for batch in batches))
+        return self._collect(texts, batches, results)
+
+    # ============ Batching + retry ============
+
+    def _batches(self, texts: List[str]) -> list[list[str]]:
+        return [texts[i : i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+
+    def _collect(self, texts: List[str], batches: list[list[str]], results: list[Optional[list]]) -> List[List[float]]:
+        embeddings: list = []
+        failed: list[int] = []
+        for batch, vectors in zip(batches, results):
+            if vectors is None:
+                failed.extend(range(len(embeddings), len(embeddings) + len(batch)))
+                embeddings.extend([None] * len(batch))
+            else:
+                embeddings.extend(vectors)
+        if failed:
+            raise EmbeddingError(
+                f"{len(failed)} of {len(texts)} texts could not be embedded",
+                embeddings=embeddings,
+                failed=failed,
+            )
+        return embeddings
+
+    def _embed_batch_safe(self, batch: list[str]) -> Optional[list]:
         try:
-            r = genai.embed_content(model=self.model_name, content=text)
-            # google-generativeai returns dict with key 'embedding'
-            emb = r.get("embedding") if isinstance(r, dict) else getattr(r, "embedding", None)
-            if emb:
-                return emb
-        except Exception:
-            pass
-        # Fallback to zero vector if embedding fails; dimension commonly 768 for text-embedding-004
-        return [0.0] * 768
+            return self._embed_batch(batch)
+        except Exception as e:
+            print(f"Warning: Gemini embedding failed for {len(batch)} texts: {e}")
+            return None
+
+    def _embed_batch(self, batch: list[str]) -> list:
+        for attempt in range(self.max_retries + 1):
+            try:
+                return self._parse(genai.embed_content(model=self.model_name, content=batch), len(batch))
+            except _NON_RETRYABLE:
+                raise
+            except Exception:
+                if attempt >= self.max_retries:
+                    raise
+                time.sleep(self._backoff(attempt))
+        raise RuntimeError("unreachable")
+
+    async def _aembed_batch(self, batch: list[str]) -> list:
+        embed_async = getattr(genai, "embed_content_async", None)
+        for attempt in range(self.max_retries + 1):
+            try:
+                if embed_async is not None:
+                    response = await embed_async(model=self.model_name, content=batch)
+                else:
+                    response = await asyncio.to_thread(genai.embed_content, model=self.model_name, content=batch)
+                return self._parse(response, len(batch))
+            except _NON_RETRYABLE:
+                raise
+            except Exception:
+                if attempt >= self.max_retries:
+                    raise
+                await asyncio.sleep(self._backoff(attempt))
+        raise RuntimeError("unreachable")
+
+    def _backoff(self, attempt: int) -> float:
+        # Exponential backoff with full jitter, capped at 30s
+        return random.uniform(0, min(30.0, self.retry_base_delay * (2 ** attempt)))
+
+    @staticmethod
+    def _parse(response, expected: int) -> list:
+        # google-generativeai returns dict with key 'embedding' (a list of
+        # vectors when content is a list)
+        emb = response.get("embedding") if isinstance(response, dict) else getattr(response, "embedding", None)
+        if not emb or len(emb) != expected or not all(emb):
+            raise ValueError(f"expected {expected} embeddings, got {len(emb or [])}")
+        return [list(v) for v in emb]
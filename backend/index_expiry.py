@@ -0,0 +1,146 @@
+"""Background expiry of time-bound documents (events) from the RAG index.
+
+Event nodes carry an `expires_at` (their start time) and write_shards records
+each shard's earliest one in the manifest. The sweeper keeps a min-heap of
+(next expiry, shard key) built from those entries, sleeps until the soonest
+is due, tombstones that shard's expired rows and re-queues the shard at its
+new next expiry.
+
+Queries already skip expired rows (index_store.Shard.expired_rows); the
+sweep keeps them from piling up, without periodic full rebuilds.
+"""
+
+from __future__ import annotations
+
+import heapq
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Optional
+
+import numpy as np
+
+from config import settings
+import index_jobs
+import index_store
+from node_store import expiry_epoch
+import rag_index
+
+# Floor between sweeps, so a shard that can't be swept doesn't spin the loop
+MIN_SLEEP_SECONDS = 1.0
+RETRY_SECONDS = 60.0
+
+_heap: list[tuple[float, str]] = []
+_heap_generation = -1
+_stop = threading.Event()
+_thread: Optional[threading.Thread] = None
+_swept_rows = 0
+_last_sweep_at: Optional[str] = None
+
+
+def _rebuild_heap() -> None:
+    global _heap, _heap_generation
+    manifest = index_store.current_manifest()
+    heap = [
+        (expiry_epoch(entry["next_expiry"]), key)
+        for key, entry in (manifest.get("shards") or {}).items()
+        if entry.get("next_expiry")
+    ]
+    heapq.heapify(heap)
+    _heap, _heap_generation = heap, int(manifest.get("generation") or 0)
+
+
+def sweep_due(now: Optional[float] = None) -> dict:
+    """Tombstone expired rows in every shard whose next expiry has passed."""
+    global _heap_generation, _swept_rows, _last_sweep_at
+    now = time.time() if now is None else now
+    with index_jobs.exclusive():
+        # Any write (rebuild, sync, change feed) may have moved expiries
+        if index_store.generation() != _heap_generation:
+            _rebuild_heap()
+        due: list[str] = []
+        while _heap and _heap[0][0] <= now:
+            due.append(heapq.heappop(_heap)[1])
+        if not due:
+            return {"removed": 0, "shards": []}
+
+        removed: list[tuple[str, str]] = []
+        unswept: list[str] = []
+        for key in due:
+            shard = index_store.load_shard(key)
+            if shard is None:
+                unswept.append(key)
+                continue
+            expired = shard.expired_rows(now)
+            if expired is not None:
+                removed += [(key, shard.nodes.key(row)) for row in np.flatnonzero(expired)]
+        if removed:
+            rag_index.apply_changes([], removed)
+
+        # Re-queue swept shards at their new next expiry; that was our write
+        _heap_generation = index_store.generation()
+        for key in due:
+            entry = index_store.shard_entry(key) or {}
+            next_expiry = expiry_epoch(entry.get("next_expiry"))
+            if key in unswept or next_expiry <= now:
+                # Couldn't load or write the shard; try again later
+                heapq.heappush(_heap, (now + RETRY_SECONDS, key))
+            elif np.isfinite(next_expiry):
+                heapq.heappush(_heap, (next_expiry, key))
+        _swept_rows += len(removed)
+        _last_sweep_at = datetime.fromtimestamp(now, timezone.utc).isoformat()
+    return {"removed": len(removed), "shards": due}
+
+
+# ============ Background Loop ============
+
+def start(check_seconds: Optional[float] = None) -> bool:
+    """Start the sweeper; False if disabled or already running.
+
+    It sleeps until the next expiry, but at most `check_seconds`, so shards
+    written in the meantime are picked up.
+    """
+    global _thread
+    check_seconds = settings.INDEX_EXPIRY_CHECK_SECONDS if check_seconds is None else check_seconds
+    if check_seconds <= 0 or (_thread is not None and _thread.is_alive()):
+        return False
+    _stop.clear()
+    _thread = threading.Thread(target=_loop, args=(check_seconds,), name="index-expiry", daemon=True)
+    _thread.start()
+    return True
+
+
+def stop() -> None:
+    _stop.set()
+
+
+def _loop(check_seconds: float) -> None:
+    while not _stop.is_set():
+        try:
+            sweep_due()
+        except Exception as e:
+            print(f"Warning: index expiry sweep failed: {e}")
+        delay = check_seconds
+        if _heap:
+            delay = min(delay, max(MIN_SLEEP_SECONDS, _heap[0][0] - time.time()))
+        _stop.wait(delay)
+
+
+def stats() -> dict:
+    next_due = _heap[0] if _heap else None
+    return {
+        "running": _thread is not None and _thread.is_alive(),
+        "pending_shards": len(_heap),
+        "next_expiry": (
+            {"shard": next_due[1], "at": datetime.fromtimestamp(next_due[0], timezone.utc).isoformat()}
+            if next_due else None
+        ),
+        "swept_rows": _swept_rows,
+        "last_sweep_at": _last_sweep_at,
+    }
+
+
+# ============ CLI Entry Point ============
+
+if __name__ == "__main__":
+    print(sweep_due())
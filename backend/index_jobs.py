@@ -0,0 +1,104 @@
+"""Background worker for index rebuilds and syncs.
+
+Jobs run one at a time on a dedicated thread, so the event loop and chat
+traffic are never blocked by embedding work. A job builds the next snapshot
+generation off to the side (see index_store.write_shards); readers switch to
+it when the manifest is swapped.
+"""
+
+from __future__ import annotations
+
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Callable, Optional
+
+# Finished jobs kept for status lookups
+MAX_JOBS_KEPT = 50
+ACTIVE_STATUSES = ("queued", "running")
+
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="index-job")
+_jobs: OrderedDict[str, dict] = OrderedDict()
+_lock = threading.Lock()
+# Held while a job runs; other index writers (index_sync) take it too
+_write_lock = threading.Lock()
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def submit(kind: str, fn: Callable[..., dict], university_id: Optional[str] = None) -> dict:
+    """Queue `fn(university_id, progress=...)`; returns the job.
+
+    An identical job that is still queued or running is returned instead of
+    queueing a duplicate.
+    """
+    with _lock:
+        for job in _jobs.values():
+            if job["kind"] == kind and job["university_id"] == university_id and job["status"] in ACTIVE_STATUSES:
+                return dict(job)
+        job = {
+            "id": str(uuid.uuid4()),
+            "kind": kind,
+            "university_id": university_id,
+            "status": "queued",
+            "progress": {"phase": "queued", "done": 0, "total": 0},
+            "result": None,
+            "error": None,
+            "created_at": _now(),
+            "started_at": None,
+            "finished_at": None,
+        }
+        _jobs[job["id"]] = job
+        _trim_locked()
+        snapshot = dict(job)
+    _executor.submit(_run, job["id"], fn, university_id)
+    return snapshot
+
+
+def get(job_id: str) -> Optional[dict]:
+    with _lock:
+        job = _jobs.get(job_id)
+        return dict(job) if job else None
+
+
+def active() -> list[dict]:
+    with _lock:
+        return [dict(job) for job in _jobs.values() if job["status"] in ACTIVE_STATUSES]
+
+
+def exclusive() -> threading.Lock:
+    """Lock serialising index writes with the job worker."""
+    return _write_lock
+
+
+def _update(job_id: str, **fields) -> None:
+    with _lock:
+        job = _jobs.get(job_id)
+        if job:
+            job.update(fields)
+
+
+def _run(job_id: str, fn: Callable[..., dict], university_id: Optional[str]) -> None:
+    _update(job_id, status="running", started_at=_now())
+
+    def progress(phase: str, done: int = 0, total: int = 0) -> None:
+        _update(job_id, progress={"phase": phase, "done": done, "total": total})
+
+    try:
+        with _write_lock:
+            result = fn(university_id, progress=progress)
+        progress("done")
+        _update(job_id, status="completed", result=result, finished_at=_now())
+    except Exception as e:
+        print(f"Warning: index job {job_id} failed: {e}")
+        _update(job_id, status="failed", error=str(e), finished_at=_now())
+
+
+def _trim_locked() -> None:
+    finished = [job_id for job_id, job in _jobs.items() if job["status"] not in ACTIVE_STATUSES]
+    for job_id in finished[: max(0, len(_jobs) - MAX_JOBS_KEPT)]:
+        del _jobs[job_id]
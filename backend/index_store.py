@@ -0,0 +1,908 @@
+"""On-disk snapshots of the RAG index, one shard per university.
+
+Layout under settings.INDEX_DIR:
+
+    manifest.json                      # version + shard table
+    shards/<key>-<stamp>/vectors.npy   # float32, L2-normalised rows
+    shards/<key>-<stamp>/nodes.json    # compact node columns, row-aligned (see node_store)
+    shards/<key>-<stamp>/nodes.npz     #   hashes, dictionary codes, expiry, live flags
+    shards/<key>-<stamp>/texts.bin     #   full text side file, read on demand
+
+Vectors are memory-mapped on load so a cold start only touches the pages a
+query actually needs. Deleted or superseded rows are tombstoned (their node is
+null) and dropped when the shard is compacted.
+
+Incremental changes don't rewrite a shard: apply() keeps the mapped matrix and
+puts new rows after it (AppendedRows), and write_shards() appends them to the
+shard's row-aligned files in place (see row_files), next to a new, small set
+of node columns (nodes-<generation>.json/.npz). Each generation reads just its
+own prefix of those files. Compaction writes a fresh directory.
+
+Optionally a float16 or int8 copy of the matrix (vectors.<dtype>.npy, plus
+per-row scales.npy for int8) is written next to it. Search then scans the
+small matrix and re-scores the best candidates against the float32 rows, so
+only a few full-precision pages are ever touched.
+
+With LINK_ANN_MODE=ivf, large shards also carry an IVF index (see ann_index)
+and queries only score the rows in the closest clusters. A BM25 keyword index
+(see bm25_index) is built in memory from the node text on first use, and
+updated incrementally as changes are applied.
+
+Nodes may carry an `expires_at` (events: their start time). Searches skip
+rows once it has passed, and the manifest records each shard's earliest
+expiry so index_expiry can tombstone them on schedule.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Optional
+
+import numpy as np
+
+from ann_index import IVFIndex
+from bm25_index import BM25Index
+from config import settings
+from node_store import NODES_STEM, TEXT_OFFSETS_FILE, Node, NodeSpill, NodeTable
+from row_files import append_rows, read_rows
+
+SNAPSHOT_VERSION = 3
+# Older snapshots still load (version 2 stored a dict per node)
+READABLE_VERSIONS = (2, 3)
+MANIFEST_FILE = "manifest.json"
+VECTORS_FILE = "vectors.npy"
+VECTORS_SPILL_FILE = "vectors.spill"
+# Rows converted per step when writing matrices that may be memory-mapped
+WRITE_BLOCK_ROWS = 8192
+SCALES_FILE = "scales.npy"
+GLOBAL_SHARD = "_global"
+# Watermark key of the change feed, which reads every university at once
+FEED_WATERMARKS = "_feed"
+COMPACT_DEAD_RATIO = 0.25
+QUANTIZATIONS = ("none", "float16", "int8")
+ANN_MODES = ("exact", "ivf")
+# Below this share of matching rows, a filtered search gathers the matching
+# rows instead of scanning the whole matrix
+SPARSE_FILTER_RATIO = 0.25
+# Rows upcast per block when scanning a quantized matrix; small enough that
+# the float32 buffer stays in cache
+SCAN_BLOCK_ROWS = 1024
+
+_manifest_lock = threading.Lock()
+# Parsed manifest per index dir, keyed by the file's (inode, mtime)
+_manifest_cache: dict[str, tuple[tuple, dict]] = {}
+
+
+def shard_key(university_id: Optional[str]) -> str:
+    """Shard key for a university (documents without one share a global shard)."""
+    return str(university_id) if university_id else GLOBAL_SHARD
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """L2-normalise rows so dot products are cosine similarities."""
+    matrix = np.asarray(matrix, dtype=np.float32)
+    if matrix.ndim != 2 or not len(matrix):
+        return matrix
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def quantized_file(quantization: str) -> str:
+    return f"vectors.{quantization}.npy"
+
+
+def quantize(vectors: np.ndarray, quantization: str) -> tuple[Optional[np.ndarray], Optional[np.ndarray]]:
+    """Scalar-quantize normalised rows; returns (matrix, per-row scales or None)."""
+    if quantization == "float16":
+        return np.asarray(vectors, dtype=np.float16), None
+    if quantization == "int8":
+        vectors = np.asarray(vectors, dtype=np.float32)
+        scales = np.abs(vectors).max(axis=1) / 127.0 if len(vectors) else np.zeros(0, dtype=np.float32)
+        scales = scales.astype(np.float32)
+        safe = np.where(scales == 0, 1.0, scales)[:, None]
+        return np.clip(np.rint(vectors / safe), -127, 127).astype(np.int8), scales
+    return None, None
+
+
+class AppendedRows:
+    """A float32 matrix with rows appended, without copying the base matrix.
+
+    The base is usually the memory-mapped vectors.npy of a loaded shard.
+    Supports what shards do with their vectors: len/shape, slices, row
+    gathers and `@`.
+    """
+
+    ndim = 2
+    dtype = np.dtype(np.float32)
+
+    def __init__(self, base: np.ndarray, added: np.ndarray):
+        if isinstance(base, AppendedRows):
+            base, added = base.base, np.vstack([base.added, added])
+        self.base = base
+        self.added = np.asarray(added, dtype=np.float32)
+        self.shape = (len(base) + len(self.added), int(self.added.shape[1]))
+
+    def __len__(self) -> int:
+        return self.shape[0]
+
+    @property
+    def nbytes(self) -> int:
+        return int(self.base.nbytes + self.added.nbytes)
+
+    def __getitem__(self, index) -> np.ndarray:
+        split = len(self.base)
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step == 1:
+                return np.concatenate([
+                    np.asarray(self.base[start : max(start, min(stop, split))], dtype=np.float32),
+                    self.added[max(start - split, 0) : max(stop - split, 0)],
+                ])
+            index = np.arange(start, stop, step)
+        rows = np.asarray(index)
+        if rows.dtype == bool:
+            rows = np.flatnonzero(rows)
+        rows = np.where(rows < 0, rows + len(self), rows)
+        if rows.ndim == 0:
+            row = int(rows)
+            return np.asarray(self.base[row] if row < split else self.added[row - split], dtype=np.float32)
+        out = np.empty((len(rows), self.shape[1]), dtype=np.float32)
+        in_base = rows < split
+        out[in_base] = self.base[rows[in_base]]
+        out[~in_base] = self.added[rows[~in_base] - split]
+        return out
+
+    def __matmul__(self, other: np.ndarray) -> np.ndarray:
+        return np.concatenate([np.asarray(self.base @ other, dtype=np.float32), self.added @ other])
+
+    def __array__(self, dtype=None, copy=None) -> np.ndarray:
+        matrix = np.concatenate([np.asarray(self.base, dtype=np.float32), self.added])
+        return matrix if dtype is None else matrix.astype(dtype)
+
+
+class Shard:
+    """Embeddings + node metadata for one university.
+
+    Shards are treated as immutable: apply() and compact() return new shards,
+    so readers holding a reference never see a half-applied change.
+    """
+
+    def __init__(
+        self,
+        key: str,
+        vectors: np.ndarray,
+        nodes,
+        embed_model: str = "",
+        quantized: Optional[np.ndarray] = None,
+        scales: Optional[np.ndarray] = None,
+        rescore_factor: int = 4,
+        ann: Optional[IVFIndex] = None,
+        nprobe: int = 8,
+    ):
+        self.key = key
+        self.vectors = vectors
+        # NodeTable (a list of node dicts is converted)
+        self.nodes = NodeTable.coerce(nodes)
+        self.embed_model = embed_model
+        self.quantized = quantized
+        self.scales = scales
+        self.rescore_factor = max(1, rescore_factor)
+        self.ann = ann
+        self.nprobe = nprobe
+        self._rows = self.nodes.row_keys()
+        self._bm25: Optional[BM25Index] = None
+        self._masks: dict[tuple, np.ndarray] = {}
+        # Rows past their expires_at (None if none are), valid until _next_expiry
+        self._expired: Optional[np.ndarray] = None
+        self._next_expiry = -np.inf
+        # Snapshot directory this shard was loaded from ("" if built in memory),
+        # its node columns and the rows of its files that are already on disk
+        self.path = ""
+        self.stem = NODES_STEM
+        self.stored_rows = 0
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    @property
+    def dead_ratio(self) -> float:
+        return 1.0 - len(self._rows) / len(self.nodes) if len(self.nodes) else 0.0
+
+    def get(self, key: str) -> Optional[Node]:
+        row = self._rows.get(key)
+        return self.nodes[row] if row is not None else None
+
+    def text(self, key: str) -> Optional[str]:
+        """Full text of a node, read from the snapshot's side file."""
+        row = self._rows.get(key)
+        return self.nodes.text(row) if row is not None else None
+
+    def keys(self) -> list[str]:
+        return list(self._rows.keys())
+
+    def is_written(self, entry: dict) -> bool:
+        """True if this shard was loaded from the files a manifest entry points at."""
+        return bool(self.path) and self.path == entry.get("path") and self.stem == entry.get("nodes", NODES_STEM)
+
+    @property
+    def quantization(self) -> str:
+        if self.quantized is None:
+            return "none"
+        return "int8" if self.quantized.dtype == np.int8 else "float16"
+
+    def expired_rows(self, now: Optional[float] = None) -> Optional[np.ndarray]:
+        """Mask of live rows whose expires_at has passed, or None if none have.
+
+        Recomputed only when the clock passes the next expiry, so this is
+        O(1) on the query path.
+        """
+        now = time.time() if now is None else now
+        if now < self._next_expiry:
+            return self._expired
+        expires = self.nodes.expires
+        expired = expires <= now
+        upcoming = expires[~expired]
+        self._next_expiry = float(upcoming.min()) if len(upcoming) else np.inf
+        self._expired = expired if expired.any() else None
+        # Cached filter masks exclude expired rows
+        self._masks.clear()
+        return self._expired
+
+    def allowed_rows(self, filters: Optional[dict] = None) -> np.ndarray:
+        """Boolean mask of live, unexpired rows matching `filters` (cached per filter).
+
+        filters: {"types": [...], "category": str | [...], "consent": [...]}.
+        category must match (case-insensitively); consent only constrains
+        link_fact rows.
+        """
+        expired = self.expired_rows()
+        key = filter_key(filters)
+        mask = self._masks.get(key)
+        if mask is None:
+            mask = self.nodes.matches(*key)
+            if expired is not None:
+                mask &= ~expired
+            self._masks[key] = mask
+        return mask
+
+    def search(
+        self,
+        query_vector: list[float],
+        top_k: int,
+        exact: bool = False,
+        filters: Optional[dict] = None,
+    ) -> list[tuple[dict, float]]:
+        """Cosine top-k over the live rows of the shard that match `filters`.
+
+        Filters are applied inside the scan, so every slot is a usable row.
+        With an IVF index only rows in the nprobe closest clusters are
+        scored. With a quantized matrix, the top top_k * rescore_factor
+        candidates are re-scored in float32. exact=True scans every float32
+        row.
+        """
+        if not self._rows or top_k <= 0:
+            return []
+        query = normalize_rows(np.asarray([query_vector], dtype=np.float32))[0]
+        if query.shape[0] != self.vectors.shape[1]:
+            return []
+        allowed = self.allowed_rows(filters)
+        allowed_count = int(allowed.sum())
+        if not allowed_count:
+            return []
+        k = min(top_k, allowed_count)
+        if exact or (self.quantized is None and self.ann is None):
+            if allowed_count < len(self.nodes) * SPARSE_FILTER_RATIO:
+                rows = np.flatnonzero(allowed)
+                scores = np.asarray(self.vectors[rows], dtype=np.float32) @ query
+                top = _top_k(scores, k)
+                return [(self.nodes[rows[i]], float(scores[i])) for i in top]
+            scores = self.vectors @ query
+            scores[~allowed] = -np.inf
+            top = _top_k(scores, k)
+            return [(self.nodes[i], float(scores[i])) for i in top]
+
+        if allowed_count < len(self.nodes) * SPARSE_FILTER_RATIO:
+            # Selective filter: gather the matching rows instead of scanning
+            # (or probing, which could miss most of them)
+            rows = np.flatnonzero(allowed)
+            coarse = self._coarse_scores(query, rows)
+        elif self.ann is not None:
+            rows = self.ann.probe(query, self.nprobe)
+            rows = rows[allowed[rows]]
+            if not len(rows):
+                return []
+            coarse = self._coarse_scores(query, rows)
+        else:
+            rows = np.arange(len(self.nodes))
+            coarse = self._coarse_scores(query)
+            coarse[~allowed] = -np.inf
+
+        candidate_count = min(allowed_count, len(rows))
+        if self.quantized is None:
+            # Coarse scores are already exact float32
+            top = _top_k(coarse, min(k, candidate_count))
+            return [(self.nodes[rows[i]], float(coarse[i])) for i in top]
+
+        candidates = rows[_top_k(coarse, min(candidate_count, k * self.rescore_factor))]
+        candidates.sort()  # sequential reads from the memory map
+        exact_scores = np.asarray(self.vectors[candidates], dtype=np.float32) @ query
+        order = np.argsort(-exact_scores)[:k]
+        return [(self.nodes[candidates[i]], float(exact_scores[i])) for i in order]
+
+    @property
+    def bm25(self) -> BM25Index:
+        if self._bm25 is None:
+            # Reads the full text side file; shards derived by apply() and
+            # compact() carry the index over instead
+            self._bm25 = BM25Index(self.nodes.texts())
+        return self._bm25
+
+    def share_bm25(self, source: "Shard") -> None:
+        """Reuse `source`'s built BM25 index; both shards must hold the same rows."""
+        if source._bm25 is not None and source._bm25.size == len(self.nodes):
+            self._bm25 = source._bm25
+
+    def keyword_mask(self, filters: Optional[dict] = None) -> Optional[np.ndarray]:
+        """Rows BM25 may return: None (all) unless filters or expired rows restrict them."""
+        return self.allowed_rows(filters) if filters or self.expired_rows() is not None else None
+
+    def keyword_search(
+        self, query: str, top_k: int, filters: Optional[dict] = None
+    ) -> list[tuple[dict, float, float]]:
+        """BM25 top-k as (node, bm25 score, coverage); no embedding needed."""
+        if not self._rows:
+            return []
+        allowed = self.keyword_mask(filters)
+        return [
+            (self.nodes[row], score, coverage)
+            for row, score, coverage in self.bm25.search(query, top_k, allowed=allowed)
+        ]
+
+    def _coarse_scores(self, query: np.ndarray, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        matrix = self.quantized if self.quantized is not None else self.vectors
+        if rows is not None:
+            scores = np.asarray(matrix[rows], dtype=np.float32) @ query
+            if self.scales is not None:
+                scores *= self.scales[rows]
+            return scores
+        scores = np.empty(len(matrix), dtype=np.float32)
+        buffer = np.empty((min(SCAN_BLOCK_ROWS, len(matrix)), len(query)), dtype=np.float32)
+        for start in range(0, len(matrix), SCAN_BLOCK_ROWS):
+            block = matrix[start : start + SCAN_BLOCK_ROWS]
+            np.copyto(buffer[: len(block)], block)
+            scores[start : start + len(block)] = buffer[: len(block)] @ query
+        if self.scales is not None:
+            scores *= self.scales
+        return scores
+
+    def memory_report(self) -> dict:
+        """Bytes held by the shard's matrices (float32 is memory-mapped when loaded)."""
+        float32_bytes = int(self.vectors.nbytes)
+        quantized_bytes = int(self.quantized.nbytes) if self.quantized is not None else 0
+        scales_bytes = int(self.scales.nbytes) if self.scales is not None else 0
+        return {
+            "rows": len(self.nodes),
+            "live": len(self._rows),
+            "dim": int(self.vectors.shape[1]) if self.vectors.ndim == 2 else 0,
+            "quantization": self.quantization,
+            "float32_bytes": float32_bytes,
+            "float32_memory_mapped": isinstance(self.vectors, np.memmap),
+            "quantized_bytes": quantized_bytes + scales_bytes,
+            "scan_bytes": quantized_bytes + scales_bytes if self.quantized is not None else float32_bytes,
+            "ann": f"ivf(nlist={self.ann.nlist}, nprobe={self.nprobe})" if self.ann is not None else "exact",
+            "ann_bytes": self.ann.memory_bytes() if self.ann is not None else 0,
+            "node_bytes": self.nodes.memory_bytes(),
+        }
+
+    def apply(self, upserts: list[tuple[dict, np.ndarray]], deletes: list[str]) -> "Shard":
+        """Return a new shard with rows upserted (by node key) and deleted.
+
+        Upserts are node dicts (rag_index._node_record) with their vectors.
+        Replaced and deleted rows are tombstoned; new rows are appended after
+        the existing matrix, which is not copied (write_shards appends them to
+        the snapshot files).
+        """
+        dead = [self._rows[key] for key in deletes if key in self._rows]
+        dead += [self._rows[node["key"]] for node, _ in upserts if node["key"] in self._rows]
+        dead = list(dict.fromkeys(dead))
+        nodes = self.nodes.apply(dead, [node for node, _ in upserts])
+        new_vectors = [np.asarray(vector, dtype=np.float32) for _, vector in upserts]
+        vectors = self.vectors
+        ann = self.ann
+        if new_vectors:
+            added = normalize_rows(np.vstack(new_vectors))
+            vectors = AppendedRows(vectors, added) if len(vectors) else added
+            # Incremental insert: new rows join their nearest existing cluster
+            ann = ann.extend(added) if ann is not None else None
+        shard = Shard(self.key, vectors, nodes, embed_model=self.embed_model, ann=ann, nprobe=self.nprobe)
+        shard.path, shard.stem, shard.stored_rows = self.path, self.stem, self.stored_rows
+        if self._bm25 is not None:
+            # Only the replaced and new rows are tokenized
+            shard._bm25 = self._bm25.apply(
+                dead, [self.nodes.text(row) for row in dead], [node.get("text") for node, _ in upserts]
+            )
+        return shard.compact() if shard.dead_ratio > COMPACT_DEAD_RATIO else shard
+
+    def compact(self) -> "Shard":
+        """Return a copy of the shard without tombstoned rows."""
+        live = np.flatnonzero(self.nodes.live).tolist()
+        if len(live) == len(self.nodes):
+            return self
+        vectors = np.asarray(self.vectors[live], dtype=np.float32) if live else np.zeros((0, 0), dtype=np.float32)
+        ann = self.ann.select(live) if self.ann is not None and live else None
+        shard = Shard(
+            self.key, vectors, self.nodes.select(live), embed_model=self.embed_model, ann=ann, nprobe=self.nprobe
+        )
+        if self._bm25 is not None:
+            shard._bm25 = self._bm25.select(live)
+        return shard
+
+
+def filter_key(filters: Optional[dict]) -> tuple:
+    """Hashable, normalised form of a search filter dict."""
+    filters = filters or {}
+
+    def _values(value) -> Optional[frozenset]:
+        if not value:
+            return None
+        values = [value] if isinstance(value, str) else value
+        return frozenset(str(v).lower() for v in values)
+
+    return (_values(filters.get("types")), _values(filters.get("category")), _values(filters.get("consent")))
+
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top])]
+
+
+def recall_at_k(shard: Shard, queries: np.ndarray, top_k: int = 5) -> dict:
+    """Compare shard.search against an exact float32 scan for sample queries."""
+    hits = total = 0
+    approx_ms = exact_ms = 0.0
+    for query in queries:
+        started = time.perf_counter()
+        exact = {node["key"] for node, _ in shard.search(query, top_k, exact=True)}
+        exact_ms += (time.perf_counter() - started) * 1000
+        started = time.perf_counter()
+        approx = {node["key"] for node, _ in shard.search(query, top_k)}
+        approx_ms += (time.perf_counter() - started) * 1000
+        hits += len(exact & approx)
+        total += len(exact)
+    n = max(len(queries), 1)
+    return {
+        "queries": len(queries),
+        "top_k": top_k,
+        "recall": round(hits / total, 4) if total else 1.0,
+        "search_ms": round(approx_ms / n, 3),
+        "exact_ms": round(exact_ms / n, 3),
+    }
+
+
+# ============ Manifest ============
+
+def _index_dir(directory: Optional[str] = None) -> str:
+    return directory or settings.INDEX_DIR
+
+
+def read_manifest(directory: Optional[str] = None) -> Optional[dict]:
+    """Read the snapshot manifest, or None if no compatible snapshot exists."""
+    path = os.path.join(_index_dir(directory), MANIFEST_FILE)
+    try:
+        with open(path, "r", encoding="utf-8") as fh:
+            manifest = json.load(fh)
+    except (OSError, ValueError):
+        return None
+    if manifest.get("version") not in READABLE_VERSIONS:
+        print(f"Warning: ignoring index snapshot with version {manifest.get('version')}")
+        return None
+    return manifest
+
+
+def _write_manifest(root: str, manifest: dict) -> None:
+    fd, tmp_path = tempfile.mkstemp(dir=root, prefix=".manifest-", suffix=".json")
+    with os.fdopen(fd, "w", encoding="utf-8") as fh:
+        json.dump(manifest, fh)
+    os.replace(tmp_path, os.path.join(root, MANIFEST_FILE))
+
+
+def current_manifest(directory: Optional[str] = None) -> dict:
+    """The live manifest ({} if none), re-read only when the file is replaced.
+
+    Writers swap the manifest with os.replace, so a new inode means a new
+    generation; this costs a stat() per call on the query path.
+    """
+    root = _index_dir(directory)
+    try:
+        st = os.stat(os.path.join(root, MANIFEST_FILE))
+    except OSError:
+        return {}
+    stamp = (st.st_ino, st.st_mtime_ns, st.st_size)
+    cached = _manifest_cache.get(root)
+    if cached and cached[0] == stamp:
+        return cached[1]
+    manifest = read_manifest(root) or {}
+    _manifest_cache[root] = (stamp, manifest)
+    return manifest
+
+
+def generation(directory: Optional[str] = None) -> int:
+    """Snapshot generation (0 if there is no snapshot yet)."""
+    return int(current_manifest(directory).get("generation") or 0)
+
+
+def shard_entry(key: str, directory: Optional[str] = None) -> Optional[dict]:
+    return (current_manifest(directory).get("shards") or {}).get(key)
+
+
+def shard_keys(directory: Optional[str] = None) -> list[str]:
+    """List the shard keys present in the current snapshot."""
+    return list((current_manifest(directory).get("shards") or {}).keys())
+
+
+def watermarks(directory: Optional[str] = None) -> dict[str, dict[str, str]]:
+    """Change-feed watermarks ({key: {table: updated_at}}) the snapshot is current to.
+
+    Full builds record one entry per shard key; the change feed keeps its own
+    under FEED_WATERMARKS.
+    """
+    return current_manifest(directory).get("watermarks") or {}
+
+
+# ============ Write ============
+
+def _ann_for_write(vectors: np.ndarray, nodes: NodeTable, ann: Optional[IVFIndex]) -> Optional[IVFIndex]:
+    """Reuse an incrementally-extended IVF index, or (re)train one."""
+    if _ann_mode() != "ivf" or len(nodes) < settings.ANN_MIN_ROWS:
+        return None
+    if ann is not None and len(ann.assignments) == len(nodes) and not ann.needs_retrain():
+        return ann
+    return IVFIndex.train(vectors, nlist=settings.ANN_NLIST or None)
+
+
+def _new_shard_path(root: str, key: str) -> str:
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%f")
+    rel_path = os.path.join("shards", f"{key}-{stamp}")
+    os.makedirs(os.path.join(root, rel_path), exist_ok=True)
+    return rel_path
+
+
+def _save_vectors(path: str, vectors: np.ndarray) -> None:
+    """Write vectors.npy block by block, so `vectors` can be memory-mapped."""
+    if not len(vectors):
+        np.save(os.path.join(path, VECTORS_FILE), np.asarray(vectors, dtype=np.float32))
+        return
+    out = np.lib.format.open_memmap(
+        os.path.join(path, VECTORS_FILE), mode="w+", dtype=np.float32, shape=tuple(vectors.shape)
+    )
+    for start in range(0, len(vectors), WRITE_BLOCK_ROWS):
+        out[start : start + WRITE_BLOCK_ROWS] = vectors[start : start + WRITE_BLOCK_ROWS]
+    out.flush()
+    del out
+
+
+def _save_quantized(path: str, vectors: np.ndarray, quantization: str) -> None:
+    """Write the quantized copy block by block, so `vectors` can be memory-mapped."""
+    if quantization not in ("float16", "int8") or not len(vectors):
+        quantized, scales = quantize(vectors, quantization)
+        if quantized is not None:
+            np.save(os.path.join(path, quantized_file(quantization)), quantized)
+        if scales is not None:
+            np.save(os.path.join(path, SCALES_FILE), scales)
+        return
+    dtype = np.float16 if quantization == "float16" else np.int8
+    out = np.lib.format.open_memmap(
+        os.path.join(path, quantized_file(quantization)), mode="w+", dtype=dtype, shape=tuple(vectors.shape)
+    )
+    scales = np.zeros(len(vectors), dtype=np.float32)
+    for start in range(0, len(vectors), WRITE_BLOCK_ROWS):
+        block, block_scales = quantize(vectors[start : start + WRITE_BLOCK_ROWS], quantization)
+        out[start : start + len(block)] = block
+        if block_scales is not None:
+            scales[start : start + len(block)] = block_scales
+    out.flush()
+    del out
+    if quantization == "int8":
+        np.save(os.path.join(path, SCALES_FILE), scales)
+
+
+def _write_shard_files(
+    root: str,
+    key: str,
+    vectors: np.ndarray,
+    nodes: NodeTable,
+    quantization: str,
+    ann: Optional[IVFIndex] = None,
+) -> str:
+    rel_path = _new_shard_path(root, key)
+    path = os.path.join(root, rel_path)
+    _save_vectors(path, vectors)
+    _save_quantized(path, vectors, quantization)
+    if ann is not None:
+        ann.save(path)
+    nodes.save(path)
+    return rel_path
+
+
+def _can_append(root: str, entry: Optional[dict], shard: Shard, quantization: str, ann: Optional[IVFIndex]) -> bool:
+    """True if `shard` only adds rows to the files of its current manifest entry."""
+    if not entry or not shard.stored_rows or not shard.is_written(entry):
+        return False
+    if entry.get("rows") != shard.stored_rows or entry.get("dim") != shard.vectors.shape[1]:
+        return False
+    if entry.get("quantization") != quantization:
+        return False
+    if not os.path.exists(os.path.join(root, entry["path"], TEXT_OFFSETS_FILE)):
+        # Version 2 snapshot (nodes.json only)
+        return False
+    if ann is None:
+        return entry.get("ann") is None
+    # The files hold this index's centroids unless it was retrained since
+    return ann is shard.ann and entry.get("ann") == {"nlist": ann.nlist, "trained_rows": ann.trained_rows}
+
+
+def _append_shard_files(
+    path: str, shard: Shard, quantization: str, ann: Optional[IVFIndex], stem: str
+) -> None:
+    """Append the rows added since `shard` was loaded, and write its columns under `stem`."""
+    start = shard.stored_rows
+    added = np.asarray(shard.vectors[start:], dtype=np.float32)
+    append_rows(os.path.join(path, VECTORS_FILE), start, added)
+    quantized, scales = quantize(added, quantization)
+    if quantized is not None:
+        append_rows(os.path.join(path, quantized_file(quantization)), start, quantized)
+    if scales is not None:
+        append_rows(os.path.join(path, SCALES_FILE), start, scales)
+    if ann is not None:
+        ann.append(path, start)
+    shard.nodes.append(path, start, stem)
+
+
+class ShardSpill:
+    """A shard written to its new directory as rows are embedded.
+
+    Full builds append each batch's vectors, texts and node records to files
+    (see node_store.NodeSpill), so memory holds one batch rather than the
+    whole campus. write_shards() finishes the spill: the vectors are copied
+    into vectors.npy, the quantized copy and IVF index are built from the
+    memory-mapped matrix, and only the node columns (ids, names, previews,
+    codes) are held in memory, one shard at a time.
+    """
+
+    def __init__(self, key: str, directory: Optional[str] = None):
+        root = _index_dir(directory)
+        self.key = key
+        self.rel_path = _new_shard_path(root, key)
+        self.path = os.path.join(root, self.rel_path)
+        self.rows = 0
+        self.dim = 0
+        self._vectors = open(os.path.join(self.path, VECTORS_SPILL_FILE), "wb")
+        self._nodes = NodeSpill(self.path)
+
+    def append(self, vectors: np.ndarray, records: list[dict]) -> None:
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        if len(vectors):
+            self.dim = int(vectors.shape[1])
+        self._vectors.write(vectors.tobytes())
+        self.rows += len(vectors)
+        self._nodes.append(records)
+
+    def finish(self, quantization: str) -> tuple[np.ndarray, NodeTable, Optional[IVFIndex]]:
+        """Write the snapshot files; returns the memory-mapped vectors, nodes and ANN index."""
+        self._vectors.close()
+        spill = os.path.join(self.path, VECTORS_SPILL_FILE)
+        vectors_path = os.path.join(self.path, VECTORS_FILE)
+        if self.rows:
+            raw = np.memmap(spill, dtype=np.float32, mode="r", shape=(self.rows, self.dim))
+            _save_vectors(self.path, raw)
+            del raw
+        else:
+            np.save(vectors_path, np.zeros((0, 0), dtype=np.float32))
+        os.remove(spill)
+        vectors = np.load(vectors_path, mmap_mode="r")
+        nodes = self._nodes.finish()
+        _save_quantized(self.path, vectors, quantization)
+        ann = _ann_for_write(vectors, nodes, None)
+        if ann is not None:
+            ann.save(self.path)
+        return vectors, nodes, ann
+
+    def discard(self) -> None:
+        """Drop a spill that will not be written (the build failed)."""
+        self._vectors.close()
+        self._nodes.close()
+        shutil.rmtree(self.path, ignore_errors=True)
+
+
+def _next_expiry(nodes: NodeTable) -> Optional[str]:
+    """Earliest expires_at among live nodes (ISO), for the expiry sweeper."""
+    expires = nodes.expires[nodes.live]
+    soonest = float(expires.min()) if len(expires) else np.inf
+    return datetime.fromtimestamp(soonest, timezone.utc).isoformat() if np.isfinite(soonest) else None
+
+
+def write_shards(
+    shards: dict[str, tuple],
+    embed_model: str,
+    replace_all: bool = False,
+    directory: Optional[str] = None,
+    watermarks: Optional[dict[str, dict[str, str]]] = None,
+) -> dict:
+    """Persist shards and atomically point the manifest at them.
+
+    Values are (vectors, nodes) or (vectors, nodes, ivf_index), nodes being
+    a NodeTable or a list of node dicts, a ShardSpill to finish, or a Shard.
+    A Shard derived by apply() from the current generation's files only
+    appends its new rows to them (see _can_append); anything else is written
+    to a new directory. With
+    replace_all, shards missing from `shards` are dropped from the snapshot.
+    `watermarks` are merged per key and table into the manifest (None
+    clears a table's mark), so they are swapped in together with the rows
+    they describe. The change feed's own marks (FEED_WATERMARKS) survive
+    replace_all: a rebuild doesn't reset where the feed left off.
+    """
+    root = _index_dir(directory)
+    quantization = _quantization()
+    os.makedirs(os.path.join(root, "shards"), exist_ok=True)
+    with _manifest_lock:
+        manifest = read_manifest(root) or {"version": SNAPSHOT_VERSION, "shards": {}}
+        previous = dict(manifest.get("shards") or {})
+        table = {} if replace_all else dict(previous)
+        marks = {
+            key: tables for key, tables in (manifest.get("watermarks") or {}).items()
+            if not replace_all or key == FEED_WATERMARKS
+        }
+        for key, tables in (watermarks or {}).items():
+            merged = {**marks.get(key, {}), **tables}
+            marks[key] = {table: mark for table, mark in merged.items() if mark is not None}
+        built_at = datetime.now(timezone.utc).isoformat()
+        generation = int(manifest.get("generation") or 0) + 1
+        for key, value in shards.items():
+            stem = NODES_STEM
+            if isinstance(value, ShardSpill):
+                rel_path = value.rel_path
+                vectors, nodes, ann = value.finish(quantization)
+            elif isinstance(value, Shard):
+                vectors, nodes = value.vectors, value.nodes
+                ann = _ann_for_write(vectors, nodes, value.ann)
+                if _can_append(root, previous.get(key), value, quantization, ann):
+                    rel_path, stem = value.path, f"{NODES_STEM}-{generation}"
+                    _append_shard_files(os.path.join(root, rel_path), value, quantization, ann, stem)
+                else:
+                    rel_path = _write_shard_files(root, key, vectors, nodes, quantization, ann)
+            else:
+                vectors, nodes, *rest = value
+                nodes = NodeTable.coerce(nodes)
+                ann = _ann_for_write(vectors, nodes, rest[0] if rest else None)
+                rel_path = _write_shard_files(root, key, vectors, nodes, quantization, ann)
+            table[key] = {
+                "path": rel_path,
+                "nodes": stem,
+                "count": int(nodes.live.sum()),
+                "rows": len(nodes),
+                "dim": int(vectors.shape[1]) if vectors.ndim == 2 else 0,
+                "embed_model": embed_model,
+                "quantization": quantization,
+                "ann": {"nlist": ann.nlist, "trained_rows": ann.trained_rows} if ann is not None else None,
+                "next_expiry": _next_expiry(nodes),
+                "built_at": built_at,
+            }
+        manifest = {
+            "version": SNAPSHOT_VERSION,
+            # Bumped on every write so caches keyed on it go stale
+            "generation": generation,
+            "updated_at": built_at,
+            "shards": table,
+            "watermarks": {
+                key: tables for key, tables in marks.items() if key in table or key == FEED_WATERMARKS
+            },
+        }
+        _write_manifest(root, manifest)
+
+        # Old shard directories (and node columns replaced by an append) are
+        # unreferenced now; readers that already memory-mapped them keep their
+        # open file handles, and node columns are read into memory on load.
+        live = {entry["path"]: entry.get("nodes", NODES_STEM) for entry in table.values()}
+        for entry in previous.values():
+            path, stem = entry.get("path"), entry.get("nodes", NODES_STEM)
+            if path not in live:
+                shutil.rmtree(os.path.join(root, path), ignore_errors=True)
+            elif live[path] != stem:
+                for name in (f"{stem}.json", f"{stem}.npz"):
+                    try:
+                        os.remove(os.path.join(root, path, name))
+                    except OSError:
+                        pass
+    return manifest
+
+
+# ============ Read ============
+
+def _quantization() -> str:
+    quantization = (settings.VECTOR_QUANTIZATION or "none").lower()
+    if quantization not in QUANTIZATIONS:
+        print(f"Warning: unknown LINK_VECTOR_QUANTIZATION {quantization!r}, using none")
+        return "none"
+    return quantization
+
+
+def _ann_mode() -> str:
+    mode = (settings.ANN_MODE or "exact").lower()
+    if mode not in ANN_MODES:
+        print(f"Warning: unknown LINK_ANN_MODE {mode!r}, using exact")
+        return "exact"
+    return mode
+
+
+def _load_ann(path: str, entry: dict, vectors: np.ndarray) -> Optional[IVFIndex]:
+    if _ann_mode() != "ivf" or len(vectors) < settings.ANN_MIN_ROWS:
+        return None
+    trained_rows = (entry.get("ann") or {}).get("trained_rows")
+    ann = IVFIndex.load(path, trained_rows=trained_rows, rows=len(vectors))
+    if ann is None or len(ann.assignments) != len(vectors):
+        # Snapshot written in exact mode: train in memory
+        ann = IVFIndex.train(vectors, nlist=settings.ANN_NLIST or None)
+    return ann
+
+
+def _load_quantized(path: str, vectors: np.ndarray, quantization: str) -> tuple[Optional[np.ndarray], Optional[np.ndarray]]:
+    """Load the shard's quantized matrix, quantizing in memory if the snapshot
+    was written with a different setting."""
+    if quantization == "none":
+        return None, None
+    try:
+        # Appended files may hold rows of later generations past this one's
+        rows = len(vectors)
+        quantized = read_rows(os.path.join(path, quantized_file(quantization)), rows, mmap=False)
+        scales = read_rows(os.path.join(path, SCALES_FILE), rows, mmap=False) if quantization == "int8" else None
+        return quantized, scales
+    except (OSError, ValueError):
+        return quantize(vectors, quantization)
+
+def load_shard(
+    key: str,
+    embed_model: Optional[str] = None,
+    directory: Optional[str] = None,
+) -> Optional[Shard]:
+    """Memory-map a shard from the current snapshot."""
+    root = _index_dir(directory)
+    manifest = read_manifest(root)
+    entry = ((manifest or {}).get("shards") or {}).get(key)
+    if not entry:
+        return None
+    if embed_model and entry.get("embed_model") and entry["embed_model"] != embed_model:
+        print(
+            f"Warning: shard {key} was built with {entry['embed_model']}, "
+            f"current model is {embed_model}; rebuild the index"
+        )
+        return None
+    path = os.path.join(root, entry["path"])
+    try:
+        nodes = NodeTable.load(path, stem=entry.get("nodes", NODES_STEM))
+        vectors = read_rows(os.path.join(path, VECTORS_FILE), len(nodes))
+    except (OSError, ValueError) as e:
+        print(f"Warning: could not load shard {key}: {e}")
+        return None
+    quantized, scales = _load_quantized(path, vectors, _quantization())
+    shard = Shard(
+        key,
+        vectors,
+        nodes,
+        embed_model=entry.get("embed_model") or "",
+        quantized=quantized,
+        scales=scales,
+        rescore_factor=settings.RESCORE_FACTOR,
+        ann=_load_ann(path, entry, vectors),
+        nprobe=settings.ANN_NPROBE,
+    )
+    shard.path = entry["path"]
+    shard.stem = entry.get("nodes", NODES_STEM)
+    shard.stored_rows = len(nodes)
+    return shard
@@ -0,0 +1,507 @@
+"""Change-data-capture sync of the RAG index.
+
+A background thread wakes every LINK_INDEX_SYNC_INTERVAL_SECONDS and, for
+each source table, pulls only the rows whose updated_at is at or past that
+table's watermark (rewound by LINK_INDEX_SYNC_OVERLAP_SECONDS for
+transactions that commit late). The feed reads every university at once and
+routes each row to its university's shard, creating the shard the first time
+a university has something to index. Changed rows are re-embedded, rows that
+stopped being indexable (hidden profiles, private orgs, soft-deleted posts,
+revoked consent) are tombstoned, and hard deletes come from the
+link_index_deletions feed (database/006_index_change_feed.sql). Rows that
+move to another university are recorded there against the old one
+(database/010_index_feed_moves.sql). There are no full rebuilds.
+
+Watermarks are stored in the snapshot manifest together with the rows they
+cover, so a restart resumes where the last applied change left off. Full
+builds keep the feed's marks and record their own from the clock before they
+started, leaving out tables with documents that failed to embed.
+
+`python -m index_sync simulate` runs the loop against an in-memory database
+and a fake clock and reports how stale the index gets.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Optional
+
+from config import settings
+import index_jobs
+import index_store
+import rag_index
+import supabase_client as db
+
+DELETIONS_FEED = "link_index_deletions"
+# Source table -> document type (link_index_deletions.table_name uses table names)
+DOC_TYPES = {
+    "profiles": "profile",
+    "organizations": "organization",
+    "events": "event",
+    "link_facts": "link_fact",
+    "posts": "post",
+}
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _parse_ts(value: str) -> datetime:
+    if value.endswith("Z"):
+        value = value.replace("Z", "+00:00")
+    parsed = datetime.fromisoformat(value)
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def _doc_key(doc_type: str, row_id) -> str:
+    # Same "type:id" keys as rag_index._doc_key
+    return f"{doc_type}:{row_id}"
+
+
+# ============ Indexability ============
+# These mirror the filters of the supabase_client _*_query helpers; the change
+# feed returns rows unfiltered so that rows leaving the index are seen too.
+
+def _profile_indexable(row: dict, now: datetime) -> bool:
+    return (
+        not row.get("is_link")
+        and row.get("friends_visibility") in ("school", "public")
+        and row.get("yearbook_visible") is True
+    )
+
+
+def _org_indexable(row: dict, now: datetime) -> bool:
+    return row.get("is_public") is True
+
+
+def _event_indexable(row: dict, now: datetime) -> bool:
+    start_at = row.get("start_at")
+    try:
+        upcoming = bool(start_at) and _parse_ts(start_at) >= now
+    except ValueError:
+        upcoming = False
+    return upcoming and row.get("visibility") in ("public", "school")
+
+
+def _fact_indexable(row: dict, now: datetime) -> bool:
+    return row.get("consent_status") == "opt_in"
+
+
+def _post_indexable(row: dict, now: datetime) -> bool:
+    return (row.get("forums") or {}).get("is_public") is True and not row.get("deleted_at")
+
+
+# table -> (document creator, indexable predicate)
+FEEDS: dict[str, tuple[Callable, Callable[[dict, datetime], bool]]] = {
+    "profiles": (rag_index.create_profile_document, _profile_indexable),
+    "organizations": (rag_index.create_org_document, _org_indexable),
+    "events": (rag_index.create_event_document, _event_indexable),
+    "link_facts": (rag_index.create_fact_document, _fact_indexable),
+    "posts": (rag_index.create_post_document, _post_indexable),
+}
+
+
+# ============ Change Sync ============
+
+class ChangeSync:
+    """Pulls changed rows past each table's watermark and applies them.
+
+    `source` provides iter_changed_rows (supabase_client, or FakeDB in the
+    simulation) and `clock` returns the current UTC time.
+    """
+
+    def __init__(self, source=db, clock: Callable[[], datetime] = _utcnow, overlap_seconds: Optional[float] = None):
+        self.source = source
+        self.clock = clock
+        overlap = settings.INDEX_SYNC_OVERLAP_SECONDS if overlap_seconds is None else overlap_seconds
+        self.overlap = timedelta(seconds=max(0.0, overlap))
+        # Watermarks advanced by runs that had nothing to write (not in the
+        # manifest); only trusted while the snapshot generation is unchanged,
+        # since a rebuild may have cleared marks
+        self._marks: dict[str, str] = {}
+        self._marks_generation = None
+        self.runs = 0
+        self.errors = 0
+        self.rows_pulled = 0
+        self.last_run_at: Optional[str] = None
+        self.last_changes: Optional[dict] = None
+        self.last_lag_seconds: Optional[float] = None
+        self.max_lag_seconds = 0.0
+
+    def watermark(self, table: str) -> Optional[str]:
+        stored = index_store.watermarks()
+        mark = stored.get(index_store.FEED_WATERMARKS, {}).get(table)
+        if mark is None:
+            # Full builds only record per-shard marks; the snapshot is current
+            # to the oldest, provided every shard has one
+            shard_marks = [stored.get(key, {}).get(table) for key in index_store.shard_keys()]
+            if shard_marks and all(shard_marks):
+                mark = min(shard_marks, key=_parse_ts)
+        held = self._marks.get(table) if self._marks_generation == index_store.generation() else None
+        candidates = [mark for mark in (mark, held) if mark]
+        return max(candidates, key=_parse_ts) if candidates else None
+
+    def _since(self, mark: Optional[str]) -> Optional[str]:
+        return (_parse_ts(mark) - self.overlap).isoformat() if mark else None
+
+    def run_once(self) -> dict:
+        """Pull and apply one round of changes across every university."""
+        with index_jobs.exclusive():
+            return self._run()
+
+    def _run(self) -> dict:
+        now = self.clock()
+        batch = _Batch()
+        marks: dict[str, str] = {}
+        oldest_change: Optional[datetime] = None
+        pulled = 0
+
+        for table, (_, _, ts_column) in db.CHANGE_FEEDS.items():
+            mark = self.watermark(table)
+            newest = mark
+            try:
+                for row in self.source.iter_changed_rows(table, self._since(mark), all_universities=True):
+                    pulled += 1
+                    changed_at = row[ts_column]
+                    newest = max(newest or changed_at, changed_at, key=_parse_ts)
+                    # Rows re-read through the overlap window aren't new changes
+                    if mark and _parse_ts(changed_at) > _parse_ts(mark):
+                        changed = _parse_ts(changed_at)
+                        oldest_change = min(oldest_change or changed, changed)
+                    self._collect(table, row, changed_at, now, batch)
+            except Exception as e:
+                print(f"Warning: index change feed failed for {table}: {e}")
+                self.errors += 1
+                continue
+            if newest:
+                marks[table] = newest
+
+        changes = None
+        removed = batch.removed()
+        if batch.documents or removed:
+            changes = rag_index.apply_changes(
+                batch.documents, removed, watermarks={index_store.FEED_WATERMARKS: marks}
+            )
+        # Rows that failed to embed are pulled again next run
+        if not changes or not changes["failed"]:
+            generation = index_store.generation()
+            if generation != self._marks_generation:
+                self._marks, self._marks_generation = {}, generation
+            self._marks.update(marks)
+
+        self.runs += 1
+        self.rows_pulled += pulled
+        self.last_run_at = now.isoformat()
+        self.last_changes = changes
+        if oldest_change is not None:
+            self.last_lag_seconds = round((self.clock() - oldest_change).total_seconds(), 3)
+            self.max_lag_seconds = max(self.max_lag_seconds, self.last_lag_seconds)
+        return {"pulled": pulled, "changes": changes, "lag_seconds": self.last_lag_seconds}
+
+    def _collect(self, table: str, row: dict, changed_at: str, now: datetime, batch: "_Batch") -> None:
+        if table == DELETIONS_FEED:
+            if row.get("table_name") == "profiles":
+                db.invalidate_user_context(row.get("row_id"))
+            doc_type = DOC_TYPES.get(row.get("table_name"))
+            if doc_type:
+                shard = index_store.shard_key(row.get("university_id"))
+                batch.deletions.append((shard, _doc_key(doc_type, row.get("row_id")), changed_at))
+            return
+        if table == "profiles":
+            # The app writes profiles directly, so this feed is what keeps
+            # supabase_client's user context cache fresh
+            db.invalidate_user_context(row.get("id"))
+        create, indexable = FEEDS[table]
+        doc = create(row)
+        shard = index_store.shard_key(doc.metadata.get("university_id"))
+        doc_key = _doc_key(doc.metadata.get("type"), doc.metadata.get("id"))
+        if indexable(row, now):
+            batch.documents.append(doc)
+            batch.versions[(shard, doc_key)] = changed_at
+        else:
+            batch.tombstones.append((shard, doc_key))
+
+    def stats(self) -> dict:
+        return {
+            "runs": self.runs,
+            "errors": self.errors,
+            "rows_pulled": self.rows_pulled,
+            "last_run_at": self.last_run_at,
+            "last_changes": self.last_changes,
+            "last_lag_seconds": self.last_lag_seconds,
+            "max_lag_seconds": self.max_lag_seconds,
+        }
+
+
+class _Batch:
+    """Documents and removals collected by one sync run."""
+
+    def __init__(self):
+        self.documents: list = []
+        self.tombstones: list[tuple[str, str]] = []
+        # (shard key, doc key, deleted_at) from the deletions feed
+        self.deletions: list[tuple[str, str, str]] = []
+        # (shard key, doc key) -> updated_at of the documents being upserted
+        self.versions: dict[tuple[str, str], str] = {}
+
+    def removed(self) -> list[tuple[str, str]]:
+        """Removals, without deletions superseded by a newer version of the row
+        in the same shard (a row that moved away and back)."""
+        removed = list(self.tombstones)
+        for shard, doc_key, deleted_at in self.deletions:
+            version = self.versions.get((shard, doc_key))
+            if version is None or _parse_ts(version) < _parse_ts(deleted_at):
+                removed.append((shard, doc_key))
+        return removed
+
+
+# ============ Background Loop ============
+
+_sync = ChangeSync()
+_stop = threading.Event()
+_thread: Optional[threading.Thread] = None
+
+
+def start(interval: Optional[float] = None) -> bool:
+    """Start the background sync loop; False if disabled or already running."""
+    global _thread
+    interval = settings.INDEX_SYNC_INTERVAL_SECONDS if interval is None else interval
+    if interval <= 0 or (_thread is not None and _thread.is_alive()):
+        return False
+    _stop.clear()
+    _thread = threading.Thread(target=_loop, args=(interval,), name="index-sync", daemon=True)
+    _thread.start()
+    return True
+
+
+def stop() -> None:
+    _stop.set()
+
+
+def _loop(interval: float) -> None:
+    while not _stop.wait(interval):
+        # Nothing to sync into until the first snapshot exists (never, in TEST_MODE)
+        if not index_store.current_manifest():
+            continue
+        try:
+            _sync.run_once()
+        except Exception as e:
+            print(f"Warning: index change sync failed: {e}")
+
+
+def stats() -> dict:
+    return {
+        "interval_seconds": settings.INDEX_SYNC_INTERVAL_SECONDS,
+        "running": _thread is not None and _thread.is_alive(),
+        **_sync.stats(),
+    }
+
+
+# ============ Simulation ============
+
+class FakeClock:
+    """UTC clock that only moves when told to."""
+
+    def __init__(self, start: Optional[datetime] = None):
+        self.now = start or datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+    def __call__(self) -> datetime:
+        return self.now
+
+    def advance(self, seconds: float) -> None:
+        self.now += timedelta(seconds=seconds)
+
+
+class FakeDB:
+    """In-memory tables exposing supabase_client's change-feed interface."""
+
+    def __init__(self, clock: FakeClock):
+        self.clock = clock
+        self.tables: dict[str, dict] = {table: {} for table in db.CHANGE_FEEDS}
+        self._deletion_id = 0
+
+    @staticmethod
+    def university_of(table: str, row: dict) -> Optional[str]:
+        if table == "posts":
+            return (row.get("forums") or {}).get("university_id")
+        return row.get("university_id")
+
+    def _record_deletion(self, table: str, row: dict) -> None:
+        self._deletion_id += 1
+        self.tables[DELETIONS_FEED][self._deletion_id] = {
+            "id": self._deletion_id,
+            "table_name": table,
+            "row_id": row["id"],
+            "university_id": self.university_of(table, row),
+            "deleted_at": self.clock().isoformat(),
+        }
+
+    def upsert(self, table: str, row: dict) -> dict:
+        old = self.tables[table].get(row["id"])
+        row = {**(old or {}), **row, "updated_at": self.clock().isoformat()}
+        # Like the update triggers of database/010_index_feed_moves.sql
+        if old and self.university_of(table, old) != self.university_of(table, row):
+            self._record_deletion(table, old)
+        self.tables[table][row["id"]] = row
+        return row
+
+    def delete(self, table: str, row_id: str) -> None:
+        self._record_deletion(table, self.tables[table].pop(row_id))
+
+    def update_forum(self, forum_id: str, **changes) -> None:
+        """Change a forum, touching its posts like database/010's forums trigger."""
+        for row in list(self.tables["posts"].values()):
+            if row.get("forum_id") == forum_id:
+                self.upsert("posts", {"id": row["id"], "forums": {**row["forums"], **changes}})
+
+    def iter_changed_rows(
+        self, table: str, since: Optional[str], university_id: Optional[str] = None, page_size=None,
+        all_universities: bool = False,
+    ):
+        ts_column = db.CHANGE_FEEDS[table][2]
+        rows = [
+            row for row in self.tables[table].values()
+            if (all_universities or (self.university_of(table, row) or None) == university_id)
+            and (not since or _parse_ts(row[ts_column]) >= _parse_ts(since))
+        ]
+        return iter(sorted(rows, key=lambda row: (row[ts_column], str(row["id"]))))
+
+
+class _HashEmbedding:
+    """Deterministic offline embedder for the simulation."""
+
+    model_name = "simulated-hash"
+    embed_batch_size = 100
+
+    def get_text_embedding_batch(self, texts: list[str], **kwargs) -> list[list[float]]:
+        return [[b / 255.0 for b in hashlib.sha256(text.encode("utf-8")).digest()[:16]] for text in texts]
+
+
+def _fake_row(table: str, university_id: str, n: int, rng, clock: FakeClock) -> dict:
+    row_id = f"{table}-{university_id}-{n}"
+    if table == "profiles":
+        return {
+            "id": row_id, "university_id": university_id, "full_name": f"Student {n}",
+            "username": f"student{n}", "major": rng.choice(["CS", "Math", "History"]),
+            "bio": f"bio v{rng.randint(0, 999)}", "friends_visibility": "school", "yearbook_visible": True,
+        }
+    if table == "organizations":
+        return {"id": row_id, "university_id": university_id, "name": f"Club {n}", "is_public": True}
+    if table == "events":
+        start_at = (clock() + timedelta(days=30)).isoformat()
+        return {
+            "id": row_id, "university_id": university_id, "title": f"Event {n}",
+            "start_at": start_at, "visibility": "public",
+        }
+    if table == "link_facts":
+        return {
+            "id": row_id, "university_id": university_id, "fact_key": "office hours",
+            "fact_value": f"{rng.randint(1, 5)}pm", "consent_status": "opt_in",
+        }
+    forum = {"id": f"forum-{university_id}", "name": "General", "is_public": True, "university_id": university_id}
+    return {"id": row_id, "forum_id": forum["id"], "forums": forum, "title": f"Post {n}", "body": "hello"}
+
+
+def _stale_rows(fake: FakeDB, now: datetime) -> int:
+    """Documents whose indexed state (shard and hash) doesn't match the fake database."""
+    expected: dict[tuple[str, str], str] = {}
+    for table, (create, indexable) in FEEDS.items():
+        for row in fake.tables[table].values():
+            if indexable(row, now):
+                doc = create(row)
+                key = index_store.shard_key(doc.metadata.get("university_id"))
+                doc_key = _doc_key(doc.metadata["type"], doc.metadata["id"])
+                expected[(key, doc_key)] = hashlib.sha256(doc.text.encode("utf-8")).hexdigest()
+    indexed: dict[tuple[str, str], str] = {}
+    for key in index_store.shard_keys():
+        shard = index_store.load_shard(key)
+        for doc_key in shard.keys() if shard else []:
+            indexed[(key, doc_key)] = (shard.get(doc_key) or {}).get("hash")
+    return sum(expected.get(pair) != indexed.get(pair) for pair in expected.keys() | indexed.keys())
+
+
+def simulate(ticks: int = 20, interval: float = 5.0, changes_per_tick: int = 5, seed: int = 0) -> dict:
+    """Run the sync loop against FakeDB and FakeClock in a throwaway index dir."""
+    import random
+    import tempfile
+
+    from llama_index.core import Settings
+
+    rng = random.Random(seed)
+    clock = FakeClock()
+    fake = FakeDB(clock)
+    universities = ["uni-a", "uni-b"]
+    counters = {table: 0 for table in FEEDS}
+    for university_id in universities:
+        for table in FEEDS:
+            for _ in range(10):
+                counters[table] += 1
+                fake.upsert(table, _fake_row(table, university_id, counters[table], rng, clock))
+
+    with tempfile.TemporaryDirectory() as directory:
+        settings.INDEX_DIR = directory
+        Settings.embed_model = _HashEmbedding()
+        rag_index._settings_ready = True
+        sync = ChangeSync(fake, clock=clock, overlap_seconds=0)
+        sync.run_once()
+        worst_stale = 0
+        for tick in range(ticks):
+            # A university without a shard joins halfway through
+            if tick == ticks // 2:
+                universities.append("uni-c")
+            tick_end = clock() + timedelta(seconds=interval)
+            for _ in range(changes_per_tick):
+                clock.advance(rng.uniform(0, interval / changes_per_tick))
+                table = rng.choice(list(FEEDS))
+                university_id = rng.choice(universities)
+                if rng.random() < 0.05:
+                    # Forums are renamed, closed or reopened, and moved
+                    fake.update_forum(
+                        f"forum-{university_id}",
+                        name=f"General {rng.randint(0, 9)}",
+                        is_public=rng.random() < 0.7,
+                        university_id=rng.choice(universities),
+                    )
+                    continue
+                action = rng.random()
+                existing = [
+                    row_id for row_id, row in fake.tables[table].items()
+                    if fake.university_of(table, row) == university_id
+                ]
+                if action < 0.5 or not existing:
+                    counters[table] += 1
+                    fake.upsert(table, _fake_row(table, university_id, counters[table], rng, clock))
+                elif action < 0.8:
+                    row = dict(fake.tables[table][rng.choice(existing)])
+                    # Some profiles move to another university
+                    target = rng.choice(universities) if table == "profiles" else university_id
+                    row.update({k: v for k, v in _fake_row(table, target, 0, rng, clock).items() if k != "id"})
+                    if table == "profiles" and rng.random() < 0.3:
+                        row["yearbook_visible"] = False
+                    fake.upsert(table, row)
+                else:
+                    fake.delete(table, rng.choice(existing))
+            clock.now = tick_end
+            result = sync.run_once()
+            stale = _stale_rows(fake, clock())
+            worst_stale = max(worst_stale, stale)
+            print(f"tick {tick + 1}: pulled={result['pulled']} lag={result['lag_seconds']}s stale={stale} "
+                  f"changes={ {k: v for k, v in (result['changes'] or {}).items() if k != 'written'} }")
+        return {**sync.stats(), "worst_stale_rows": worst_stale}
+
+
+# ============ CLI Entry Point ============
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) > 1 and sys.argv[1] == "simulate":
+        ticks = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+        print(simulate(ticks=ticks))
+    elif len(sys.argv) > 1 and sys.argv[1] == "once":
+        print(_sync.run_once())
+    else:
+        print("Usage: python -m index_sync simulate [ticks] | once")
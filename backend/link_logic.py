@@ -64,6 +64,14 @@ SMALL_TALK_PATTERNS = [
     "hi", "hello", "hey", "yo", "sup", "what's up", "whats up", "wyd", "how are you", "how's it going",
 ]
 
+# Document types each intent can use (None = any); passed into retrieval as a filter
+INTENT_RESULT_TYPES = {
+    "find_people": ["profile", "link_fact"],
+    "find_org": ["organization", "link_fact"],
+    "find_event": ["event", "link_fact"],
+    "find_info": None,
+}
+
 ENTITY_SYNONYMS = {
     "cs": ["computer science", "comp sci", "comp-sci", "compsci", "computer-science", "computerscience"],
 }
@@ -180,9 +188,17 @@ Respond in JSON format:
 # ============ Confidence Scoring ============
 
 def calculate_confidence(
-    results: list[dict], facts: list[dict], intent: Intent
+    results: list[dict],
+    facts: list[dict],
+    intent: Intent,
+    university_id: Optional[str] = None,
+    agreement: Optional[float] = None,
 ) -> ValidationInfo:
-    """Calculate confidence score using dual retrieval agreement."""
+    """Calculate confidence score using dual retrieval agreement.
+
+    Pass the agreement from the retrieval that produced `results`
+    (rag_index.retrieve_dual) to avoid searching again.
+    """
     # Base confidence from result count
     if len(results) == 0:
         base = 0.1
@@ -191,8 +207,14 @@ def calculate_confidence(
     else:
         base = 0.8
 
-    # Agreement score from dual retrieval
-    _, _, agreement = rag_index.retrieve_dual(" ".join(intent.entities) if intent.entities else "query")
+    # Agreement score from dual retrieval (raw entities vs. synonym-expanded)
+    if agreement is None:
+        query = " ".join(intent.entities) if intent.entities else "query"
+        _, _, agreement = rag_index.retrieve_dual(
+            query,
+            university_id=university_id,
+            variant=" ".join(normalize_entities(intent.entities)) if intent.entities else None,
+        )
 
     # Source quality - weight opt_in facts higher
     opt_in_facts = [f for f in facts if f.get("consent") == "opt_in"]
@@ -454,26 +476,28 @@ def process_query(
             }
 
     # 3. Retrieve relevant documents (skip for general chat)
+    # The raw question and its entity-expanded form are retrieved together;
+    # their overlap is the agreement signal for confidence scoring.
     results = []
+    agreement = 1.0  # nothing retrieved, nothing to disagree about
     if intent.type in ["find_people", "find_info", "find_event", "find_org"]:
         search_query = question
         if intent.entities:
             search_query = f"{question} {' '.join(normalize_entities(intent.entities))}"
-        results = rag_index.retrieve(search_query, top_k=5, university_id=university_id)
-
-    # 4. Type-gate results based on intent
-    if intent.type == "find_org":
-        results = [r for r in results if r["type"] in ["organization", "link_fact"]]
-    elif intent.type == "find_people":
-        results = [r for r in results if r["type"] in ["profile", "link_fact"]]
-    elif intent.type == "find_event":
-        results = [r for r in results if r["type"] in ["event", "link_fact"]]
+        # 4. Type-gate inside the search so every top-k slot is usable
+        _, results, agreement = rag_index.retrieve_dual(
+            question,
+            top_k=5,
+            university_id=university_id,
+            variant=search_query,
+            types=INTENT_RESULT_TYPES.get(intent.type),
+        )
 
     # 5. Separate facts from other results
     facts = [r for r in results if r["type"] == "link_fact"]
 
     # 6. Calculate confidence
-    validation = calculate_confidence(results, facts, intent)
+    validation = calculate_confidence(results, facts, intent, university_id=university_id, agreement=agreement)
 
     # 7. Determine if outreach is needed
     need_outreach = (
@@ -570,27 +594,33 @@ def process_query(
             if session:
                 db.set_link_conversation_session(convo["id"], session["id"])
 
-            db.insert_link_message(
-                convo["id"],
-                sender_id,
-                response.message,
-                {"shareType": "text"},
-                session_id=session["id"] if session else None,
-            )
+            session_row_id = session["id"] if session else None
+            # The reply and its cards go out in one write, reply first
+            rows = [
+                {
+                    "conversation_id": convo["id"],
+                    "sender_id": sender_id,
+                    "content": response.message,
+                    "metadata": {"shareType": "text"},
+                    "session_id": session_row_id,
+                }
+            ]
 
             if payload_data and payload_data.get("results") and not need_outreach:
                 for item in payload_data["results"]:
                     item_type = item.get("type")
                     metadata = build_card_metadata(item, item_type)
                     if metadata:
-                        title = item.get("name") or item.get("title") or "Shared item"
-                        db.insert_link_message(
-                            convo["id"],
-                            sender_id,
-                            title,
-                            metadata,
-                            session_id=session["id"] if session else None,
+                        rows.append(
+                            {
+                                "conversation_id": convo["id"],
+                                "sender_id": sender_id,
+                                "content": item.get("name") or item.get("title") or "Shared item",
+                                "metadata": metadata,
+                                "session_id": session_row_id,
+                            }
                         )
+            db.insert_link_messages_bulk(rows)
     except Exception:
         pass
 
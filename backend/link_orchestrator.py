@@ -4,6 +4,7 @@ from __future__ import annotations
 
 from datetime import datetime, timedelta, timezone
 import re
+import time
 from typing import Optional
 
 from config import settings
@@ -21,6 +22,9 @@ INTENT_TYPES = {
 
 TIME_WINDOWS = {"today", "this_week", None}
 
+# When lookup_verified_facts last purged expired facts (time.monotonic)
+_last_fact_purge = float("-inf")
+
 DB_SCHEMA_HINT = (
     "DB schema: events(title,start_at,location_name,description,type,visibility), "
     "organizations(name,category,mission_statement,meeting_time,meeting_place,is_public), "
@@ -111,9 +115,15 @@ def analyze_message_style(text: str) -> dict:
     }
 
 
-def update_user_style_memory(user_id: str, university_id: str, message_text: str) -> dict:
-    """Update user memory with style profile + Gen Z baseline."""
-    existing = db.get_user_memory(user_id) or {}
+def update_user_style_memory(
+    user_id: str, university_id: str, message_text: str, existing: Optional[dict] = None
+) -> dict:
+    """Update user memory with style profile + Gen Z baseline.
+
+    `existing` is the user's current memory row if the caller already has it.
+    """
+    if existing is None:
+        existing = db.get_user_memory(user_id) or {}
     if not university_id:
         university_id = existing.get("university_id") or (db.get_profile(user_id, enforce_public=False) or {}).get("university_id")
     if not university_id:
@@ -821,11 +831,15 @@ def _record_summaries(records: dict) -> list[dict]:
 
 def lookup_verified_facts(university_id: str, tags: list[str], limit: int = 10) -> list[dict]:
     """Fetch unexpired verified facts for reuse."""
+    global _last_fact_purge
     now = _now_utc()
-    try:
-        db.delete_expired_verified_facts(now.isoformat())
-    except Exception:
-        pass
+    # Expired rows are filtered server-side; purging them is housekeeping
+    if time.monotonic() - _last_fact_purge >= settings.VERIFIED_FACTS_PURGE_SECONDS:
+        _last_fact_purge = time.monotonic()
+        try:
+            db.delete_expired_verified_facts(now.isoformat())
+        except Exception:
+            pass
     facts = db.get_verified_facts(university_id, tags, limit=limit)
     filtered: list[dict] = []
     for fact in facts:
@@ -1192,9 +1206,10 @@ def insert_cards_from_items(
     item_type: str,
     session_id: Optional[str] = None,
 ) -> None:
-    """Insert card messages directly from item payloads."""
+    """Insert card messages directly from item payloads (one write)."""
     link_profile = db.get_link_system_profile(university_id)
     sender_id = link_profile.get("link_user_id") if link_profile else None
+    rows = []
     for item in items:
         metadata = build_card_metadata(item, item_type)
         if metadata:
@@ -1204,13 +1219,25 @@ def insert_cards_from_items(
                 or item.get("full_name")
                 or "Card"
             )
-            db.insert_link_message(
-                conversation_id,
-                sender_id,
-                title,
-                metadata,
-                session_id=session_id,
-            )
+            rows.append(_link_message_row(conversation_id, sender_id, title, metadata, session_id))
+    db.insert_link_messages_bulk(rows)
+
+
+def _link_message_row(
+    conversation_id: str,
+    sender_id: Optional[str],
+    content: str,
+    metadata: dict,
+    session_id: Optional[str] = None,
+) -> dict:
+    """A row for db.insert_link_messages_bulk."""
+    return {
+        "conversation_id": conversation_id,
+        "sender_id": sender_id,
+        "content": content,
+        "metadata": metadata,
+        "session_id": session_id,
+    }
 
 
 def start_link_relay(
@@ -1419,7 +1446,9 @@ def insert_link_response(
     confidence: float,
     session_id: Optional[str] = None,
     task_state: Optional[str] = None,
+    records: Optional[dict] = None,
 ) -> None:
+    """Insert a Link answer and its cards; `records` (retrieve_candidates output) saves card fetches."""
     link_profile = db.get_link_system_profile(university_id)
     sender_id = link_profile.get("link_user_id") if link_profile else None
     text = dedupe_response(conversation_id, text, intent_type="general")
@@ -1431,34 +1460,102 @@ def insert_link_response(
     }
     if task_state:
         metadata["task_state"] = task_state
-    db.insert_link_message(conversation_id, sender_id, text, metadata, session_id=session_id)
-
-    if not cards:
-        return
+    # The answer and its cards go out in one write, answer first
+    rows = [_link_message_row(conversation_id, sender_id, text, metadata, session_id)]
+    for title, card_metadata in hydrate_cards(cards, records):
+        rows.append(_link_message_row(conversation_id, sender_id, title, card_metadata, session_id))
+    db.insert_link_messages_bulk(rows)
+
+
+# cards key -> (retrieve_candidates key, card type, batch fetch, visibility
+# check matching that fetch's filters, title field, fallback title)
+_CARD_SOURCES: dict[str, tuple] = {
+    "event_ids": (
+        "events", "event", db.get_events_by_ids,
+        lambda row: row.get("visibility") in ("public", "school"),
+        "title", "Event",
+    ),
+    "user_ids": (
+        "profiles", "profile", lambda ids: db.get_profiles_by_ids(ids, enforce_public=True),
+        lambda row: row.get("is_link") is False
+        and row.get("friends_visibility") in ("school", "public")
+        and row.get("yearbook_visible") is True,
+        "full_name", "Student",
+    ),
+    "club_ids": (
+        "orgs", "organization", db.get_organizations_by_ids,
+        lambda row: row.get("is_public") is True,
+        "name", "Club",
+    ),
+}
 
-    for event_id in cards.get("event_ids") or []:
-        event = db.get_event(event_id)
-        if not event:
-            continue
-        metadata = build_card_metadata(event, "event")
-        if metadata:
-            db.insert_link_message(conversation_id, sender_id, event.get("title") or "Event", metadata, session_id=session_id)
 
-    for user_id in cards.get("user_ids") or []:
-        profile = db.get_profile(user_id, enforce_public=True)
-        if not profile:
-            continue
-        metadata = build_card_metadata(profile, "profile")
-        if metadata:
-            db.insert_link_message(conversation_id, sender_id, profile.get("full_name") or "Student", metadata, session_id=session_id)
+def hydrate_cards(cards: Optional[dict], records: Optional[dict] = None) -> list[tuple[str, dict]]:
+    """(title, card metadata) for each card id, in card order.
 
-    for org_id in cards.get("club_ids") or []:
-        org = db.get_organization(org_id)
-        if not org:
+    Records already loaded for the request (retrieve_candidates) are used as
+    is when they pass the same visibility rules as the fetch; the rest of each
+    entity type is fetched with one query.
+    """
+    hydrated: list[tuple[str, dict]] = []
+    for key, (records_key, card_type, fetch, visible, title_field, fallback) in _CARD_SOURCES.items():
+        ids = [entity_id for entity_id in (cards or {}).get(key) or [] if entity_id]
+        if not ids:
             continue
-        metadata = build_card_metadata(org, "organization")
-        if metadata:
-            db.insert_link_message(conversation_id, sender_id, org.get("name") or "Club", metadata, session_id=session_id)
+        known = {
+            row["id"]: row
+            for row in (records or {}).get(records_key) or []
+            if row.get("id") in ids and visible(row)
+        }
+        missing = [entity_id for entity_id in dict.fromkeys(ids) if entity_id not in known]
+        if missing:
+            known.update({row["id"]: row for row in fetch(missing) or [] if row.get("id")})
+        for entity_id in ids:
+            entity = known.get(entity_id)
+            metadata = build_card_metadata(entity, card_type) if entity else None
+            if metadata:
+                hydrated.append((entity.get(title_field) or fallback, metadata))
+    return hydrated
+
+
+def _outreach_dm_rows(
+    conversation_id: str,
+    sender_id: str,
+    dm_text: str,
+    dm_metadata: dict,
+    requester_profile: Optional[dict],
+) -> list[dict]:
+    """Rows for one outreach DM: the ask, the requester's card, the YES/NO prompt.
+
+    The ask comes first; its id is the target's outreach_message_id.
+    """
+    rows = [{"conversation_id": conversation_id, "sender_id": sender_id, "content": dm_text, "metadata": dm_metadata}]
+    if requester_profile:
+        profile_metadata = build_card_metadata(requester_profile, "profile")
+        if profile_metadata:
+            rows.append({
+                "conversation_id": conversation_id,
+                "sender_id": sender_id,
+                "content": requester_profile.get("full_name") or "Profile",
+                "metadata": profile_metadata,
+            })
+    rows.append({
+        "conversation_id": conversation_id,
+        "sender_id": sender_id,
+        "content": "Want an intro? Reply YES or NO.",
+        "metadata": {"shareType": "text"},
+    })
+    return rows
+
+
+def _send_outreach_dms(dm_rows: list[dict], pending: list[tuple[dict, int]]) -> list[dict]:
+    """Insert every target's outreach DMs in one write.
+
+    `pending` pairs each target row with the index of its ask in `dm_rows`;
+    returns the target rows with outreach_message_id filled in.
+    """
+    inserted = db.insert_messages_bulk(dm_rows)
+    return [{**row, "outreach_message_id": inserted[index].get("id")} for row, index in pending]
 
 
 def start_outreach(
@@ -1516,7 +1613,19 @@ def start_outreach(
     link_profile = db.get_link_system_profile(university_id)
     sender_id = link_profile.get("link_user_id") if link_profile else None
 
-    target_rows: list[dict] = []
+    dm_metadata = {
+        "shareType": "text",
+        "requester_user_id": user_id,
+        "requester_profile": {
+            "full_name": requester_profile.get("full_name") if requester_profile else None,
+            "username": requester_profile.get("username") if requester_profile else None,
+            "major": requester_profile.get("major") if requester_profile else None,
+            "bio": requester_profile.get("bio") if requester_profile else None,
+            "interests": requester_profile.get("interests") if requester_profile else None,
+        },
+    }
+    dm_rows: list[dict] = []
+    pending: list[tuple[dict, int]] = []
     for target in targets:
         target_user_id = target.get("user_id")
         if not target_user_id or not sender_id:
@@ -1524,47 +1633,20 @@ def start_outreach(
         convo = db.get_or_create_dm_conversation(sender_id, target_user_id)
         if not convo:
             continue
-        message = db.insert_message(
-            convo["id"],
-            sender_id,
-            dm_text,
-            {
-                "shareType": "text",
-                "requester_user_id": user_id,
-                "requester_profile": {
-                    "full_name": requester_profile.get("full_name") if requester_profile else None,
-                    "username": requester_profile.get("username") if requester_profile else None,
-                    "major": requester_profile.get("major") if requester_profile else None,
-                    "bio": requester_profile.get("bio") if requester_profile else None,
-                    "interests": requester_profile.get("interests") if requester_profile else None,
+        pending.append(
+            (
+                {
+                    "run_id": run["id"],
+                    "target_user_id": target_user_id,
+                    "dm_conversation_id": convo["id"],
+                    "status": "sent",
                 },
-            },
-        )
-        if requester_profile:
-            profile_metadata = build_card_metadata(requester_profile, "profile")
-            if profile_metadata:
-                db.insert_message(
-                    convo["id"],
-                    sender_id,
-                    requester_profile.get("full_name") or "Profile",
-                    profile_metadata,
-                )
-        db.insert_message(
-            convo["id"],
-            sender_id,
-            "Want an intro? Reply YES or NO.",
-            {"shareType": "text"},
-        )
-        target_rows.append(
-            {
-                "run_id": run["id"],
-                "target_user_id": target_user_id,
-                "dm_conversation_id": convo["id"],
-                "outreach_message_id": message.get("id"),
-                "status": "sent",
-            }
+                len(dm_rows),
+            )
         )
+        dm_rows.extend(_outreach_dm_rows(convo["id"], sender_id, dm_text, dm_metadata, requester_profile))
 
+    target_rows = _send_outreach_dms(dm_rows, pending)
     if target_rows:
         db.create_link_outreach_targets(target_rows)
 
@@ -1686,7 +1768,8 @@ def collect_outreach(
                 requester_profile=requester_profile,
             )
             existing_targets = {t.get("target_user_id") for t in targets}
-            new_rows: list[dict] = []
+            dm_rows: list[dict] = []
+            pending: list[tuple[dict, int]] = []
             link_profile = db.get_link_system_profile(university_id)
             sender_id = link_profile.get("link_user_id") if link_profile else None
             for comment in comments:
@@ -1696,37 +1779,28 @@ def collect_outreach(
                 convo = db.get_or_create_dm_conversation(sender_id, commenter_id)
                 if not convo:
                     continue
-                message = db.insert_message(
-                    convo["id"],
-                    sender_id,
-                    dm_text,
-                    {"shareType": "text", "requester_user_id": run.get("requester_user_id")},
-                )
-                if requester_profile:
-                    profile_metadata = build_card_metadata(requester_profile, "profile")
-                    if profile_metadata:
-                        db.insert_message(
-                            convo["id"],
-                            sender_id,
-                            requester_profile.get("full_name") or "Profile",
-                            profile_metadata,
-                        )
-                db.insert_message(
-                    convo["id"],
-                    sender_id,
-                    "Want an intro? Reply YES or NO.",
-                    {"shareType": "text"},
+                pending.append(
+                    (
+                        {
+                            "run_id": run_id,
+                            "target_user_id": commenter_id,
+                            "dm_conversation_id": convo["id"],
+                            "status": "sent",
+                            "source_comment_id": comment.get("id"),
+                        },
+                        len(dm_rows),
+                    )
                 )
-                new_rows.append(
-                    {
-                        "run_id": run_id,
-                        "target_user_id": commenter_id,
-                        "dm_conversation_id": convo["id"],
-                        "outreach_message_id": message.get("id"),
-                        "status": "sent",
-                        "source_comment_id": comment.get("id"),
-                    }
+                dm_rows.extend(
+                    _outreach_dm_rows(
+                        convo["id"],
+                        sender_id,
+                        dm_text,
+                        {"shareType": "text", "requester_user_id": run.get("requester_user_id")},
+                        requester_profile,
+                    )
                 )
+            new_rows = _send_outreach_dms(dm_rows, pending)
             if new_rows:
                 db.create_link_outreach_targets(new_rows)
         return {"status": run.get("status"), "message": "Collecting forum replies."}
@@ -1757,7 +1831,8 @@ def collect_outreach(
                 style_instructions=build_style_instructions(None),
                 requester_profile=requester_profile,
             )
-            new_rows: list[dict] = []
+            dm_rows: list[dict] = []
+            pending: list[tuple[dict, int]] = []
             for target in more_targets:
                 target_user_id = target.get("user_id")
                 if not target_user_id or not sender_id:
@@ -1765,31 +1840,19 @@ def collect_outreach(
                 convo = db.get_or_create_dm_conversation(sender_id, target_user_id)
                 if not convo:
                     continue
-                message = db.insert_message(convo["id"], sender_id, dm_text, {"shareType": "text"})
-                if requester_profile:
-                    profile_metadata = build_card_metadata(requester_profile, "profile")
-                    if profile_metadata:
-                        db.insert_message(
-                            convo["id"],
-                            sender_id,
-                            requester_profile.get("full_name") or "Profile",
-                            profile_metadata,
-                        )
-                db.insert_message(
-                    convo["id"],
-                    sender_id,
-                    "Want an intro? Reply YES or NO.",
-                    {"shareType": "text"},
-                )
-                new_rows.append(
-                    {
-                        "run_id": run_id,
-                        "target_user_id": target_user_id,
-                        "dm_conversation_id": convo["id"],
-                        "outreach_message_id": message.get("id"),
-                        "status": "sent",
-                    }
+                pending.append(
+                    (
+                        {
+                            "run_id": run_id,
+                            "target_user_id": target_user_id,
+                            "dm_conversation_id": convo["id"],
+                            "status": "sent",
+                        },
+                        len(dm_rows),
+                    )
                 )
+                dm_rows.extend(_outreach_dm_rows(convo["id"], sender_id, dm_text, {"shareType": "text"}, requester_profile))
+            new_rows = _send_outreach_dms(dm_rows, pending)
             if new_rows:
                 db.create_link_outreach_targets(new_rows)
                 db.update_link_outreach_run(
@@ -1,6 +1,8 @@
 """Link AI - FastAPI Application."""
 
 from fastapi import FastAPI, Header, HTTPException
+from fastapi.concurrency import run_in_threadpool
+import asyncio
 import re
 from fastapi.middleware.cors import CORSMiddleware
 from typing import Optional
@@ -35,11 +37,15 @@ from schemas import (
     LinkRelayCollectRequest,
     LinkRelayResponse,
 )
+import index_expiry
+import index_jobs
+import index_sync
 import link_logic
 import link_orchestrator
 import outreach_logic
 import rag_index
-import supabase_client as db
+import supabase_async as db
+import supabase_client
 from intent_classifier import classify_intent, Intent
 from state_machine import determine_transition
 
@@ -59,7 +65,7 @@ def validate_uuid(value: str, field_name: str) -> None:
         raise HTTPException(status_code=400, detail=f"{field_name} must be a valid UUID")
 
 
-def resolve_task_state(state: dict, status: str, query: Optional[str] = None) -> None:
+async def resolve_task_state(state: dict, status: str, query: Optional[str] = None) -> None:
     """Append to resolved_tasks and clear active task."""
     if not state:
         return
@@ -74,7 +80,7 @@ def resolve_task_state(state: dict, status: str, query: Optional[str] = None) ->
                 "resolved_at": datetime.utcnow().isoformat() + "Z",
             }
         )
-    db.update_link_conversation_state(
+    await db.update_link_conversation_state(
         state["id"],
         {
             "mode": "conversation",
@@ -117,8 +123,8 @@ def build_ui_hints(mode: str, active_task: Optional[dict]) -> dict:
     }
 
 
-def build_conversation_history(conversation_id: str, limit: int = 20) -> str:
-    rows = db.list_link_messages(conversation_id, limit=limit)
+async def build_conversation_history(conversation_id: str, limit: int = 20) -> str:
+    rows = await db.list_link_messages(conversation_id, limit=limit)
     parts = []
     for row in rows:
         role = "User" if row.get("sender_type") == "user" else "Link"
@@ -132,9 +138,20 @@ async def startup_tasks():
     """Optional startup tasks."""
     if settings.REINDEX_ON_START:
         try:
-            rag_index.build_index()
+            # Runs on the background index worker; startup doesn't wait for it
+            rag_index.start_reindex()
         except Exception:
             pass
+    # Change-feed sync keeps the index fresh between rebuilds
+    index_sync.start()
+    index_expiry.start()
+
+
+@app.on_event("shutdown")
+async def shutdown_tasks():
+    index_sync.stop()
+    index_expiry.stop()
+    await db.close()
 
 # CORS (dev-friendly; tighten in prod)
 app.add_middleware(
@@ -162,13 +179,14 @@ async def health():
     # Get facts count if possible
     facts_count = 0
     try:
-        facts_count = db.get_facts_count()
+        facts_count = await db.get_facts_count()
     except Exception:
         pass
     
     return HealthResponse(
         status="ok" if not missing_config else "degraded",
         rag_indexed=rag_index.is_indexed(),
+        index_generation=rag_index.index_generation(),
         facts_count=facts_count,
         missing_config=missing_config,
     )
@@ -180,7 +198,8 @@ async def health():
 async def query(request: QueryRequest):
     """Main query endpoint - Link's brain."""
     try:
-        result = link_logic.process_query(
+        result = await run_in_threadpool(
+            link_logic.process_query,
             user_id=request.user_id,
             university_id=request.university_id,
             question=request.question,
@@ -204,7 +223,7 @@ async def query(request: QueryRequest):
                 "hard_cap": settings.OUTREACH_HARD_CAP,
                 "excluded_user_ids": [request.user_id],
             }
-            outreach = outreach_logic.start_outreach(outreach_payload)
+            outreach = await run_in_threadpool(outreach_logic.start_outreach, outreach_payload)
             result["outreach_request_id"] = outreach["request"]["id"]
             result["data"] = {
                 "need_outreach": True,
@@ -225,45 +244,43 @@ async def link_agent(request: LinkAgentRequest):
     try:
         validate_uuid(request.user_id, "user_id")
         validate_uuid(request.university_id, "university_id")
-        convo = db.get_or_create_link_conversation(request.user_id)
-        if not convo:
-            raise HTTPException(status_code=404, detail="Link conversation not found")
-
-        session = None
-        if request.session_id:
-            session = db.get_link_session_for_user(request.session_id, request.user_id)
-        if not session:
-            session = db.get_or_create_link_session(request.user_id, request.university_id)
-        if session:
-            db.set_link_conversation_session(convo["id"], session["id"])
-
-        db.insert_link_message(
-            convo["id"],
+        ctx = await db.load_request_context(
             request.user_id,
-            request.message_text,
-            {"shareType": "text"},
-            session_id=session["id"] if session else None,
-            sender_type="user",
+            university_id=request.university_id,
+            session_id=request.session_id,
+            access_token=request.access_token,
         )
-
-        user_context = None
-        if request.access_token:
-            user_context = db.get_user_context_rls(request.access_token, request.user_id)
-        if not user_context:
-            user_context = db.get_user_context(request.user_id)
+        convo = ctx.conversation
+        if not convo:
+            raise HTTPException(status_code=404, detail="Link conversation not found")
+        session = ctx.session
+        user_context = ctx.user_context
         resolved_university_id = request.university_id
         if not resolved_university_id and user_context:
             resolved_university_id = (user_context.get("profile") or {}).get("university_id")
-        user_memory = link_orchestrator.update_user_style_memory(
-            request.user_id, resolved_university_id, request.message_text
+
+        # Record the message and fold it into style memory together
+        _, user_memory = await asyncio.gather(
+            db.insert_link_message(
+                convo["id"],
+                request.user_id,
+                request.message_text,
+                {"shareType": "text"},
+                session_id=session["id"] if session else None,
+                sender_type="user",
+            ),
+            run_in_threadpool(
+                link_orchestrator.update_user_style_memory,
+                request.user_id, resolved_university_id, request.message_text, existing=ctx.memory or {},
+            ),
         )
         style_instructions = link_orchestrator.build_style_instructions(user_memory)
-        memory_context = db.get_user_memory(request.user_id) or {}
-        convo_state = db.get_or_create_link_conversation_state(request.user_id, convo["id"])
+        memory_context = user_memory or {}
+        convo_state = ctx.conversation_state
         active_task = convo_state.get("active_task")
         intent_result = classify_intent(request.message_text, active_task=active_task)
         lower = (request.message_text or "").lower().strip()
-        active_run = db.get_latest_active_outreach_run(request.user_id)
+        active_run = ctx.active_run
         # If this is a follow-up to a recent org/club query, treat it as club search.
         if intent_result.intent == Intent.FOLLOWUP:
             resolved = convo_state.get("resolved_tasks") or []
@@ -302,7 +319,8 @@ async def link_agent(request: LinkAgentRequest):
         pre_records = None
         db_answerable = False
         if intent_result.intent == Intent.PEOPLE_SEARCH:
-            pre_records = link_orchestrator.retrieve_candidates(
+            pre_records = await run_in_threadpool(
+                link_orchestrator.retrieve_candidates,
                 "person_search",
                 intent_result.entities,
                 None,
@@ -328,7 +346,8 @@ async def link_agent(request: LinkAgentRequest):
             Intent.SOCIAL,
             Intent.MARKETPLACE,
         }:
-            pre_records = link_orchestrator.retrieve_candidates(
+            pre_records = await run_in_threadpool(
+                link_orchestrator.retrieve_candidates,
                 intent_map.get(intent_result.intent, "campus_info"),
                 intent_result.entities,
                 None,
@@ -350,7 +369,7 @@ async def link_agent(request: LinkAgentRequest):
         if mode == "outreach" and intent_result.intent not in {Intent.FOLLOWUP, Intent.CONSENT_RESPONSE}:
             mode = "conversation"
             active_task = None
-            db.update_link_conversation_state(
+            await db.update_link_conversation_state(
                 convo_state["id"],
                 {
                     "mode": "conversation",
@@ -358,7 +377,7 @@ async def link_agent(request: LinkAgentRequest):
                     "updated_at": datetime.utcnow().isoformat() + "Z",
                 },
             )
-        db.update_link_conversation_state(
+        await db.update_link_conversation_state(
             convo_state["id"],
             {
                 "mode": mode,
@@ -384,7 +403,8 @@ async def link_agent(request: LinkAgentRequest):
             if likes and not interests:
                 parts.append(f"you like {likes[0]}")
             reply = ", ".join(parts) + ". want me to update anything?"
-            link_orchestrator.insert_link_response(
+            await run_in_threadpool(
+                link_orchestrator.insert_link_response,
                 convo["id"],
                 request.university_id,
                 reply,
@@ -394,7 +414,7 @@ async def link_agent(request: LinkAgentRequest):
                 session_id=session["id"] if session else None,
                 task_state="answered",
             )
-            resolve_task_state(convo_state, "resolved", query=request.message_text)
+            await resolve_task_state(convo_state, "resolved", query=request.message_text)
             return LinkAgentResponse(
                 mode="answered",
                 confidence=0.8,
@@ -405,14 +425,15 @@ async def link_agent(request: LinkAgentRequest):
             )
 
         if intent_result.intent == Intent.ACTIVITY_RECALL:
-            convo_history_rows = db.list_link_messages(convo["id"], limit=20)
+            convo_history_rows = await db.list_link_messages(convo["id"], limit=20)
             recent_user_msgs = [
                 r.get("content") for r in convo_history_rows if r.get("sender_type") == "user" and r.get("content")
             ]
             memories = ((user_memory or {}).get("conversation_state") or {}).get("memories") or []
             recall = link_orchestrator.recall_recent_activity(request.message_text, recent_user_msgs, memories)
             reply = recall or "i don't think you told me yet — what'd you do?"
-            link_orchestrator.insert_link_response(
+            await run_in_threadpool(
+                link_orchestrator.insert_link_response,
                 convo["id"],
                 request.university_id,
                 reply,
@@ -422,7 +443,7 @@ async def link_agent(request: LinkAgentRequest):
                 session_id=session["id"] if session else None,
                 task_state="answered",
             )
-            resolve_task_state(convo_state, "resolved", query=request.message_text)
+            await resolve_task_state(convo_state, "resolved", query=request.message_text)
             return LinkAgentResponse(
                 mode="answered",
                 confidence=0.6 if recall else 0.2,
@@ -446,7 +467,8 @@ async def link_agent(request: LinkAgentRequest):
                     reply = "i don't see your schedule yet. want me to pull it in?"
             else:
                 reply = "i don't see your schedule yet. want me to pull it in?"
-            link_orchestrator.insert_link_response(
+            await run_in_threadpool(
+                link_orchestrator.insert_link_response,
                 convo["id"],
                 request.university_id,
                 reply,
@@ -456,7 +478,7 @@ async def link_agent(request: LinkAgentRequest):
                 session_id=session["id"] if session else None,
                 task_state="answered",
             )
-            resolve_task_state(convo_state, "resolved", query=request.message_text)
+            await resolve_task_state(convo_state, "resolved", query=request.message_text)
             return LinkAgentResponse(
                 mode="answered",
                 confidence=0.8,
@@ -467,11 +489,12 @@ async def link_agent(request: LinkAgentRequest):
             )
 
         if mode == "awaiting_consent" and intent_result.intent == Intent.CONSENT_RESPONSE:
-            active_run = db.get_latest_active_outreach_run(request.user_id)
+            active_run = await db.get_latest_active_outreach_run(request.user_id)
             if active_run and active_run.get("status") == "awaiting_consent":
                 suggested = active_run.get("suggested_connection_user_id")
                 if lower in {"yes", "yep", "yeah", "yup", "ok", "okay", "sure"} and suggested:
-                    consent = link_orchestrator.resolve_consent(
+                    consent = await run_in_threadpool(
+                        link_orchestrator.resolve_consent,
                         active_run["id"],
                         request.user_id,
                         suggested,
@@ -479,7 +502,7 @@ async def link_agent(request: LinkAgentRequest):
                         target_ok=True,
                     )
                     reply = "connected. i made a chat."
-                    db.update_link_conversation_state(
+                    await db.update_link_conversation_state(
                         convo_state["id"],
                         {
                             "mode": "conversation",
@@ -487,7 +510,8 @@ async def link_agent(request: LinkAgentRequest):
                             "updated_at": datetime.utcnow().isoformat() + "Z",
                         },
                     )
-                    link_orchestrator.insert_link_response(
+                    await run_in_threadpool(
+                        link_orchestrator.insert_link_response,
                         convo["id"],
                         request.university_id,
                         reply,
@@ -506,12 +530,12 @@ async def link_agent(request: LinkAgentRequest):
                         ui=build_ui_hints("conversation", None),
                     )
                 # requester declined
-                db.update_link_outreach_run(
+                await db.update_link_outreach_run(
                     active_run["id"],
                     {"status": "collecting", "updated_at": datetime.utcnow().isoformat() + "Z"},
                 )
                 reply = "all good. i won’t connect you. want me to keep looking?"
-                db.update_link_conversation_state(
+                await db.update_link_conversation_state(
                     convo_state["id"],
                     {
                         "mode": "conversation",
@@ -519,7 +543,8 @@ async def link_agent(request: LinkAgentRequest):
                         "updated_at": datetime.utcnow().isoformat() + "Z",
                     },
                 )
-                link_orchestrator.insert_link_response(
+                await run_in_threadpool(
+                    link_orchestrator.insert_link_response,
                     convo["id"],
                     request.university_id,
                     reply,
@@ -540,7 +565,8 @@ async def link_agent(request: LinkAgentRequest):
 
         # DB-first: answer simple queries before any LLM calls.
         if intent["intent"] != "casual_chat":
-            pre_records = pre_records or link_orchestrator.retrieve_candidates(
+            pre_records = pre_records or await run_in_threadpool(
+                link_orchestrator.retrieve_candidates,
                 intent["intent"],
                 intent["tags"],
                 intent["time_window"],
@@ -552,9 +578,10 @@ async def link_agent(request: LinkAgentRequest):
         db_first = link_orchestrator.try_db_query(request.message_text, intent["intent"], pre_records, tags=intent.get("tags") or [])
         if db_first:
             if db_first.get("type") == "count_orgs":
-                count = db.get_organizations_count(request.university_id)
+                count = await db.get_organizations_count(request.university_id)
                 reply = f"looks like there are {count} orgs on campus."
-                link_orchestrator.insert_link_response(
+                await run_in_threadpool(
+                    link_orchestrator.insert_link_response,
                     convo["id"],
                     request.university_id,
                     reply,
@@ -564,7 +591,7 @@ async def link_agent(request: LinkAgentRequest):
                     session_id=session["id"] if session else None,
                     task_state="answered",
                 )
-                resolve_task_state(convo_state, "resolved", query=request.message_text)
+                await resolve_task_state(convo_state, "resolved", query=request.message_text)
                 return LinkAgentResponse(
                     mode="answered",
                     confidence=0.8,
@@ -574,9 +601,10 @@ async def link_agent(request: LinkAgentRequest):
                     ui=build_ui_hints("conversation", None),
                 )
             if db_first.get("type") == "count_events":
-                count = db.get_events_count(request.university_id)
+                count = await db.get_events_count(request.university_id)
                 reply = f"looks like there are {count} events on campus."
-                link_orchestrator.insert_link_response(
+                await run_in_threadpool(
+                    link_orchestrator.insert_link_response,
                     convo["id"],
                     request.university_id,
                     reply,
@@ -586,7 +614,7 @@ async def link_agent(request: LinkAgentRequest):
                     session_id=session["id"] if session else None,
                     task_state="answered",
                 )
-                resolve_task_state(convo_state, "resolved", query=request.message_text)
+                await resolve_task_state(convo_state, "resolved", query=request.message_text)
                 return LinkAgentResponse(
                     mode="answered",
                     confidence=0.8,
@@ -596,9 +624,10 @@ async def link_agent(request: LinkAgentRequest):
                     ui=build_ui_hints("conversation", None),
                 )
             if db_first.get("type") == "count_users":
-                count = db.get_profiles_count(request.university_id)
+                count = await db.get_profiles_count(request.university_id)
                 reply = f"looks like there are {count} users on the app."
-                link_orchestrator.insert_link_response(
+                await run_in_threadpool(
+                    link_orchestrator.insert_link_response,
                     convo["id"],
                     request.university_id,
                     reply,
@@ -608,7 +637,7 @@ async def link_agent(request: LinkAgentRequest):
                     session_id=session["id"] if session else None,
                     task_state="answered",
                 )
-                resolve_task_state(convo_state, "resolved", query=request.message_text)
+                await resolve_task_state(convo_state, "resolved", query=request.message_text)
                 return LinkAgentResponse(
                     mode="answered",
                     confidence=0.8,
@@ -619,9 +648,10 @@ async def link_agent(request: LinkAgentRequest):
                 )
             if db_first.get("type") == "count_major":
                 major_query = db_first.get("major_query") or "computer science"
-                count = db.get_profiles_count_by_major(major_query, request.university_id)
+                count = await db.get_profiles_count_by_major(major_query, request.university_id)
                 reply = f"looks like there are {count} {major_query} majors on campus."
-                link_orchestrator.insert_link_response(
+                await run_in_threadpool(
+                    link_orchestrator.insert_link_response,
                     convo["id"],
                     request.university_id,
                     reply,
@@ -631,7 +661,7 @@ async def link_agent(request: LinkAgentRequest):
                     session_id=session["id"] if session else None,
                     task_state="answered",
                 )
-                resolve_task_state(convo_state, "resolved", query=request.message_text)
+                await resolve_task_state(convo_state, "resolved", query=request.message_text)
                 return LinkAgentResponse(
                     mode="answered",
                     confidence=0.8,
@@ -641,7 +671,8 @@ async def link_agent(request: LinkAgentRequest):
                     ui=build_ui_hints("conversation", None),
                 )
             reply = db_first.get("answer_text") or "here's what i found:"
-            link_orchestrator.insert_link_response(
+            await run_in_threadpool(
+                link_orchestrator.insert_link_response,
                 convo["id"],
                 request.university_id,
                 reply,
@@ -654,7 +685,8 @@ async def link_agent(request: LinkAgentRequest):
             cards_payload = {}
             if db_first.get("type") == "list_orgs":
                 cards_payload = {"club_ids": [o.get("id") for o in (db_first.get("items") or []) if o.get("id")]}
-                link_orchestrator.insert_cards_from_items(
+                await run_in_threadpool(
+                    link_orchestrator.insert_cards_from_items,
                     convo["id"],
                     request.university_id,
                     db_first.get("items") or [],
@@ -663,7 +695,8 @@ async def link_agent(request: LinkAgentRequest):
                 )
             if db_first.get("type") == "list_events":
                 cards_payload = {"event_ids": [e.get("id") for e in (db_first.get("items") or []) if e.get("id")]}
-                link_orchestrator.insert_cards_from_items(
+                await run_in_threadpool(
+                    link_orchestrator.insert_cards_from_items,
                     convo["id"],
                     request.university_id,
                     db_first.get("items") or [],
@@ -672,14 +705,15 @@ async def link_agent(request: LinkAgentRequest):
                 )
             if db_first.get("type") == "list_people":
                 cards_payload = {"user_ids": [p.get("id") for p in (db_first.get("items") or []) if p.get("id")]}
-                link_orchestrator.insert_cards_from_items(
+                await run_in_threadpool(
+                    link_orchestrator.insert_cards_from_items,
                     convo["id"],
                     request.university_id,
                     db_first.get("items") or [],
                     "profile",
                     session_id=session["id"] if session else None,
                 )
-            resolve_task_state(convo_state, "resolved", query=request.message_text)
+            await resolve_task_state(convo_state, "resolved", query=request.message_text)
             return LinkAgentResponse(
                 mode="answered",
                 confidence=db_first.get("confidence", 0.7),
@@ -709,7 +743,8 @@ async def link_agent(request: LinkAgentRequest):
             Intent.MARKETPLACE,
         }:
             reply = "i don't see that in campus data yet. want me to ask around?"
-            link_orchestrator.insert_link_response(
+            await run_in_threadpool(
+                link_orchestrator.insert_link_response,
                 convo["id"],
                 request.university_id,
                 reply,
@@ -719,7 +754,7 @@ async def link_agent(request: LinkAgentRequest):
                 session_id=session["id"] if session else None,
                 task_state="clarifying",
             )
-            resolve_task_state(convo_state, "resolved", query=request.message_text)
+            await resolve_task_state(convo_state, "resolved", query=request.message_text)
             return LinkAgentResponse(
                 mode="answered",
                 confidence=0.4,
@@ -729,11 +764,11 @@ async def link_agent(request: LinkAgentRequest):
                 ui=build_ui_hints("conversation", None),
             )
 
-        capability = link_orchestrator.route_capability(request.message_text, intent)
+        capability = await run_in_threadpool(link_orchestrator.route_capability, request.message_text, intent)
 
         if mode == "conversation":
             profile = user_context.get("profile") if user_context else None
-            recent_link_msgs = db.list_recent_link_messages(convo["id"], sender_type="link", limit=3)
+            recent_link_msgs = await db.list_recent_link_messages(convo["id"], sender_type="link", limit=3)
             last_link_text = " ".join([m.get("content") or "" for m in recent_link_msgs]).lower()
             if "update anything" in last_link_text and "?" not in lower:
                 prefs = (user_memory or {}).get("known_preferences") or {}
@@ -744,11 +779,12 @@ async def link_agent(request: LinkAgentRequest):
                         likes.append(value)
                 if likes:
                     prefs["likes"] = likes[-5:]
-                    db.upsert_user_memory(request.user_id, {"known_preferences": prefs})
+                    await db.upsert_user_memory(request.user_id, {"known_preferences": prefs})
                     reply = "bet, i’ll remember that."
                 else:
                     reply = "gotchu. want me to add anything specific?"
-                link_orchestrator.insert_link_response(
+                await run_in_threadpool(
+                    link_orchestrator.insert_link_response,
                     convo["id"],
                     request.university_id,
                     reply,
@@ -768,7 +804,7 @@ async def link_agent(request: LinkAgentRequest):
                 )
             if any(x in lower for x in ["end that task", "stop asking", "cancel that", "drop that", "stop that"]):
                 if active_run:
-                    db.update_link_outreach_run(
+                    await db.update_link_outreach_run(
                         active_run["id"],
                         {"status": "failed", "updated_at": datetime.utcnow().isoformat() + "Z"},
                     )
@@ -780,7 +816,7 @@ async def link_agent(request: LinkAgentRequest):
                         preferred = lower.split(token, 1)[-1].strip().split(" ")[0]
                         break
                 if preferred:
-                    db.upsert_user_memory(
+                    await db.upsert_user_memory(
                         request.user_id,
                         {"known_preferences": {"preferred_name": preferred}},
                     )
@@ -818,26 +854,28 @@ async def link_agent(request: LinkAgentRequest):
             elif "that's not me" in lower or "thats not me" in lower:
                 reply = "oops, my bad. want me to update what i know about you?"
             else:
-                smalltalk_type = link_orchestrator.classify_smalltalk(request.message_text)
-                convo_history = build_conversation_history(convo["id"], limit=20)
+                smalltalk_type = await run_in_threadpool(link_orchestrator.classify_smalltalk, request.message_text)
+                convo_history = await build_conversation_history(convo["id"], limit=20)
                 if smalltalk_type == "capabilities":
-                    reply = link_orchestrator.generate_capabilities_response(
+                    reply = await run_in_threadpool(
+                        link_orchestrator.generate_capabilities_response,
                         request.message_text, user_memory, conversation_history=convo_history
                     )
                 else:
                     recent_user_msgs = [
                         m.get("content")
-                        for m in db.list_recent_link_messages(convo["id"], sender_type="user", limit=5)
+                        for m in await db.list_recent_link_messages(convo["id"], sender_type="user", limit=5)
                         if m.get("content")
                     ]
-                    reply = link_orchestrator.generate_small_talk_response(
+                    reply = await run_in_threadpool(
+                        link_orchestrator.generate_small_talk_response,
                         request.message_text,
                         user_memory,
                         recent_user_messages=recent_user_msgs,
                         conversation_history=convo_history,
                     )
             if any(x in lower for x in ["end that task", "stop asking", "cancel that", "drop that", "stop that"]):
-                db.update_link_conversation_state(
+                await db.update_link_conversation_state(
                     convo_state["id"],
                     {
                         "mode": "conversation",
@@ -845,7 +883,8 @@ async def link_agent(request: LinkAgentRequest):
                         "updated_at": datetime.utcnow().isoformat() + "Z",
                     },
                 )
-            link_orchestrator.insert_link_response(
+            await run_in_threadpool(
+                link_orchestrator.insert_link_response,
                 convo["id"],
                 request.university_id,
                 reply,
@@ -860,7 +899,8 @@ async def link_agent(request: LinkAgentRequest):
                 class_to_check = link_orchestrator.should_ask_class_checkin(user_memory)
                 if class_to_check and not active_run:
                     checkin = f"how was {class_to_check.upper()} today? what'd you learn?"
-                    link_orchestrator.insert_link_response(
+                    await run_in_threadpool(
+                        link_orchestrator.insert_link_response,
                         convo["id"],
                         request.university_id,
                         checkin,
@@ -869,7 +909,7 @@ async def link_agent(request: LinkAgentRequest):
                         confidence=0.2,
                         session_id=session["id"] if session else None,
                     )
-                    db.upsert_user_memory(
+                    await db.upsert_user_memory(
                         request.user_id,
                         {"last_class_checkin": datetime.utcnow().isoformat() + "Z"},
                     )
@@ -884,7 +924,8 @@ async def link_agent(request: LinkAgentRequest):
 
         if capability.get("clarify_question"):
             clarifying = capability.get("clarify_question")
-            link_orchestrator.insert_link_response(
+            await run_in_threadpool(
+                link_orchestrator.insert_link_response,
                 convo["id"],
                 request.university_id,
                 clarifying,
@@ -911,8 +952,9 @@ async def link_agent(request: LinkAgentRequest):
         ):
             lower = (request.message_text or "").lower()
             if lower.strip() in {"yo", "hey", "hi", "sup", "what's up", "whats up"} or len(lower.strip()) <= 3:
-                reply = link_orchestrator.generate_small_talk_response(request.message_text, user_memory)
-                link_orchestrator.insert_link_response(
+                reply = await run_in_threadpool(link_orchestrator.generate_small_talk_response, request.message_text, user_memory)
+                await run_in_threadpool(
+                    link_orchestrator.insert_link_response,
                     convo["id"],
                     request.university_id,
                     reply,
@@ -929,7 +971,8 @@ async def link_agent(request: LinkAgentRequest):
                     task=None,
                     ui=build_ui_hints("conversation", None),
                 )
-            outreach = link_orchestrator.start_outreach(
+            outreach = await run_in_threadpool(
+                link_orchestrator.start_outreach,
                 request.user_id,
                 request.university_id,
                 convo["id"],
@@ -942,7 +985,7 @@ async def link_agent(request: LinkAgentRequest):
                 active_task = dict(active_task)
                 active_task["status"] = "outreach_sent"
                 active_task["run_id"] = outreach.get("run_id")
-            db.update_link_conversation_state(
+            await db.update_link_conversation_state(
                 convo_state["id"],
                 {
                     "mode": "outreach",
@@ -964,7 +1007,8 @@ async def link_agent(request: LinkAgentRequest):
             and intent_result.intent != Intent.PEOPLE_SEARCH
         ):
             clarifying = "can you be a lil more specific so i can check the db?"
-            link_orchestrator.insert_link_response(
+            await run_in_threadpool(
+                link_orchestrator.insert_link_response,
                 convo["id"],
                 request.university_id,
                 clarifying,
@@ -987,9 +1031,10 @@ async def link_agent(request: LinkAgentRequest):
         q_lower = (request.message_text or "").lower()
         if "how many" in q_lower:
             if any(x in q_lower for x in ["org", "organization", "organizations", "club", "clubs"]):
-                count = db.get_organizations_count(request.university_id)
+                count = await db.get_organizations_count(request.university_id)
                 reply = f"looks like there are {count} orgs on campus."
-                link_orchestrator.insert_link_response(
+                await run_in_threadpool(
+                    link_orchestrator.insert_link_response,
                     convo["id"],
                     request.university_id,
                     reply,
@@ -998,7 +1043,7 @@ async def link_agent(request: LinkAgentRequest):
                     confidence=0.8,
                     session_id=session["id"] if session else None,
                 )
-                resolve_task_state(convo_state, "resolved", query=request.message_text)
+                await resolve_task_state(convo_state, "resolved", query=request.message_text)
                 return LinkAgentResponse(
                     mode="answered",
                     confidence=0.8,
@@ -1008,9 +1053,10 @@ async def link_agent(request: LinkAgentRequest):
                     ui=build_ui_hints("conversation", None),
                 )
             if any(x in q_lower for x in ["event", "events"]):
-                count = db.get_events_count(request.university_id)
+                count = await db.get_events_count(request.university_id)
                 reply = f"looks like there are {count} events on campus."
-                link_orchestrator.insert_link_response(
+                await run_in_threadpool(
+                    link_orchestrator.insert_link_response,
                     convo["id"],
                     request.university_id,
                     reply,
@@ -1019,7 +1065,7 @@ async def link_agent(request: LinkAgentRequest):
                     confidence=0.8,
                     session_id=session["id"] if session else None,
                 )
-                resolve_task_state(convo_state, "resolved", query=request.message_text)
+                await resolve_task_state(convo_state, "resolved", query=request.message_text)
                 return LinkAgentResponse(
                     mode="answered",
                     confidence=0.8,
@@ -1032,7 +1078,8 @@ async def link_agent(request: LinkAgentRequest):
         records = pre_records or {"events": [], "orgs": [], "profiles": [], "facts": []}
         cached_facts = records.get("facts") or []
         if cached_facts:
-            cached_answer = link_orchestrator.compose_cached_answer(
+            cached_answer = await run_in_threadpool(
+                link_orchestrator.compose_cached_answer,
                 request.message_text, cached_facts, style_instructions=style_instructions
             )
             if (
@@ -1040,7 +1087,8 @@ async def link_agent(request: LinkAgentRequest):
                 and cached_answer.get("citations")
                 and link_orchestrator.validate_cached_citations(cached_answer.get("citations"), cached_facts)
             ):
-                link_orchestrator.insert_link_response(
+                await run_in_threadpool(
+                    link_orchestrator.insert_link_response,
                     convo["id"],
                     request.university_id,
                     cached_answer.get("answer_text") or "Here's what I found.",
@@ -1049,7 +1097,7 @@ async def link_agent(request: LinkAgentRequest):
                     confidence=cached_answer.get("confidence", 0.0),
                     session_id=session["id"] if session else None,
                 )
-                resolve_task_state(convo_state, "resolved", query=request.message_text)
+                await resolve_task_state(convo_state, "resolved", query=request.message_text)
                 return LinkAgentResponse(
                     mode="answered",
                     confidence=cached_answer.get("confidence", 0.0),
@@ -1059,7 +1107,8 @@ async def link_agent(request: LinkAgentRequest):
                     task=None,
                     ui=build_ui_hints("conversation", None),
                 )
-        answer = link_orchestrator.compose_grounded_answer(
+        answer = await run_in_threadpool(
+            link_orchestrator.compose_grounded_answer,
             request.message_text, records, style_instructions=style_instructions
         )
         if answer.get("answer_mode") == "direct" and not answer.get("citations"):
@@ -1088,7 +1137,8 @@ async def link_agent(request: LinkAgentRequest):
                 if len(all_people) > 2:
                     cards["user_ids"] = (cards.get("user_ids") or all_people)[:2]
                     more_options = True
-            link_orchestrator.insert_link_response(
+            await run_in_threadpool(
+                link_orchestrator.insert_link_response,
                 convo["id"],
                 request.university_id,
                 answer.get("answer_text") or "Here's what I found.",
@@ -1097,9 +1147,11 @@ async def link_agent(request: LinkAgentRequest):
                 confidence=confidence,
                 session_id=session["id"] if session else None,
                 task_state="answered",
+                records=records,
             )
             if more_options:
-                link_orchestrator.insert_link_response(
+                await run_in_threadpool(
+                    link_orchestrator.insert_link_response,
                     convo["id"],
                     request.university_id,
                     "i found a couple options. want more?",
@@ -1108,17 +1160,19 @@ async def link_agent(request: LinkAgentRequest):
                     confidence=0.4,
                     session_id=session["id"] if session else None,
                 )
-            link_orchestrator.write_verified_facts_from_records(
+            await run_in_threadpool(
+                link_orchestrator.write_verified_facts_from_records,
                 request.university_id,
                 records,
                 answer.get("citations") or [],
                 answer.get("answer_text") or "",
                 confidence,
             )
-            resolve_task_state(convo_state, "resolved", query=request.message_text)
+            await resolve_task_state(convo_state, "resolved", query=request.message_text)
             follow_up = link_orchestrator.generate_friend_checkin(user_memory)
             if follow_up:
-                link_orchestrator.insert_link_response(
+                await run_in_threadpool(
+                    link_orchestrator.insert_link_response,
                     convo["id"],
                     request.university_id,
                     follow_up,
@@ -1139,7 +1193,8 @@ async def link_agent(request: LinkAgentRequest):
 
         if answer["answer_mode"] == "ask_clarifying":
             clarifying = answer.get("answer_text") or "Can you share a bit more detail so I can look this up?"
-            link_orchestrator.insert_link_response(
+            await run_in_threadpool(
+                link_orchestrator.insert_link_response,
                 convo["id"],
                 request.university_id,
                 clarifying,
@@ -1152,7 +1207,7 @@ async def link_agent(request: LinkAgentRequest):
             if active_task:
                 active_task = dict(active_task)
                 active_task["status"] = "awaiting_user"
-            db.update_link_conversation_state(
+            await db.update_link_conversation_state(
                 convo_state["id"],
                 {
                     "mode": "agent",
@@ -1162,7 +1217,8 @@ async def link_agent(request: LinkAgentRequest):
             )
             follow_up = link_orchestrator.generate_friend_checkin(user_memory)
             if follow_up:
-                link_orchestrator.insert_link_response(
+                await run_in_threadpool(
+                    link_orchestrator.insert_link_response,
                     convo["id"],
                     request.university_id,
                     follow_up,
@@ -1182,7 +1238,8 @@ async def link_agent(request: LinkAgentRequest):
 
         if intent_result.intent != Intent.PEOPLE_SEARCH:
             clarifying = "i don't see that in campus data yet. want me to ask around?"
-            link_orchestrator.insert_link_response(
+            await run_in_threadpool(
+                link_orchestrator.insert_link_response,
                 convo["id"],
                 request.university_id,
                 clarifying,
@@ -1192,7 +1249,7 @@ async def link_agent(request: LinkAgentRequest):
                 session_id=session["id"] if session else None,
                 task_state="clarifying",
             )
-            resolve_task_state(convo_state, "resolved", query=request.message_text)
+            await resolve_task_state(convo_state, "resolved", query=request.message_text)
             return LinkAgentResponse(
                 mode="answered",
                 confidence=0.4,
@@ -1202,7 +1259,8 @@ async def link_agent(request: LinkAgentRequest):
                 ui=build_ui_hints("conversation", None),
             )
 
-        outreach = link_orchestrator.start_outreach(
+        outreach = await run_in_threadpool(
+            link_orchestrator.start_outreach,
             request.user_id,
             request.university_id,
             convo["id"],
@@ -1215,7 +1273,7 @@ async def link_agent(request: LinkAgentRequest):
             active_task = dict(active_task)
             active_task["status"] = "outreach_sent"
             active_task["run_id"] = outreach.get("run_id")
-        db.update_link_conversation_state(
+        await db.update_link_conversation_state(
             convo_state["id"],
             {
                 "mode": "outreach",
@@ -1240,7 +1298,8 @@ async def link_agent(request: LinkAgentRequest):
 async def link_outreach_collect(request: LinkOutreachCollectRequest):
     """Collect outreach replies and respond in Link chat."""
     try:
-        result = link_orchestrator.collect_outreach(
+        result = await run_in_threadpool(
+            link_orchestrator.collect_outreach,
             request.run_id,
             request.university_id,
             session_id=request.session_id,
@@ -1259,7 +1318,8 @@ async def link_outreach_collect(request: LinkOutreachCollectRequest):
 async def link_consent_resolve(request: LinkConsentResolveRequest):
     """Resolve two-sided consent and create intro chat."""
     try:
-        result = link_orchestrator.resolve_consent(
+        result = await run_in_threadpool(
+            link_orchestrator.resolve_consent,
             request.run_id,
             request.requester_user_id,
             request.target_user_id,
@@ -1279,7 +1339,8 @@ async def link_relay_start(request: LinkRelayStartRequest):
     try:
         validate_uuid(request.requester_user_id, "requester_user_id")
         validate_uuid(request.target_user_id, "target_user_id")
-        result = link_orchestrator.start_link_relay(
+        result = await run_in_threadpool(
+            link_orchestrator.start_link_relay,
             request.requester_user_id,
             request.requester_conversation_id,
             request.target_user_id,
@@ -1295,7 +1356,8 @@ async def link_relay_start(request: LinkRelayStartRequest):
 @app.post("/link/relay/collect", response_model=LinkRelayResponse)
 async def link_relay_collect(request: LinkRelayCollectRequest):
     try:
-        result = link_orchestrator.collect_link_relay(
+        result = await run_in_threadpool(
+            link_orchestrator.collect_link_relay,
             request.run_id,
             request.university_id,
             session_id=request.session_id,
@@ -1325,8 +1387,8 @@ async def outreach_start(request: OutreachStartRequest):
         "hard_cap": settings.OUTREACH_HARD_CAP,
         "excluded_user_ids": [request.user_id],
     }
-    outreach = outreach_logic.start_outreach(payload)
-    target_profiles = db.get_profiles_by_ids([t["user_id"] for t in outreach["targets"]])
+    outreach = await run_in_threadpool(outreach_logic.start_outreach, payload)
+    target_profiles = await db.get_profiles_by_ids([t["user_id"] for t in outreach["targets"]])
     name_map = {p.get("id"): p.get("full_name") for p in target_profiles}
 
     return OutreachStartResponse(
@@ -1344,20 +1406,20 @@ async def outreach_start(request: OutreachStartRequest):
 @app.post("/outreach/process", response_model=OutreachProcessResponse)
 async def outreach_process(request: OutreachProcessRequest):
     """Process outreach responses."""
-    outreach_request = db.get_outreach_request(request.outreach_request_id)
+    outreach_request = await db.get_outreach_request(request.outreach_request_id)
     if not outreach_request:
         raise HTTPException(status_code=404, detail="Outreach request not found")
 
     # If waiting on candidate consent, check for reply
     if outreach_request.get("status") == "consent_pending":
-        consent = outreach_logic.evaluate_candidate_consent(outreach_request)
+        consent = await run_in_threadpool(outreach_logic.evaluate_candidate_consent, outreach_request)
         if consent == "yes":
-            db.update_outreach_request(outreach_request["id"], {"status": "connecting"})
+            await db.update_outreach_request(outreach_request["id"], {"status": "connecting"})
             candidate_id = outreach_request.get("selected_candidate_id")
-            profile = db.get_profile(candidate_id, enforce_public=True) if candidate_id else None
+            profile = await db.get_profile(candidate_id, enforce_public=True) if candidate_id else None
             entities = (outreach_request.get("parsed_intent") or {}).get("entities") or []
             if candidate_id and entities:
-                db.create_link_fact(
+                await db.create_link_fact(
                     {
                         "entity_type": "profile",
                         "entity_id": candidate_id,
@@ -1384,18 +1446,18 @@ async def outreach_process(request: OutreachProcessRequest):
                 next_actions=["create_chat"],
             )
         if consent == "no":
-            db.update_outreach_request(outreach_request["id"], {"status": "collecting"})
+            await db.update_outreach_request(outreach_request["id"], {"status": "collecting"})
 
-    result = outreach_logic.process_outreach_round(outreach_request)
+    result = await run_in_threadpool(outreach_logic.process_outreach_round, outreach_request)
 
     # If no candidates yet and still collecting, expand outreach
     if result["status"] == "collecting" and not result["candidates"]:
-        outreach_request = db.get_outreach_request(request.outreach_request_id)
-        outreach_logic.expand_outreach(outreach_request)
+        outreach_request = await db.get_outreach_request(request.outreach_request_id)
+        await run_in_threadpool(outreach_logic.expand_outreach, outreach_request)
 
     matches = []
     for c in result["candidates"]:
-        profile = db.get_profile(c.user_id, enforce_public=True)
+        profile = await db.get_profile(c.user_id, enforce_public=True)
         matches.append(
             {
                 "user_id": c.user_id,
@@ -1419,7 +1481,7 @@ async def outreach_process(request: OutreachProcessRequest):
 @app.get("/outreach/status/{outreach_request_id}")
 async def outreach_status(outreach_request_id: str):
     """Get current status for an outreach request."""
-    outreach_request = db.get_outreach_request(outreach_request_id)
+    outreach_request = await db.get_outreach_request(outreach_request_id)
     if not outreach_request:
         raise HTTPException(status_code=404, detail="Outreach request not found")
     return {
@@ -1434,17 +1496,17 @@ async def outreach_status(outreach_request_id: str):
 @app.post("/outreach/reply")
 async def outreach_reply(request: OutreachReplyRequest):
     """Ingest a reply from a target user."""
-    outreach_request = db.get_outreach_request(request.outreach_request_id)
+    outreach_request = await db.get_outreach_request(request.outreach_request_id)
     if not outreach_request:
         raise HTTPException(status_code=404, detail="Outreach request not found")
 
     # Update the most recent outreach message for this responder
-    messages = db.list_outreach_messages(request.outreach_request_id, target_user_id=request.responder_user_id)
+    messages = await db.list_outreach_messages(request.outreach_request_id, target_user_id=request.responder_user_id)
     if not messages:
         raise HTTPException(status_code=404, detail="Outreach message not found for responder")
 
     latest = messages[-1]
-    db.update_outreach_message(
+    await db.update_outreach_message(
         latest["id"],
         {
             "response_text": request.response_text,
@@ -1458,22 +1520,22 @@ async def outreach_reply(request: OutreachReplyRequest):
 @app.post("/outreach/requester-consent", response_model=OutreachConsentResponse)
 async def outreach_requester_consent(request: OutreachRequesterConsentRequest):
     """Handle requester decision on a candidate."""
-    outreach_request = db.get_outreach_request(request.outreach_request_id)
+    outreach_request = await db.get_outreach_request(request.outreach_request_id)
     if not outreach_request:
         raise HTTPException(status_code=404, detail="Outreach request not found")
 
     decision = request.decision.lower()
     if decision == "ask_more":
-        outreach_logic.expand_outreach(outreach_request)
-        db.update_outreach_request(outreach_request["id"], {"status": "collecting"})
+        await run_in_threadpool(outreach_logic.expand_outreach, outreach_request)
+        await db.update_outreach_request(outreach_request["id"], {"status": "collecting"})
         return OutreachConsentResponse(status="collecting", action="ask_more", message="Asking a few more people.")
     if decision == "no":
-        db.update_outreach_request(outreach_request["id"], {"status": "resolved", "requester_consent": False})
+        await db.update_outreach_request(outreach_request["id"], {"status": "resolved", "requester_consent": False})
         return OutreachConsentResponse(status="resolved", action="no", message="Got it - no intro sent.")
     if decision == "show_other":
         return OutreachConsentResponse(status="candidate_found", action="show_other", message="Here are other options.")
     if decision == "yes":
-        outreach_logic.request_candidate_consent(outreach_request, request.candidate_user_id)
+        await run_in_threadpool(outreach_logic.request_candidate_consent, outreach_request, request.candidate_user_id)
         return OutreachConsentResponse(
             status="consent_pending",
             action="waiting_for_candidate_consent",
@@ -1491,12 +1553,12 @@ async def connect_users(request: ConnectRequest):
     if not request.target_user_ids:
         raise HTTPException(status_code=400, detail="No target users provided")
 
-    requester_profile = db.get_profile(request.requesting_user_id, enforce_public=False)
+    requester_profile = await db.get_profile(request.requesting_user_id, enforce_public=False)
     university_id = requester_profile.get("university_id") if requester_profile else None
-    link_profile = db.get_link_system_profile(university_id) if university_id else None
+    link_profile = await db.get_link_system_profile(university_id) if university_id else None
     link_sender_id = link_profile.get("link_user_id") if link_profile else None
 
-    convo = db.create_conversation(
+    convo = await db.create_conversation(
         {
             "type": "group" if request.create_group_chat or len(request.target_user_ids) > 1 else "direct",
             "created_by": request.requesting_user_id,
@@ -1504,13 +1566,13 @@ async def connect_users(request: ConnectRequest):
         }
     )
 
-    db.add_conversation_participants(convo["id"], [request.requesting_user_id] + request.target_user_ids)
+    await db.add_conversation_participants(convo["id"], [request.requesting_user_id] + request.target_user_ids)
 
     intro = f"hey! Link here - i connected you because {request.connection_reason}!"
     if link_sender_id:
-        db.insert_message(convo["id"], link_sender_id, intro, {"shareType": "text"})
+        await db.insert_message(convo["id"], link_sender_id, intro, {"shareType": "text"})
 
-    connection = db.create_connection(
+    connection = await db.create_connection(
         {
             "university_id": university_id,
             "user1_id": request.requesting_user_id,
@@ -1534,11 +1596,12 @@ async def connect_users(request: ConnectRequest):
 async def learn_style(request: StyleLearnRequest):
     """Learn user's communication style from a message."""
     validate_uuid(request.user_id, "user_id")
-    profile = db.get_profile(request.user_id, enforce_public=False) or {}
+    profile = await db.get_profile(request.user_id, enforce_public=False) or {}
     university_id = profile.get("university_id")
     if not university_id:
         raise HTTPException(status_code=400, detail="university_id is required")
-    memory = link_orchestrator.update_user_style_memory(
+    memory = await run_in_threadpool(
+        link_orchestrator.update_user_style_memory,
         request.user_id,
         university_id,
         request.message,
@@ -1555,7 +1618,7 @@ async def learn_style(request: StyleLearnRequest):
 @app.get("/style/{user_id}", response_model=StyleProfileResponse)
 async def get_style_profile(user_id: str):
     """Get user's detected communication style profile."""
-    memory = db.get_user_memory(user_id)
+    memory = await db.get_user_memory(user_id)
     
     if not memory:
         return StyleProfileResponse(
@@ -1583,7 +1646,7 @@ async def get_style_profile(user_id: str):
 async def get_journal(user_id: str, limit: int = 10):
     """Get journal entries for a user."""
     try:
-        entries = db.get_journal_entries(user_id, limit)
+        entries = await db.get_journal_entries(user_id, limit)
         return {"entries": entries}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -1596,19 +1659,70 @@ async def reindex(
     request: ReindexRequest = None,
     x_admin_token: Optional[str] = Header(None),
 ):
-    """Rebuild the RAG index. Requires admin token."""
+    """Queue a sync (or full rebuild) of the RAG index. Requires admin token.
+
+    Returns immediately; poll /reindex/{job_id} for progress. Queries keep
+    using the current index generation until the new one is swapped in.
+    """
     if settings.ADMIN_TOKEN and x_admin_token != settings.ADMIN_TOKEN:
         raise HTTPException(status_code=403, detail="Invalid admin token")
     
     university_id = request.university_id if request else None
-    counts = rag_index.build_index(university_id)
-    
+    job = rag_index.start_reindex(university_id, full=bool(request and request.full))
     return {
-        "status": "completed",
-        "documents_indexed": counts,
+        "status": job["status"],
+        "job_id": job["id"],
+        "progress": job["progress"],
+        "index_generation": rag_index.index_generation(),
     }
 
 
+@app.get("/reindex/{job_id}")
+async def reindex_status(job_id: str, x_admin_token: Optional[str] = Header(None)):
+    """Status, progress and result of a reindex job. Requires admin token."""
+    if settings.ADMIN_TOKEN and x_admin_token != settings.ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+    job = index_jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Reindex job not found")
+    return {**job, "index_generation": rag_index.index_generation()}
+
+
+@app.get("/index/stats")
+async def index_stats(x_admin_token: Optional[str] = Header(None)):
+    """RAG index, shard cache, embedding cache, change-sync and expiry stats. Requires admin token."""
+    if settings.ADMIN_TOKEN and x_admin_token != settings.ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+    return {**rag_index.index_stats(), "change_sync": index_sync.stats(), "expiry": index_expiry.stats()}
+
+
+@app.get("/cache/stats")
+async def cache_stats(x_admin_token: Optional[str] = Header(None)):
+    """In-process data-layer cache stats. Requires admin token."""
+    if settings.ADMIN_TOKEN and x_admin_token != settings.ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+    return {
+        "rls_clients": supabase_client.rls_client_stats(),
+        "university": supabase_client.university_cache.stats(),
+        "user_context": supabase_client.user_context_cache.stats(),
+        "dm_conversations": supabase_client.dm_conversation_cache.stats(),
+    }
+
+
+@app.post("/cache/invalidate")
+async def cache_invalidate(
+    university_id: Optional[str] = None,
+    user_id: Optional[str] = None,
+    x_admin_token: Optional[str] = Header(None),
+):
+    """Drop cached per-university lookups (all universities if none given), or one user's context. Requires admin token."""
+    if settings.ADMIN_TOKEN and x_admin_token != settings.ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+    if user_id:
+        return {"dropped": supabase_client.invalidate_user_context(user_id)}
+    return {"dropped": supabase_client.invalidate_university(university_id)}
+
+
 # ============ Evaluation Endpoint ============
 
 @app.get("/eval/run")
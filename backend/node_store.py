@@ -0,0 +1,426 @@
+"""Compact, row-aligned node metadata for index shards.
+
+Instead of a dict per row holding the full document text and a copy of its
+metadata, a shard keeps parallel columns: id, name, a short text preview, a
+binary content hash and the few fields filters and expiry need. type,
+university_id, category and consent are dictionary-encoded into small
+integer arrays. The doc key ("type:id") is derived, not stored.
+
+Full text lives in a side file (texts.bin + text_offsets.npy) that is
+memory-mapped and only read when something needs it, such as building the
+BM25 index or document_text(). A NodeSpill writes that file as records arrive,
+so a full build never holds a shard's texts in memory, and append() extends it
+(see row_files), so an incremental write only adds the new rows' text and a
+fresh, small set of columns.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import sys
+from datetime import datetime, timezone
+from typing import Callable, Iterable, Iterator, Optional
+
+import numpy as np
+
+from row_files import append_rows, read_rows
+
+PREVIEW_CHARS = 200
+# Columns are saved as <stem>.json / <stem>.npz; incremental writes pick a new stem
+NODES_STEM = "nodes"
+NODES_FILE = f"{NODES_STEM}.json"
+COLUMNS_FILE = f"{NODES_STEM}.npz"
+TEXTS_FILE = "texts.bin"
+TEXT_OFFSETS_FILE = "text_offsets.npy"
+SPILL_FILE = "nodes.spill.jsonl"
+# Dictionary-encoded columns (code 0 is None)
+CATEGORICAL = ("type", "university_id", "category", "consent")
+CODE_DTYPES = {"type": np.int8, "university_id": np.int32, "category": np.int32, "consent": np.int8}
+
+
+def expiry_epoch(value: Optional[str]) -> float:
+    """An ISO timestamp as epoch seconds (inf if missing or unparseable)."""
+    if not value:
+        return np.inf
+    try:
+        parsed = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    except ValueError:
+        return np.inf
+    return (parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)).timestamp()
+
+
+def deep_sizeof(obj, _seen: Optional[set] = None) -> int:
+    """Approximate bytes held by a tree of dicts / lists / strings / arrays."""
+    seen = _seen if _seen is not None else set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    if isinstance(obj, np.ndarray):
+        return obj.nbytes + sys.getsizeof(obj) if not isinstance(obj, np.memmap) else sys.getsizeof(obj)
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_sizeof(k, seen) + deep_sizeof(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set)):
+        size += sum(deep_sizeof(item, seen) for item in obj)
+    elif isinstance(obj, Node):
+        size += sum(deep_sizeof(getattr(obj, f), seen) for f in Node.__slots__)
+    return size
+
+
+class Node:
+    """Read-only view of one row; .get() / [] keep dict-style callers working."""
+
+    __slots__ = ("key", "hash", "id", "type", "name", "university_id", "preview", "category", "consent", "expires_at")
+
+    def __init__(self, **fields):
+        for field in self.__slots__:
+            setattr(self, field, fields.get(field))
+
+    def get(self, field: str, default=None):
+        value = getattr(self, field, None)
+        return default if value is None else value
+
+    def __getitem__(self, field: str):
+        if field not in self.__slots__:
+            raise KeyError(field)
+        return getattr(self, field)
+
+    @property
+    def text(self) -> str:
+        # Callers that only need a snippet get the preview; see NodeTable.text()
+        return self.preview or ""
+
+    @property
+    def metadata(self) -> dict:
+        meta = {
+            "university_id": self.university_id,
+            "category": self.category,
+            "consent": self.consent,
+            "start_at": self.expires_at if self.type == "event" else None,
+        }
+        return {k: v for k, v in meta.items() if v is not None}
+
+
+class NodeTable:
+    """Column store of a shard's nodes; rows where `live` is False are tombstones."""
+
+    def __init__(self, columns: dict, vocabs: dict[str, list], text_of: Callable[[int], Optional[str]]):
+        self._columns = columns
+        self._vocabs = vocabs
+        self._text_of = text_of
+
+    # ============ Construction ============
+
+    @classmethod
+    def empty(cls) -> "NodeTable":
+        return cls.from_records([])
+
+    @classmethod
+    def coerce(cls, nodes) -> "NodeTable":
+        """A NodeTable as-is, or one built from a list of node dicts."""
+        return nodes if isinstance(nodes, NodeTable) else cls.from_records(list(nodes))
+
+    @classmethod
+    def from_records(cls, records: Iterable[Optional[dict]], count: Optional[int] = None) -> "NodeTable":
+        """Build from node dicts (rag_index._node_record shape); None = tombstone.
+
+        `records` may be any iterable if `count` gives its length.
+        """
+        vocabs: dict[str, list] = {name: [None] for name in CATEGORICAL}
+        lookup: dict[str, dict] = {name: {None: 0} for name in CATEGORICAL}
+
+        def code(name: str, value) -> int:
+            codes = lookup[name]
+            if value not in codes:
+                codes[value] = len(vocabs[name])
+                vocabs[name].append(value)
+            return codes[value]
+
+        n = len(records) if count is None else count
+        columns = {
+            "id": [""] * n,
+            "name": [""] * n,
+            "preview": [""] * n,
+            # Raw sha256 digests (a fixed-width bytes dtype would strip trailing NULs)
+            "hash": np.zeros((n, 32), dtype=np.uint8),
+            "expires": np.full(n, np.inf, dtype=np.float64),
+            "live": np.zeros(n, dtype=bool),
+            **{name: np.zeros(n, dtype=CODE_DTYPES[name]) for name in CATEGORICAL},
+        }
+        texts: list[Optional[str]] = [None] * n
+        for row, record in enumerate(records):
+            if not record:
+                continue
+            meta = record.get("metadata") or {}
+            text = record.get("text") or ""
+            columns["id"][row] = str(record.get("id") or "")
+            columns["name"][row] = str(record.get("name") or "")
+            columns["preview"][row] = text[:PREVIEW_CHARS]
+            digest = bytes.fromhex(record.get("hash") or "")
+            if len(digest) == 32:
+                columns["hash"][row] = np.frombuffer(digest, dtype=np.uint8)
+            columns["expires"][row] = expiry_epoch(record.get("expires_at"))
+            columns["live"][row] = True
+            columns["type"][row] = code("type", record.get("type"))
+            columns["university_id"][row] = code("university_id", record.get("university_id") or None)
+            columns["category"][row] = code("category", meta.get("category"))
+            columns["consent"][row] = code("consent", meta.get("consent"))
+            texts[row] = text
+        return cls(columns, vocabs, texts.__getitem__)
+
+    # ============ Row access ============
+
+    def __len__(self) -> int:
+        return len(self._columns["live"])
+
+    def __getitem__(self, row: int) -> Optional[Node]:
+        if not self._columns["live"][row]:
+            return None
+        c = self._columns
+        expires = c["expires"][row]
+        return Node(
+            key=self.key(row),
+            hash=c["hash"][row].tobytes().hex(),
+            id=c["id"][row],
+            type=self._value("type", row),
+            name=c["name"][row],
+            university_id=self._value("university_id", row),
+            preview=c["preview"][row],
+            category=self._value("category", row),
+            consent=self._value("consent", row),
+            expires_at=datetime.fromtimestamp(expires, timezone.utc).isoformat() if np.isfinite(expires) else None,
+        )
+
+    def __iter__(self) -> Iterator[Optional[Node]]:
+        return (self[row] for row in range(len(self)))
+
+    def _value(self, name: str, row: int):
+        return self._vocabs[name][int(self._columns[name][row])]
+
+    @property
+    def live(self) -> np.ndarray:
+        return self._columns["live"]
+
+    @property
+    def expires(self) -> np.ndarray:
+        """Per-row expiry as epoch seconds (inf for rows that never expire)."""
+        return self._columns["expires"]
+
+    def key(self, row: int) -> str:
+        return f"{self._value('type', row)}:{self._columns['id'][row]}"
+
+    def row_keys(self) -> dict[str, int]:
+        return {self.key(row): int(row) for row in np.flatnonzero(self.live)}
+
+    def text(self, row: int) -> Optional[str]:
+        """Full document text (read from the side file when loaded from disk)."""
+        return self._text_of(row) if self.live[row] else None
+
+    def texts(self) -> list[Optional[str]]:
+        return [self.text(row) for row in range(len(self))]
+
+    def matches(self, types, categories, consents) -> np.ndarray:
+        """Mask of live rows matching normalised filter values (see index_store.filter_key)."""
+        mask = self.live.copy()
+        if types is not None:
+            mask &= np.isin(self._columns["type"], self._codes("type", types))
+        if categories is not None:
+            mask &= np.isin(self._columns["category"], self._codes("category", categories))
+        if consents is not None:
+            # consent only constrains link_fact rows
+            facts = np.isin(self._columns["type"], self._codes("type", {"link_fact"}))
+            mask &= ~facts | np.isin(self._columns["consent"], self._codes("consent", consents))
+        return mask
+
+    def _codes(self, name: str, values) -> list[int]:
+        return [code for code, value in enumerate(self._vocabs[name]) if str(value or "").lower() in values]
+
+    # ============ Updates ============
+
+    def apply(self, deleted_rows: list[int], records: list[dict]) -> "NodeTable":
+        """New table with `deleted_rows` tombstoned and `records` appended."""
+        added = NodeTable.from_records(records)
+        base_len = len(self)
+        vocabs = {name: list(vocab) for name, vocab in self._vocabs.items()}
+        remap = {}
+        for name in CATEGORICAL:
+            lookup = {value: code for code, value in enumerate(vocabs[name])}
+            for value in added._vocabs[name]:
+                if value not in lookup:
+                    lookup[value] = len(vocabs[name])
+                    vocabs[name].append(value)
+            remap[name] = np.array([lookup[value] for value in added._vocabs[name]], dtype=CODE_DTYPES[name])
+        columns = {}
+        for name, column in self._columns.items():
+            other = added._columns[name]
+            if name in remap:
+                other = remap[name][other]
+            if isinstance(column, np.ndarray):
+                columns[name] = np.concatenate([column, other])
+            else:
+                columns[name] = column + other
+        columns["live"][list(deleted_rows)] = False
+
+        base_text, added_text = self._text_of, added._text_of
+        return NodeTable(
+            columns, vocabs, lambda row: base_text(row) if row < base_len else added_text(row - base_len)
+        )
+
+    def select(self, rows: list[int]) -> "NodeTable":
+        """New table keeping only `rows` (compaction)."""
+        index = np.asarray(rows, dtype=np.int64)
+        columns = {
+            name: column[index] if isinstance(column, np.ndarray) else [column[i] for i in rows]
+            for name, column in self._columns.items()
+        }
+        base_text = self._text_of
+        return NodeTable(columns, self._vocabs, lambda row: base_text(int(index[row])))
+
+    # ============ Persistence ============
+
+    def save(self, path: str, texts: bool = True, stem: str = NODES_STEM) -> None:
+        """Write the columns and (unless `texts` is False) the text side file."""
+        c = self._columns
+        with open(os.path.join(path, f"{stem}.json"), "w", encoding="utf-8") as fh:
+            json.dump(
+                {"id": c["id"], "name": c["name"], "preview": c["preview"], "vocabs": self._vocabs},
+                fh,
+                separators=(",", ":"),
+                default=str,
+            )
+        np.savez(
+            os.path.join(path, f"{stem}.npz"),
+            **{name: c[name] for name in ("hash", "expires", "live", *CATEGORICAL)},
+        )
+        if not texts:
+            return
+        offsets = np.zeros(len(self) + 1, dtype=np.int64)
+        with open(os.path.join(path, TEXTS_FILE), "wb") as fh:
+            for row in range(len(self)):
+                data = (self.text(row) or "").encode("utf-8")
+                fh.write(data)
+                offsets[row + 1] = offsets[row] + len(data)
+        np.save(os.path.join(path, TEXT_OFFSETS_FILE), offsets)
+
+    def append(self, path: str, start: int, stem: str) -> None:
+        """Save to a directory holding this table's first `start` rows.
+
+        Text of rows from `start` on is appended to the side file, and the
+        columns are written under `stem` (the caller picks a new one per
+        generation, so readers of the old columns are unaffected).
+        """
+        offsets_path = os.path.join(path, TEXT_OFFSETS_FILE)
+        end = int(read_rows(offsets_path, start + 1)[-1])
+        added = np.zeros(len(self) - start, dtype=np.int64)
+        with open(os.path.join(path, TEXTS_FILE), "r+b") as fh:
+            if os.fstat(fh.fileno()).st_size < end:
+                raise ValueError(f"{path} text file is shorter than its offsets")
+            fh.truncate(end)
+            fh.seek(end)
+            for i, row in enumerate(range(start, len(self))):
+                data = (self.text(row) or "").encode("utf-8")
+                fh.write(data)
+                end += len(data)
+                added[i] = end
+        append_rows(offsets_path, start + 1, added)
+        self.save(path, texts=False, stem=stem)
+
+    @classmethod
+    def load(cls, path: str, stem: str = NODES_STEM) -> "NodeTable":
+        with open(os.path.join(path, f"{stem}.json"), "r", encoding="utf-8") as fh:
+            data = json.load(fh)
+        if isinstance(data, list):
+            # Snapshot written before the compact format (a dict per node)
+            return cls.from_records(data)
+        with np.load(os.path.join(path, f"{stem}.npz")) as arrays:
+            columns = {name: arrays[name] for name in arrays.files}
+        columns.update(id=data["id"], name=data["name"], preview=data["preview"])
+        # The side file may hold rows of later generations past this table's
+        offsets = read_rows(os.path.join(path, TEXT_OFFSETS_FILE), len(columns["live"]) + 1)
+        texts_path = os.path.join(path, TEXTS_FILE)
+        size = int(offsets[-1])
+        blob = np.memmap(texts_path, dtype=np.uint8, mode="r", shape=(size,)) if size else np.zeros(0, dtype=np.uint8)
+
+        def text_of(row: int) -> str:
+            return blob[offsets[row] : offsets[row + 1]].tobytes().decode("utf-8")
+
+        return cls(columns, data["vocabs"], text_of)
+
+    # ============ Footprint ============
+
+    def memory_bytes(self) -> int:
+        """Bytes held in memory (the text side file is memory-mapped, not counted)."""
+        return deep_sizeof(self._columns) + deep_sizeof(self._vocabs)
+
+    def footprint(self) -> dict:
+        """Compact size vs. the previous dict-per-node layout with full text.
+
+        The "before" figure is rebuilt from what the table still knows, so it
+        is a lower bound (the old metadata dicts also copied interests etc.).
+        """
+        records = []
+        for row in range(len(self)):
+            node = self[row]
+            if node is None:
+                records.append(None)
+                continue
+            records.append({
+                "key": node.key, "hash": node.hash, "id": node.id, "type": node.type, "name": node.name,
+                "university_id": node.university_id, "text": self.text(row), "metadata": node.metadata,
+                "expires_at": node.expires_at,
+            })
+        before = deep_sizeof(records)
+        after = self.memory_bytes()
+        return {
+            "rows": len(self),
+            "dict_nodes_bytes": before,
+            "compact_bytes": after,
+            "saved_ratio": round(1 - after / before, 3) if before else 0.0,
+        }
+
+
+class NodeSpill:
+    """Node records appended to a shard directory while the shard is built.
+
+    Full text goes straight to the text side file; the rest of each record,
+    with its text cut to the preview, goes to a JSON-lines file that finish()
+    turns into the column files.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._texts = open(os.path.join(path, TEXTS_FILE), "wb")
+        self._records = open(os.path.join(path, SPILL_FILE), "w", encoding="utf-8")
+        self._offsets = [0]
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def append(self, records: list[dict]) -> None:
+        for record in records:
+            text = record.get("text") or ""
+            data = text.encode("utf-8")
+            self._texts.write(data)
+            self._offsets.append(self._offsets[-1] + len(data))
+            meta = record.get("metadata") or {}
+            slim = {
+                **record,
+                "text": text[:PREVIEW_CHARS],
+                "metadata": {"category": meta.get("category"), "consent": meta.get("consent")},
+            }
+            self._records.write(json.dumps(slim, separators=(",", ":"), default=str) + "\n")
+
+    def close(self) -> None:
+        self._texts.close()
+        self._records.close()
+
+    def finish(self) -> NodeTable:
+        """Write the column files and return the table, reading text from disk."""
+        self.close()
+        np.save(os.path.join(self.path, TEXT_OFFSETS_FILE), np.asarray(self._offsets, dtype=np.int64))
+        spill = os.path.join(self.path, SPILL_FILE)
+        with open(spill, "r", encoding="utf-8") as fh:
+            NodeTable.from_records((json.loads(line) for line in fh), count=len(self)).save(self.path, texts=False)
+        os.remove(spill)
+        return NodeTable.load(self.path)
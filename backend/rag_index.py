@@ -1,16 +1,35 @@
-"""RAG indexing and retrieval for Link AI using LlamaIndex."""
+"""RAG indexing and retrieval for Link AI.
 
+LlamaIndex provides documents and embedding models; vectors are persisted as
+per-university snapshots (see index_store) and searched with NumPy.
+"""
+
+import hashlib
 import os
-from typing import Optional
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Iterable, Iterator, Optional
 
-from llama_index.core import Document, VectorStoreIndex, Settings
+import numpy as np
+from llama_index.core import Document, Settings
 
 from config import settings as app_settings
+import bm25_index
+from embedding_cache import CachedEmbedding, EmbeddingCache
+import index_jobs
+import index_store
 import supabase_client as db
+from ttl_cache import TTLCache
 
-# Global index instance
-_index: Optional[VectorStoreIndex] = None
+# Loaded index shards, keyed by index_store.shard_key(university_id). Only the
+# hottest campuses stay mapped; evicted shards are re-mapped on next use.
+_shards = TTLCache(maxsize=app_settings.MAX_LOADED_SHARDS)
 _is_indexed: bool = False
+_settings_ready: bool = False
+_embedding_cache: Optional[EmbeddingCache] = None
+# retrieve_dual results keyed by (query, variant, university, top_k, filters, generation)
+_dual_cache = TTLCache(maxsize=app_settings.RETRIEVAL_CACHE_SIZE, ttl=app_settings.RETRIEVAL_CACHE_TTL_SECONDS)
+_search_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="rag-search")
 
 # In TEST_MODE (or when no API key) we skip building a real index
 
@@ -30,7 +49,12 @@ def _init_llama_settings():
         # Gemini provider (custom embedder to avoid package version mismatch)
         os.environ["GOOGLE_API_KEY"] = app_settings.GOOGLE_API_KEY
         from gemini_embedder import GeminiEmbedder
-        Settings.embed_model = GeminiEmbedder(model_name="text-embedding-004")
+        Settings.embed_model = GeminiEmbedder(
+            model_name="text-embedding-004",
+            batch_size=app_settings.EMBED_BATCH_SIZE,
+            max_concurrency=app_settings.EMBED_CONCURRENCY,
+            max_retries=app_settings.EMBED_MAX_RETRIES,
+        )
         # LLM not required for retrieval/indexing; link_logic handles LLM calls.
     else:
         # OpenAI provider (default)
@@ -38,7 +62,23 @@ def _init_llama_settings():
         from llama_index.llms.openai import OpenAI
         from llama_index.embeddings.openai import OpenAIEmbedding
         Settings.llm = OpenAI(model="gpt-4o-mini", temperature=0)
-        Settings.embed_model = OpenAIEmbedding(model="text-embedding-3-small")
+        Settings.embed_model = OpenAIEmbedding(
+            model="text-embedding-3-small",
+            embed_batch_size=app_settings.EMBED_BATCH_SIZE,
+            max_retries=app_settings.EMBED_MAX_RETRIES,
+        )
+
+    # Both providers consult the shared embedding cache first
+    global _embedding_cache
+    if app_settings.EMBED_CACHE_PATH:
+        try:
+            if _embedding_cache is None:
+                _embedding_cache = EmbeddingCache(
+                    app_settings.EMBED_CACHE_PATH, max_entries=app_settings.EMBED_CACHE_MAX_ENTRIES
+                )
+            Settings.embed_model = CachedEmbedding(Settings.embed_model, _embedding_cache)
+        except Exception as e:
+            print(f"Warning: Embedding cache disabled: {e}")
 
 
 # ============ Document Creators ============
@@ -114,6 +154,7 @@ Location: {event.get('location_name', 'TBD')}
             "university_id": event.get("university_id", ""),
             "name": event.get("title", "Unknown Event"),
             "event_type": event.get("type"),
+            "start_at": event.get("start_at"),
         },
     )
 
@@ -167,150 +208,680 @@ Tags: {', '.join(post.get('tags') or [])}
 
 # ============ Index Management ============
 
-def build_index(university_id: Optional[str] = None) -> dict:
-    """Build or rebuild the RAG index from Supabase data."""
-    global _index, _is_indexed
+# (document type, counts key, keyset loader, document creator) for every indexed table
+_SOURCES = (
+    ("profile", "profiles", db.iter_profiles, create_profile_document),
+    ("organization", "organizations", db.iter_organizations, create_org_document),
+    ("event", "events", db.iter_upcoming_events, create_event_document),
+    ("link_fact", "link_facts", lambda uid: db.iter_link_facts(uid, consent_only=True), create_fact_document),
+    ("post", "posts", db.iter_posts, create_post_document),
+)
+
+
+def _stream_documents(university_id: Optional[str], counts: dict, failed: set[str]) -> Iterator[Document]:
+    """Yield every indexable record from Supabase as a document.
+
+    Tables are paged through by keyset, so only one page of rows is held at a
+    time and nothing is cut off at a row limit. `counts` and `failed` fill in
+    as the stream is consumed; `failed` collects the document types whose
+    table failed to load, so incremental syncs don't mistake an outage for
+    mass deletion.
+    """
+    for doc_type, count_key, loader, create in _SOURCES:
+        counts.setdefault(count_key, 0)
+        try:
+            for row in loader(university_id):
+                yield create(row)
+                counts[count_key] += 1
+        except Exception as e:
+            print(f"Warning: Could not load {count_key}: {e}")
+            failed.add(doc_type)
+
+
+def _load_marks(started: datetime, keys: Iterable[str], failed: set[str]) -> dict:
+    """Change-feed watermarks (see index_sync) for a load that began at `started`.
+
+    Tables are paged by id, not time, so a row edited after its page was read
+    can be older than rows read later; the mark is the clock before the load,
+    less the sync overlap, never the newest row read. Tables whose documents
+    failed to load or embed get no mark and the feed's mark for them is
+    cleared (None), so the change feed pulls them in full again.
+    """
+    mark = (started - timedelta(seconds=app_settings.INDEX_SYNC_OVERLAP_SECONDS)).isoformat()
+    failed_tables = {table for doc_type, table, _, _ in _SOURCES if doc_type in failed}
+    tables = {table: None if table in failed_tables else mark for table in db.CHANGE_FEEDS}
+    marks: dict = {key: dict(tables) for key in keys}
+    if failed_tables:
+        marks[index_store.FEED_WATERMARKS] = dict.fromkeys(failed_tables)
+    return marks
+
+
+def _chunks(items: Iterable, size: int) -> Iterator[list]:
+    chunk: list = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _ensure_llama_settings() -> None:
+    global _settings_ready
+    if not _settings_ready:
+        _init_llama_settings()
+        _settings_ready = True
+
+
+def _embed_model_name() -> str:
+    return getattr(Settings.embed_model, "model_name", "") or ""
+
+
+def _embed_chunk_size() -> int:
+    return max(1, int(getattr(Settings.embed_model, "embed_batch_size", 0) or 100))
+
+
+def _embed_documents(
+    documents: list[Document], on_progress: Optional[Callable[[int], None]] = None
+) -> tuple[np.ndarray, list[Document]]:
+    """Embed document texts into an L2-normalised float32 matrix.
+
+    Documents that fail to embed are left out (and logged) rather than stored
+    with a placeholder vector; returns the matrix and the documents it covers.
+    The next sync sees them as new/changed and retries them.
+    """
+    embed_model = Settings.embed_model
+    chunk_size = _embed_chunk_size()
+    vectors: list = []
+    embedded: list[Document] = []
+    for start in range(0, len(documents), chunk_size):
+        chunk = documents[start : start + chunk_size]
+        try:
+            results = embed_model.get_text_embedding_batch([d.text for d in chunk])
+        except Exception as e:
+            # EmbeddingError carries the vectors that did succeed
+            results = getattr(e, "embeddings", None)
+            if not results or len(results) != len(chunk):
+                results = [None] * len(chunk)
+            failed = sum(1 for r in results if r is None)
+            print(f"Warning: {failed} of {len(chunk)} documents could not be embedded, will retry on next sync: {e}")
+        for doc, vector in zip(chunk, results):
+            if vector is not None:
+                vectors.append(vector)
+                embedded.append(doc)
+        if on_progress:
+            on_progress(len(chunk))
+    if not vectors:
+        return np.zeros((0, 0), dtype=np.float32), []
+    return index_store.normalize_rows(np.asarray(vectors, dtype=np.float32)), embedded
+
+
+def _failed_types(documents: list[Document], embedded: list[Document]) -> set[str]:
+    """Document types of the documents _embed_documents left out."""
+    done = {id(doc) for doc in embedded}
+    return {doc.metadata.get("type") for doc in documents if id(doc) not in done}
+
+
+def _doc_key(document: Document) -> str:
+    meta = document.metadata
+    return f"{meta.get('type', 'unknown')}:{meta.get('id', '')}"
+
+
+def _content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _node_record(document: Document) -> dict:
+    meta = document.metadata
+    return {
+        "key": _doc_key(document),
+        "hash": _content_hash(document.text),
+        "id": meta.get("id", ""),
+        "type": meta.get("type", "unknown"),
+        "name": meta.get("name", "Unknown"),
+        "university_id": meta.get("university_id"),
+        "text": document.text,
+        "metadata": meta,
+        # Events drop out of search once they've started (see index_expiry)
+        "expires_at": meta.get("start_at") if meta.get("type") == "event" else None,
+    }
+
+
+ProgressFn = Callable[[str, int, int], None]
+
+
+class _Progress:
+    """Forwards (phase, done, total) to an optional job progress callback."""
+
+    def __init__(self, callback: Optional[ProgressFn]):
+        self.callback = callback
+        self.done = 0
+        self.total = 0
+
+    def phase(self, name: str, total: int = 0) -> None:
+        self.done, self.total = 0, total
+        self._emit(name)
+
+    def advance(self, count: int) -> None:
+        self.done += count
+        self._emit("embedding")
+
+    def _emit(self, name: str) -> None:
+        if self.callback:
+            self.callback(name, self.done, self.total)
+
+
+def build_index(university_id: Optional[str] = None, progress: Optional[ProgressFn] = None) -> dict:
+    """Rebuild the RAG index from scratch (re-embeds everything) and persist it.
+
+    Documents stream from Supabase straight into embedding batches, and each
+    batch's vectors, texts and node records are appended to its shard's new
+    directory (index_store.ShardSpill). Memory holds one batch, plus the node
+    columns of the shard being finished. The new shards are written next to
+    the live ones and swapped in with the manifest, so queries keep using the
+    previous generation until then. Use start_reindex() to run this off the
+    request path.
+    """
+    global _is_indexed
 
     if _use_test_mode():
-        _index = None
+        _shards.clear()
         _is_indexed = True
         return {"profiles": 0, "organizations": 0, "events": 0, "link_facts": 0}
 
-    _init_llama_settings()
-
-    documents = []
-    counts = {"profiles": 0, "organizations": 0, "events": 0, "link_facts": 0, "posts": 0}
-
-    # Load profiles
-    try:
-        profiles = db.get_profiles(university_id)
-        for p in profiles:
-            documents.append(create_profile_document(p))
-            counts["profiles"] += 1
-    except Exception as e:
-        print(f"Warning: Could not load profiles: {e}")
-
-    # Load organizations
-    try:
-        orgs = db.get_organizations(university_id)
-        for o in orgs:
-            documents.append(create_org_document(o))
-            counts["organizations"] += 1
-    except Exception as e:
-        print(f"Warning: Could not load organizations: {e}")
+    _ensure_llama_settings()
+    tracker = _Progress(progress)
+    counts: dict = {}
+    failed: set[str] = set()
+    started = datetime.now(timezone.utc)
 
-    # Load upcoming events
-    try:
-        events = db.get_upcoming_events(university_id)
-        for e in events:
-            documents.append(create_event_document(e))
-            counts["events"] += 1
-    except Exception as e:
-        print(f"Warning: Could not load events: {e}")
+    spills: dict[str, index_store.ShardSpill] = {}
+    if university_id:
+        # Always cover the requested shard, even if the campus is now empty.
+        key = index_store.shard_key(university_id)
+        spills[key] = index_store.ShardSpill(key)
 
-    # Load verified facts
     try:
-        facts = db.get_link_facts(university_id, consent_only=True)
-        for f in facts:
-            documents.append(create_fact_document(f))
-            counts["link_facts"] += 1
-    except Exception as e:
-        print(f"Warning: Could not load link_facts: {e}")
+        tracker.phase("embedding")
+        for chunk in _chunks(_stream_documents(university_id, counts, failed), _embed_chunk_size()):
+            vectors, embedded = _embed_documents(chunk, on_progress=tracker.advance)
+            # Failed documents are left out of the snapshot; no mark keeps them on the feed
+            failed |= _failed_types(chunk, embedded)
+            by_shard: dict[str, list[int]] = {}
+            for row, doc in enumerate(embedded):
+                by_shard.setdefault(index_store.shard_key(doc.metadata.get("university_id")), []).append(row)
+            for key, rows in by_shard.items():
+                if key not in spills:
+                    spills[key] = index_store.ShardSpill(key)
+                spills[key].append(vectors[rows], [_node_record(embedded[row]) for row in rows])
+
+        tracker.phase("writing", total=len(spills))
+        marks = _load_marks(started, spills, failed)
+        index_store.write_shards(spills, _embed_model_name(), replace_all=university_id is None, watermarks=marks)
+    except BaseException:
+        for spill in spills.values():
+            spill.discard()
+        raise
+
+    # Free the old generation's shards; queries map the new ones on demand.
+    if university_id:
+        _shards.pop(index_store.shard_key(university_id), None)
+    else:
+        _shards.clear()
+    _is_indexed = True
+    return counts
 
-    # Load public forum posts
-    try:
-        posts = db.get_posts(university_id)
-        for p in posts:
-            documents.append(create_post_document(p))
-            counts["posts"] += 1
-    except Exception as e:
-        print(f"Warning: Could not load posts: {e}")
 
-    # Build the vector index
-    if documents:
-        _index = VectorStoreIndex.from_documents(documents)
-        _is_indexed = True
-    else:
-        # Create empty index
-        _index = VectorStoreIndex.from_documents([Document(text="No data available")])
+class _ShardChanges:
+    """Upserts and deletes against the live shards, embedded in batches.
+
+    Offered documents whose content hash matches the stored row are skipped;
+    the rest are embedded once a full embedding batch is pending.
+    """
+
+    def __init__(self, model_name: str, changes: dict, tracker: _Progress):
+        self.model_name = model_name
+        self.changes = changes
+        self.tracker = tracker
+        self.current: dict[str, index_store.Shard] = {}
+        self.upserts: dict[str, list] = {}
+        self.deletes: dict[str, list[str]] = {}
+        self.pending: list[tuple[str, Document]] = []
+        # Types of the documents that failed to embed
+        self.failed: set[str] = set()
+        self.chunk_size = _embed_chunk_size()
+
+    def shard(self, key: str) -> index_store.Shard:
+        if key not in self.current:
+            # Start from the shard queries are using, so its BM25 index carries over
+            shard = _cached_shard(key, keep=False)
+            if shard is None:
+                shard = index_store.Shard(key, np.zeros((0, 0), dtype=np.float32), [], embed_model=self.model_name)
+            self.current[key], self.upserts[key], self.deletes[key] = shard, [], []
+        return self.current[key]
+
+    def offer(self, doc: Document) -> tuple[str, str]:
+        """Queue a document unless it is unchanged; returns (shard key, doc key)."""
+        key = index_store.shard_key(doc.metadata.get("university_id"))
+        doc_key = _doc_key(doc)
+        existing = self.shard(key).get(doc_key)
+        if existing and existing.get("hash") == _content_hash(doc.text):
+            self.changes["skipped"] += 1
+            self.tracker.advance(1)
+        else:
+            self.pending.append((key, doc))
+            if len(self.pending) >= self.chunk_size:
+                self.flush()
+        return key, doc_key
+
+    def remove(self, key: str, doc_key: str) -> None:
+        if self.shard(key).get(doc_key) is not None:
+            self.deletes[key].append(doc_key)
+            self.changes["removed"] += 1
+
+    def flush(self) -> None:
+        """Embed pending documents.
+
+        Docs that fail to embed keep their previous row (and hash), so the
+        next sync retries them.
+        """
+        if not self.pending:
+            return
+        pending, self.pending = self.pending, []
+        vectors, embedded = _embed_documents([doc for _, doc in pending], on_progress=self.tracker.advance)
+        self.changes["failed"] += len(pending) - len(embedded)
+        self.failed |= _failed_types([doc for _, doc in pending], embedded)
+        keys = {id(doc): key for key, doc in pending}
+        for row, doc in enumerate(embedded):
+            key = keys[id(doc)]
+            self.changes["updated" if self.current[key].get(_doc_key(doc)) else "added"] += 1
+            self.upserts[key].append((_node_record(doc), vectors[row]))
+
+    def write(self, watermarks: Optional[dict] = None, force: bool = False) -> list[str]:
+        """Write changed shards as a new generation; returns their keys."""
+        self.flush()
+        applied: dict[str, index_store.Shard] = {}
+        for key, shard in self.current.items():
+            if not self.upserts[key] and not self.deletes[key]:
+                continue
+            # Appends the new rows to the shard's files unless it compacted
+            applied[key] = shard.apply(self.upserts[key], self.deletes[key])
+        self.tracker.phase("writing", total=len(applied))
+        if applied or force:
+            index_store.write_shards(applied, self.model_name, watermarks=watermarks)
+        for key, shard in applied.items():
+            # Map the written files here rather than on the next query, keeping
+            # the incrementally updated BM25 index (the rows are the same)
+            written = index_store.load_shard(key, embed_model=self.model_name)
+            if written is None:
+                _shards.pop(key, None)
+                continue
+            written.share_bm25(shard)
+            _shards.set(key, written)
+        return list(applied)
+
+
+def sync_index(university_id: Optional[str] = None, progress: Optional[ProgressFn] = None) -> dict:
+    """Incrementally sync the index with Supabase.
+
+    Documents are keyed by type + id and compared by content hash as they
+    stream in: only new or changed documents are embedded, unchanged ones are
+    skipped and rows that no longer exist are tombstoned.
+    """
+    global _is_indexed
+
+    changes = {"added": 0, "updated": 0, "skipped": 0, "removed": 0, "failed": 0}
+    if _use_test_mode():
         _is_indexed = True
-
-    return counts
+        return {"documents": {}, "changes": changes}
+
+    _ensure_llama_settings()
+    tracker = _Progress(progress)
+    counts: dict = {}
+    failed: set[str] = set()
+    started = datetime.now(timezone.utc)
+    pending = _ShardChanges(_embed_model_name(), changes, tracker)
+
+    # Shards with no documents left at all still need their rows removed.
+    for key in [index_store.shard_key(university_id)] if university_id else index_store.shard_keys():
+        pending.shard(key)
+
+    tracker.phase("embedding")
+    seen: set[tuple[str, str]] = set()
+    for doc in _stream_documents(university_id, counts, failed):
+        seen.add(pending.offer(doc))
+
+    for key, shard in list(pending.current.items()):
+        for doc_key in shard.keys():
+            if (key, doc_key) not in seen and doc_key.split(":", 1)[0] not in failed:
+                pending.remove(key, doc_key)
+
+    pending.flush()
+    marks = _load_marks(started, pending.current, failed | pending.failed)
+    pending.write(watermarks=marks, force=index_store.read_manifest() is None)
+    _is_indexed = True
+    return {"documents": counts, "changes": changes}
+
+
+def apply_changes(
+    documents: list[Document], removed: list[tuple[str, str]], watermarks: Optional[dict] = None
+) -> dict:
+    """Apply changed documents and removed (shard key, doc key) pairs.
+
+    Used by the change feed (index_sync). Unchanged documents are skipped by
+    hash; nothing is written unless a shard actually changed. `watermarks`
+    are only persisted if every document embedded, so failures are pulled
+    again.
+    """
+    changes = {"added": 0, "updated": 0, "skipped": 0, "removed": 0, "failed": 0}
+    _ensure_llama_settings()
+    pending = _ShardChanges(_embed_model_name(), changes, _Progress(None))
+    for doc in documents:
+        pending.offer(doc)
+    for key, doc_key in removed:
+        pending.remove(key, doc_key)
+    pending.flush()
+    changes["written"] = pending.write(watermarks=None if changes["failed"] else watermarks)
+    return changes
+
+
+def start_reindex(university_id: Optional[str] = None, full: bool = False) -> dict:
+    """Queue a sync (or full rebuild) on the background index worker; returns the job."""
+    if full:
+        return index_jobs.submit("rebuild", build_index, university_id)
+    return index_jobs.submit("sync", sync_index, university_id)
+
+
+def _ensure_snapshot() -> bool:
+    """True if a snapshot exists; otherwise queue the first build and return False."""
+    _ensure_llama_settings()
+    if index_store.current_manifest():
+        return True
+    # No snapshot yet (first deploy): build one in the background rather
+    # than inside the request that noticed.
+    start_reindex(full=True)
+    return False
+
+
+def _cached_shard(key: str, keep: bool = True) -> Optional[index_store.Shard]:
+    """Loaded shard for key, re-mapped if the live snapshot has moved on."""
+    entry = index_store.shard_entry(key)
+    if entry is None:
+        return None
+    shard = _shards.get(key)
+    if shard is not None and shard.is_written(entry):
+        return shard
+    shard = index_store.load_shard(key, embed_model=_embed_model_name())
+    if shard is not None and keep:
+        _shards.set(key, shard)
+    return shard
+
+
+def get_index(university_id: Optional[str] = None) -> Optional[index_store.Shard]:
+    """Get the index shard for a university, loading its snapshot lazily.
+
+    A cached shard is only reused while the manifest still points at it, so
+    a rebuild becomes visible to every query at once when its manifest is
+    swapped in.
+    """
+    if _use_test_mode():
+        return None
+    if not _ensure_snapshot():
+        return None
+    return _cached_shard(index_store.shard_key(university_id))
 
 
-def get_index() -> Optional[VectorStoreIndex]:
-    """Get the RAG index, building if necessary."""
-    global _index, _is_indexed
-    if _index is None and not _use_test_mode():
-        build_index()
-    return _index
+def index_generation() -> int:
+    """Generation of the live snapshot (0 before the first build)."""
+    return index_store.generation()
 
 
 def is_indexed() -> bool:
     """Check if the index has been built."""
-    return _is_indexed
+    return _is_indexed or bool(index_store.current_manifest())
+
+
+def index_stats() -> dict:
+    """Snapshot, loaded-shard and embedding-cache stats for admin endpoints."""
+    manifest = index_store.current_manifest()
+    return {
+        "snapshot": {
+            "generation": manifest.get("generation"),
+            "updated_at": manifest.get("updated_at"),
+            "shards": {
+                key: {k: entry.get(k) for k in ("count", "rows", "dim", "embed_model", "built_at")}
+                for key, entry in (manifest.get("shards") or {}).items()
+            },
+        },
+        "loaded_shards": {
+            **_shards.stats(),
+            "memory": {key: shard.memory_report() for key in _shards.keys() if (shard := _shards.get(key))},
+        },
+        "embedding_cache": _embedding_cache.stats() if _embedding_cache else None,
+        "retrieval_cache": _dual_cache.stats(),
+    }
 
 
 # ============ Retrieval ============
 
-def retrieve(query: str, top_k: int = 5, university_id: Optional[str] = None) -> list[dict]:
-    """Retrieve relevant documents for a query."""
+def retrieve(
+    query: str,
+    top_k: int = 5,
+    university_id: Optional[str] = None,
+    types: Optional[list[str]] = None,
+    category: Optional[str] = None,
+    consent: Optional[list[str]] = None,
+) -> list[dict]:
+    """Retrieve relevant documents for a query.
+
+    `types` (document types), `category` and `consent` (link_fact consent
+    statuses) are applied inside the search, so all top_k slots are usable.
+
+    With a university_id only that campus's shard is searched. Without one
+    (admin/CLI use) every shard is scanned; shards that aren't already loaded
+    are mapped for this call only so they don't evict hot campuses.
+
+    Vector and BM25 rankings are fused with reciprocal-rank fusion; queries
+    naming a course code or @username that BM25 matches exactly skip the
+    embedding call entirely.
+    """
     if _use_test_mode():
         # Return empty results in test mode
         return []
 
-    index = get_index()
-    retriever = index.as_retriever(similarity_top_k=top_k)
+    shards = _resolve_shards(university_id)
+    if not shards:
+        return []
+    filters = _filters(types, category, consent)
+    hits = _keyword_fast_path(query, shards, top_k, filters) if app_settings.HYBRID_SEARCH else None
+    if hits is None:
+        hits = _hybrid_search(query, shards, top_k, _embed_queries([query])[0], filters)
+    return [_format_result(node, score) for node, score in hits]
+
+
+def _filters(
+    types: Optional[list[str]] = None,
+    category: Optional[str] = None,
+    consent: Optional[list[str]] = None,
+) -> Optional[dict]:
+    if not (types or category or consent):
+        return None
+    return {"types": types, "category": category, "consent": consent}
+
+
+def _resolve_shards(university_id: Optional[str]) -> list[index_store.Shard]:
+    if university_id:
+        shards = [get_index(university_id)]
+    elif _ensure_snapshot():
+        shards = [_cached_shard(key, keep=False) for key in index_store.shard_keys()]
+    else:
+        shards = []
+    return [s for s in shards if s is not None and len(s)]
 
-    nodes = retriever.retrieve(query)
 
-    results = []
-    for node in nodes:
-        meta = node.metadata
-        # Filter by university if specified
-        if university_id and meta.get("university_id") != university_id:
+def _embed_queries(queries: list[str]) -> list[Optional[list[float]]]:
+    """Embed queries, batched into one provider call when the model allows it."""
+    if not queries:
+        return []
+    embed_model = Settings.embed_model
+    try:
+        if len(queries) > 1 and hasattr(embed_model, "get_query_embedding_batch"):
+            return list(embed_model.get_query_embedding_batch(queries))
+        return [embed_model.get_query_embedding(q) for q in queries]
+    except Exception as e:
+        print(f"Warning: Could not embed query: {e}")
+        return [None] * len(queries)
+
+
+def _format_result(node, score: float) -> dict:
+    # Only the stored preview; document_text() reads the full text
+    return {
+        "type": node.get("type", "unknown"),
+        "id": node.get("id", ""),
+        "name": node.get("name", "Unknown"),
+        "score": score,
+        "text": node.get("preview", ""),
+        "metadata": node.metadata,
+    }
+
+
+def document_text(result: dict, university_id: Optional[str] = None) -> Optional[str]:
+    """Full indexed text of a retrieve() result, read from the snapshot side file."""
+    shard = get_index(university_id or (result.get("metadata") or {}).get("university_id"))
+    return shard.text(f"{result.get('type')}:{result.get('id')}") if shard else None
+
+
+def _keyword_fast_path(
+    query: str,
+    shards: list[index_store.Shard],
+    top_k: int,
+    filters: Optional[dict] = None,
+) -> Optional[list[tuple[dict, float]]]:
+    """BM25-only answer when every course code / @username in the query is matched."""
+    exact_terms = bm25_index.special_terms(query)
+    if not exact_terms:
+        return None
+    hits = []
+    for shard in shards:
+        if not len(shard):
             continue
+        # Expired events are masked even when there are no filters
+        allowed = shard.keyword_mask(filters)
+        for row, score, coverage in shard.bm25.search(query, top_k * 4, allowed=allowed):
+            if shard.bm25.contains_all(row, exact_terms):
+                hits.append((shard.nodes[row], score, max(coverage, bm25_index.EXACT_MATCH_SCORE)))
+    if not hits:
+        return None
+    hits.sort(key=lambda hit: hit[1], reverse=True)
+    return [(node, confidence) for node, _, confidence in hits[:top_k]]
+
+
+def _hybrid_search(
+    query: str,
+    shards: list[index_store.Shard],
+    top_k: int,
+    query_embedding: Optional[list[float]],
+    filters: Optional[dict] = None,
+) -> list[tuple[dict, float]]:
+    """Vector top-k, fused with BM25 when hybrid search is on.
+
+    Fused results are ordered by RRF but keep a 0..1 score (the better of
+    cosine similarity and BM25 query-term coverage) for confidence gating.
+    """
+    candidates = top_k * 2 if app_settings.HYBRID_SEARCH else top_k
+    vector_hits: list[tuple[dict, float]] = []
+    if query_embedding is not None:
+        for shard in shards:
+            vector_hits.extend(shard.search(query_embedding, candidates, filters=filters))
+        vector_hits.sort(key=lambda hit: hit[1], reverse=True)
+    if not app_settings.HYBRID_SEARCH:
+        return vector_hits[:top_k]
+
+    keyword_hits: list[tuple[dict, float, float]] = []
+    for shard in shards:
+        keyword_hits.extend(shard.keyword_search(query, candidates, filters=filters))
+    keyword_hits.sort(key=lambda hit: hit[1], reverse=True)
+
+    nodes: dict[str, dict] = {}
+    confidence: dict[str, float] = {}
+    for node, score in vector_hits:
+        nodes[node["key"]] = node
+        confidence[node["key"]] = max(confidence.get(node["key"], 0.0), score)
+    for node, _, coverage in keyword_hits:
+        nodes[node["key"]] = node
+        confidence[node["key"]] = max(confidence.get(node["key"], 0.0), coverage)
+    fused = bm25_index.reciprocal_rank_fusion(
+        [[node["key"] for node, _ in vector_hits], [node["key"] for node, _, _ in keyword_hits]],
+        k=app_settings.RRF_K,
+    )
+    ranked = sorted(fused, key=fused.get, reverse=True)[:top_k]
+    return [(nodes[key], confidence[key]) for key in ranked]
 
-        results.append(
-            {
-                "type": meta.get("type", "unknown"),
-                "id": meta.get("id", ""),
-                "name": meta.get("name", "Unknown"),
-                "score": node.score,
-                "text": node.text[:200],
-                "metadata": meta,
-            }
-        )
-
-    return results
-
-
-def retrieve_dual(query: str, top_k: int = 5) -> tuple[list[dict], list[dict], float]:
-    """Perform dual retrieval for confidence scoring (agreement check)."""
-    if _use_test_mode():
-        return [], [], 1.0
-
-    # First retrieval with default settings
-    results_1 = retrieve(query, top_k)
-
-    # Second retrieval (in production, could use different temperature)
-    # For simplicity, we do the same retrieval - real impl would vary params
-    results_2 = retrieve(query, top_k)
 
-    # Calculate Jaccard similarity
+def _agreement(results_1: list[dict], results_2: list[dict]) -> float:
+    """Jaccard similarity of the two result id sets."""
     ids_1 = {r["id"] for r in results_1}
     ids_2 = {r["id"] for r in results_2}
-
     if not ids_1 and not ids_2:
-        agreement = 1.0
-    elif not ids_1 or not ids_2:
-        agreement = 0.0
+        return 1.0
+    if not ids_1 or not ids_2:
+        return 0.0
+    return len(ids_1 & ids_2) / len(ids_1 | ids_2)
+
+
+def retrieve_dual(
+    query: str,
+    top_k: int = 5,
+    university_id: Optional[str] = None,
+    variant: Optional[str] = None,
+    types: Optional[list[str]] = None,
+    category: Optional[str] = None,
+    consent: Optional[list[str]] = None,
+) -> tuple[list[dict], list[dict], float]:
+    """Retrieve a query and a variant of it (e.g. entity-expanded) for an
+    agreement check.
+
+    Both variants share one embedding batch and are searched concurrently;
+    the agreement is the Jaccard overlap of their results. Without a distinct
+    variant there is a single retrieval and agreement is 1.0. Results are
+    cached per (query, variant, university, filters, index generation).
+    Filters are the same as retrieve()'s.
+    """
+    if _use_test_mode():
+        return [], [], 1.0
+
+    variant = variant if variant and variant.strip() != query.strip() else None
+    filters = _filters(types, category, consent)
+    cache_key = (query, variant, university_id, top_k, index_store.filter_key(filters), index_generation())
+    cached = _dual_cache.get(cache_key)
+    if cached is not None:
+        return list(cached[0]), list(cached[1]), cached[2]
+
+    shards = _resolve_shards(university_id)
+    queries = [query] if variant is None else [query, variant]
+    if not shards:
+        hits_list: list[list[tuple[dict, float]]] = [[] for _ in queries]
     else:
-        intersection = len(ids_1 & ids_2)
-        union = len(ids_1 | ids_2)
-        agreement = intersection / union if union > 0 else 0.0
+        fast = [_keyword_fast_path(q, shards, top_k, filters) if app_settings.HYBRID_SEARCH else None for q in queries]
+        pending = [q for q, hits in zip(queries, fast) if hits is None]
+        embeddings = dict(zip(pending, _embed_queries(pending)))
+        if len(pending) > 1:
+            # NumPy releases the GIL during the matrix products
+            futures = {
+                q: _search_pool.submit(_hybrid_search, q, shards, top_k, embeddings[q], filters) for q in pending
+            }
+            searched = {q: f.result() for q, f in futures.items()}
+        else:
+            searched = {q: _hybrid_search(q, shards, top_k, embeddings[q], filters) for q in pending}
+        hits_list = [hits if hits is not None else searched[q] for q, hits in zip(queries, fast)]
 
-    return results_1, results_2, agreement
+    results = [[_format_result(node, score) for node, score in hits] for hits in hits_list]
+    results_1 = results[0]
+    results_2 = results[1] if variant is not None else results[0]
+    agreement = _agreement(results_1, results_2)
+    _dual_cache.set(cache_key, (results_1, results_2, agreement))
+    return list(results_1), list(results_2), agreement
 
 
 # ============ CLI Entry Point ============
@@ -318,9 +889,42 @@ def retrieve_dual(query: str, top_k: int = 5) -> tuple[list[dict], list[dict], f
 if __name__ == "__main__":
     import sys
 
-    if len(sys.argv) > 1 and sys.argv[1] == "rebuild":
-        print("Rebuilding RAG index...")
-        counts = build_index()
+    if len(sys.argv) > 1 and sys.argv[1] == "sync":
+        target = sys.argv[2] if len(sys.argv) > 2 else None
+        print(f"Syncing RAG index{f' for {target}' if target else ''}...")
+        result = sync_index(target)
+        print(f"Documents: {result['documents']}")
+        print(f"Changes: {result['changes']}")
+    elif len(sys.argv) > 1 and sys.argv[1] == "bench":
+        # Recall + latency of the configured search path against exact float32
+        keys = sys.argv[2:] or index_store.shard_keys()
+        rng = np.random.default_rng(0)
+        for key in keys:
+            shard = index_store.load_shard(key)
+            if shard is None or not len(shard):
+                print(f"{key}: no shard")
+                continue
+            live = np.flatnonzero(shard.nodes.live)
+            sample = rng.choice(live, size=min(200, len(live)), replace=False)
+            # Perturbed document vectors stand in for real queries
+            queries = np.asarray(shard.vectors[np.sort(sample)], dtype=np.float32)
+            queries += rng.normal(scale=0.02, size=queries.shape).astype(np.float32)
+            print(f"{key}: {shard.memory_report()}")
+            print(f"{key} nodes: {shard.nodes.footprint()}")
+            if shard.ann is None:
+                print(f"{key}: {index_store.recall_at_k(shard, queries, top_k=5)}")
+                continue
+            # Recall/latency trade-off across nprobe (LINK_ANN_NPROBE)
+            for nprobe in sorted({1, 2, 4, 8, 16, 32, app_settings.ANN_NPROBE}):
+                if nprobe > shard.ann.nlist:
+                    break
+                shard.nprobe = nprobe
+                print(f"{key} nprobe={nprobe}: {index_store.recall_at_k(shard, queries, top_k=5)}")
+    elif len(sys.argv) > 1 and sys.argv[1] == "rebuild":
+        target = sys.argv[2] if len(sys.argv) > 2 else None
+        print(f"Rebuilding RAG index{f' for {target}' if target else ''}...")
+        counts = build_index(target)
         print(f"Indexed: {counts}")
+        print(f"Snapshot written to {app_settings.INDEX_DIR}")
     else:
-        print("Usage: python -m rag_index rebuild")
+        print("Usage: python -m rag_index rebuild|sync|bench [university_id]")
@@ -0,0 +1,68 @@
+"""Append-only .npy files for index shards.
+
+A shard directory's row-aligned arrays (vectors, their quantized copy and
+scales, IVF assignments, text offsets) only grow: an incremental write
+appends the new rows after the ones already on disk instead of rewriting the
+file. The .npy header keeps the shape of the first write, so readers pass the
+row count of the generation they load and map just that prefix. Rows a failed
+write left past it are cut off by the next append, and readers of older
+generations never look past their own prefix.
+"""
+
+from __future__ import annotations
+
+import math
+import os
+from typing import Optional
+
+import numpy as np
+
+
+def _layout(path: str) -> tuple[np.dtype, tuple, int]:
+    """(dtype, per-row shape, data offset) from an .npy header."""
+    with open(path, "rb") as fh:
+        version = np.lib.format.read_magic(fh)
+        if version == (1, 0):
+            shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(fh)
+        else:
+            shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(fh)
+        if fortran_order:
+            raise ValueError(f"{path} is Fortran-ordered")
+        return dtype, tuple(shape[1:]), fh.tell()
+
+
+def read_rows(path: str, rows: Optional[int] = None, mmap: bool = True) -> np.ndarray:
+    """The first `rows` rows of an .npy file (all rows in its header if None).
+
+    Memory-mapped unless `mmap` is False. Raises ValueError if the file holds
+    fewer rows.
+    """
+    if rows is None:
+        return np.load(path, mmap_mode="r" if mmap else None)
+    dtype, row_shape, offset = _layout(path)
+    shape = (rows, *row_shape)
+    if not rows or not math.prod(row_shape):
+        return np.zeros(shape, dtype=dtype)
+    needed = offset + rows * dtype.itemsize * math.prod(row_shape)
+    if os.path.getsize(path) < needed:
+        raise ValueError(f"{path} holds fewer than {rows} rows")
+    matrix = np.memmap(path, dtype=dtype, mode="r", offset=offset, shape=shape)
+    return matrix if mmap else np.array(matrix)
+
+
+def append_rows(path: str, rows_before: int, values: np.ndarray) -> None:
+    """Write `values` after the first `rows_before` rows of an .npy file.
+
+    Anything already past those rows (left by a failed write) is dropped.
+    """
+    dtype, row_shape, offset = _layout(path)
+    values = np.ascontiguousarray(values, dtype=dtype)
+    if tuple(values.shape[1:]) != row_shape:
+        raise ValueError(f"cannot append rows of shape {values.shape[1:]} to {path} ({row_shape})")
+    end = offset + rows_before * dtype.itemsize * math.prod(row_shape)
+    if os.path.getsize(path) < end:
+        raise ValueError(f"{path} holds fewer than {rows_before} rows")
+    with open(path, "r+b") as fh:
+        fh.truncate(end)
+        fh.seek(end)
+        fh.write(values.tobytes())
@@ -82,6 +82,7 @@ class CheckinTriggerRequest(BaseModel):
 class ReindexRequest(BaseModel):
     """Request body for /reindex endpoint (optional university filter)."""
     university_id: Optional[str] = None
+    full: bool = False  # re-embed everything instead of syncing changes
 
 
 # ============ Link Orchestrator (New) ============
@@ -186,6 +187,7 @@ class HealthResponse(BaseModel):
     """Response from /health endpoint."""
     status: str
     rag_indexed: bool
+    index_generation: int = 0
     facts_count: int
     missing_config: list[str] = []
 
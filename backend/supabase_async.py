@@ -0,0 +1,775 @@
+"""Async Supabase data access for request handlers.
+
+The same functions as supabase_client, as coroutines. They talk to PostgREST
+directly over one shared keep-alive (HTTP/2 when available) httpx.AsyncClient
+with a per-call timeout, so a slow round trip only suspends the request that is
+waiting on it instead of the whole worker.
+
+Functions not implemented natively here fall back to the sync version in
+supabase_client, run on a worker thread.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Optional
+
+import httpx
+
+from config import settings
+import supabase_client as _sync
+
+_http: Optional[httpx.AsyncClient] = None
+
+
+class PostgrestError(Exception):
+    """A PostgREST request that came back with an error status."""
+
+    def __init__(self, status: int, payload: Any):
+        self.status = status
+        self.payload = payload
+        message = payload.get("message") if isinstance(payload, dict) else payload
+        super().__init__(f"PostgREST {status}: {message}")
+
+
+class Result:
+    """Response of a query: rows (or one row for single/maybe_single) and count."""
+
+    __slots__ = ("data", "count")
+
+    def __init__(self, data: Any, count: Optional[int] = None):
+        self.data = data
+        self.count = count
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Get or create the shared PostgREST connection pool."""
+    global _http
+    if _http is None or _http.is_closed:
+        if not settings.SUPABASE_URL:
+            raise RuntimeError("SUPABASE_URL must be set")
+        limits = httpx.Limits(
+            max_connections=settings.DB_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.DB_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=settings.DB_KEEPALIVE_SECONDS,
+        )
+        options = dict(
+            base_url=settings.SUPABASE_URL.rstrip("/") + "/rest/v1",
+            limits=limits,
+            timeout=settings.DB_TIMEOUT_SECONDS,
+        )
+        try:
+            _http = httpx.AsyncClient(http2=settings.DB_HTTP2, **options)
+        except ImportError:
+            # http2=True needs the h2 package (httpx[http2])
+            print("Warning: h2 not installed, async DB client falls back to HTTP/1.1")
+            _http = httpx.AsyncClient(**options)
+    return _http
+
+
+async def close() -> None:
+    """Close the shared pool (app shutdown)."""
+    global _http
+    if _http is not None:
+        await _http.aclose()
+        _http = None
+
+
+def _auth_headers(access_token: Optional[str] = None) -> dict:
+    if access_token:
+        if not settings.SUPABASE_ANON_KEY:
+            raise RuntimeError("SUPABASE_ANON_KEY must be set for RLS queries")
+        return {"apikey": settings.SUPABASE_ANON_KEY, "Authorization": f"Bearer {access_token}"}
+    if not settings.SUPABASE_SERVICE_KEY:
+        raise RuntimeError("SUPABASE_SERVICE_ROLE_KEY must be set")
+    return {"apikey": settings.SUPABASE_SERVICE_KEY, "Authorization": f"Bearer {settings.SUPABASE_SERVICE_KEY}"}
+
+
+def _value(value: Any) -> str:
+    if value is None:
+        return "null"
+    if isinstance(value, bool):
+        return str(value).lower()
+    return str(value)
+
+
+def _quote(value: Any) -> str:
+    # Values inside in.(...) lists are quoted when they contain reserved characters
+    text = _value(value)
+    if any(ch in text for ch in ',.:()"') or text != text.strip():
+        return '"' + text.replace("\\", "\\\\").replace('"', '\\"') + '"'
+    return text
+
+
+# ============ Query Builder ============
+
+class Query:
+    """Chainable PostgREST request, mirroring the supabase-py builder methods used here."""
+
+    def __init__(self, table: str, access_token: Optional[str] = None):
+        self._path = f"/{table}"
+        self._method = "GET"
+        self._params: list[tuple[str, str]] = []
+        self._order: list[str] = []
+        self._prefer: list[str] = []
+        self._body: Any = None
+        self._single: Optional[str] = None
+        self._headers = _auth_headers(access_token)
+
+    # Verbs
+    def select(self, columns: str = "*", count: Optional[str] = None) -> "Query":
+        self._params.append(("select", columns))
+        if count:
+            self._prefer.append(f"count={count}")
+        return self
+
+    def insert(self, payload: Any) -> "Query":
+        self._method, self._body = "POST", payload
+        self._prefer.append("return=representation")
+        return self
+
+    def upsert(self, payload: Any, on_conflict: Optional[str] = None) -> "Query":
+        self._method, self._body = "POST", payload
+        self._prefer += ["resolution=merge-duplicates", "return=representation"]
+        if on_conflict:
+            self._params.append(("on_conflict", on_conflict))
+        return self
+
+    def update(self, payload: dict) -> "Query":
+        self._method, self._body = "PATCH", payload
+        self._prefer.append("return=representation")
+        return self
+
+    def delete(self) -> "Query":
+        self._method = "DELETE"
+        self._prefer.append("return=representation")
+        return self
+
+    # Filters
+    def _filter(self, column: str, op: str, value: Any) -> "Query":
+        self._params.append((column, f"{op}.{value}"))
+        return self
+
+    def eq(self, column: str, value: Any) -> "Query":
+        return self._filter(column, "eq", _value(value))
+
+    def neq(self, column: str, value: Any) -> "Query":
+        return self._filter(column, "neq", _value(value))
+
+    def gt(self, column: str, value: Any) -> "Query":
+        return self._filter(column, "gt", _value(value))
+
+    def gte(self, column: str, value: Any) -> "Query":
+        return self._filter(column, "gte", _value(value))
+
+    def lt(self, column: str, value: Any) -> "Query":
+        return self._filter(column, "lt", _value(value))
+
+    def lte(self, column: str, value: Any) -> "Query":
+        return self._filter(column, "lte", _value(value))
+
+    def ilike(self, column: str, pattern: str) -> "Query":
+        return self._filter(column, "ilike", pattern)
+
+    def is_(self, column: str, value: str) -> "Query":
+        return self._filter(column, "is", value)
+
+    def in_(self, column: str, values: list) -> "Query":
+        return self._filter(column, "in", "(" + ",".join(_quote(v) for v in values) + ")")
+
+    def or_(self, filters: str) -> "Query":
+        self._params.append(("or", f"({filters})"))
+        return self
+
+    # Modifiers
+    def order(self, column: str, desc: bool = False) -> "Query":
+        self._order.append(f"{column}.{'desc' if desc else 'asc'}")
+        return self
+
+    def limit(self, count: int) -> "Query":
+        self._params.append(("limit", str(count)))
+        return self
+
+    def range(self, start: int, end: int) -> "Query":
+        self._params += [("offset", str(start)), ("limit", str(end - start + 1))]
+        return self
+
+    def single(self) -> "Query":
+        self._single = "single"
+        return self
+
+    def maybe_single(self) -> "Query":
+        self._single = "maybe"
+        return self
+
+    async def execute(self, timeout: Optional[float] = None) -> Result:
+        params = list(self._params)
+        if self._order:
+            params.append(("order", ",".join(self._order)))
+        headers = dict(self._headers)
+        if self._prefer:
+            headers["Prefer"] = ",".join(self._prefer)
+        return await _request(
+            self._method,
+            self._path,
+            params=params,
+            headers=headers,
+            body=self._body,
+            timeout=timeout,
+            single=self._single,
+        )
+
+
+def table(name: str, access_token: Optional[str] = None) -> Query:
+    """Start a query on `name`; with an access token it runs under the user's RLS."""
+    return Query(name, access_token)
+
+
+async def rpc(function: str, params: Optional[dict] = None, access_token: Optional[str] = None,
+              timeout: Optional[float] = None) -> Result:
+    """Call a Postgres function through PostgREST."""
+    return await _request(
+        "POST", f"/rpc/{function}", headers=_auth_headers(access_token), body=params or {}, timeout=timeout
+    )
+
+
+async def _request(
+    method: str,
+    path: str,
+    params: Optional[list] = None,
+    headers: Optional[dict] = None,
+    body: Any = None,
+    timeout: Optional[float] = None,
+    single: Optional[str] = None,
+) -> Result:
+    headers = dict(headers or {})
+    if body is not None:
+        headers["Content-Type"] = "application/json"
+    response = await get_http_client().request(
+        method,
+        path,
+        params=params,
+        headers=headers,
+        content=json.dumps(body, default=str) if body is not None else None,
+        timeout=settings.DB_TIMEOUT_SECONDS if timeout is None else timeout,
+    )
+    try:
+        payload = response.json() if response.content else None
+    except ValueError:
+        payload = response.text
+    if response.status_code >= 400:
+        raise PostgrestError(response.status_code, payload)
+
+    count = None
+    content_range = response.headers.get("content-range", "")
+    if "/" in content_range and not content_range.endswith("/*"):
+        count = int(content_range.rsplit("/", 1)[1])
+    if single:
+        rows = payload or []
+        if len(rows) > 1 or (single == "single" and not rows):
+            raise PostgrestError(406, {"message": f"expected a single row, got {len(rows)}"})
+        payload = rows[0] if rows else None
+    return Result(payload, count)
+
+
+def __getattr__(name: str):
+    # Anything not ported yet: the sync function on a worker thread
+    fn = getattr(_sync, name, None)
+    if name.startswith("_") or not callable(fn) or getattr(fn, "__module__", None) != _sync.__name__:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    async def call(*args, **kwargs):
+        return await asyncio.to_thread(fn, *args, **kwargs)
+
+    call.__name__ = name
+    call.__doc__ = fn.__doc__
+    return call
+
+
+def _now_iso() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _first(result: Result) -> Optional[dict]:
+    return result.data[0] if result.data else None
+
+
+# ============ Profile Functions ============
+
+def _visible(query: Query) -> Query:
+    return (
+        query
+        .neq("is_link", True)
+        .in_("friends_visibility", ["school", "public"])
+        .eq("yearbook_visible", True)
+    )
+
+
+async def get_profile(user_id: str, enforce_public: bool = True) -> Optional[dict]:
+    """Fetch a single profile by user ID."""
+    query = table("profiles").select("*").eq("id", user_id)
+    if enforce_public:
+        query = _visible(query)
+    return _first(await query.execute())
+
+
+async def get_profile_rls(access_token: str, user_id: str) -> Optional[dict]:
+    """Fetch a single profile by user ID using RLS."""
+    return (await table("profiles", access_token).select("*").eq("id", user_id).maybe_single().execute()).data
+
+
+async def get_profiles_by_ids(user_ids: list[str], enforce_public: bool = False) -> list[dict]:
+    """Fetch profiles by a list of user IDs."""
+    if not user_ids:
+        return []
+    query = table("profiles").select("*").in_("id", user_ids)
+    if enforce_public:
+        query = _visible(query)
+    return (await query.execute()).data
+
+
+async def _user_classes(user_id: str, access_token: Optional[str] = None) -> list[dict]:
+    try:
+        enrollments = (
+            await table("user_class_enrollments", access_token).select("class_id").eq("user_id", user_id).execute()
+        ).data
+        class_ids = [e.get("class_id") for e in enrollments if e.get("class_id")]
+        if not class_ids:
+            return []
+        return (await table("classes", access_token).select("*").in_("id", class_ids).execute()).data
+    except Exception:
+        return []
+
+
+async def _user_clubs(user_id: str, access_token: Optional[str] = None) -> list[dict]:
+    try:
+        memberships = (
+            await table("org_members", access_token).select("org_id").eq("user_id", user_id).execute()
+        ).data
+        org_ids = [m.get("org_id") for m in memberships if m.get("org_id")]
+        if not org_ids:
+            return []
+        return (await table("organizations", access_token).select("*").in_("id", org_ids).execute()).data
+    except Exception:
+        return []
+
+
+async def _user_context(user_id: str, access_token: Optional[str] = None) -> dict:
+    # Profile, classes and clubs are independent: two round trips deep, not five
+    profile, classes, clubs = await asyncio.gather(
+        table("profiles", access_token).select("*").eq("id", user_id).maybe_single().execute(),
+        _user_classes(user_id, access_token),
+        _user_clubs(user_id, access_token),
+    )
+    profile = profile.data
+    # Fallback to profile.class_schedule if no class rows
+    if not classes and profile and isinstance(profile.get("class_schedule"), list):
+        classes = profile["class_schedule"]
+    return {"profile": profile, "classes": classes, "clubs": clubs}
+
+
+async def _cached_user_context(user_id: str, access_token: Optional[str] = None) -> dict:
+    # Shares supabase_client.user_context_cache (and its invalidation)
+    key = _sync.user_context_key(user_id, access_token)
+    ttl = _sync.user_context_ttl(access_token)
+    if key is None or ttl <= 0:
+        return await _user_context(user_id, access_token)
+    return await _sync.user_context_cache.aget_or_load(key, lambda: _user_context(user_id, access_token), ttl=ttl)
+
+
+async def get_user_context_rls(access_token: str, user_id: str) -> dict:
+    """Fetch user profile + classes + clubs with RLS (best effort, cached per token subject)."""
+    return await _cached_user_context(user_id, access_token)
+
+
+async def get_user_context(user_id: str) -> dict:
+    """Fetch user profile + classes + clubs with service role (best effort, cached)."""
+    return await _cached_user_context(user_id)
+
+
+async def get_link_system_profile(university_id: str) -> Optional[dict]:
+    """Fetch Link system profile for a university (cached, see supabase_client.university_cache)."""
+    async def load():
+        return (
+            await table("link_system_profile").select("*").eq("university_id", university_id).maybe_single().execute()
+        ).data
+
+    return await _sync.university_cache.aget_or_load(("link_system_profile", university_id), load)
+
+
+async def _count(query: Query, cache_key: Optional[tuple] = None) -> int:
+    async def load():
+        return (await query.limit(1).execute()).count or 0
+
+    try:
+        if cache_key is None:
+            return await load()
+        return await _sync.university_cache.aget_or_load(cache_key, load)
+    except Exception:
+        return 0
+
+
+async def get_profiles_count(university_id: Optional[str] = None) -> int:
+    """Get count of profiles (non-Link, cached per university)."""
+    query = table("profiles").select("id", count="exact").neq("is_link", True)
+    if university_id:
+        query = query.eq("university_id", university_id)
+    return await _count(query, ("profiles_count", university_id))
+
+
+async def get_profiles_count_by_major(major_query: str, university_id: Optional[str] = None) -> int:
+    """Count profiles matching a major query (case-insensitive)."""
+    query = table("profiles").select("id", count="exact").neq("is_link", True)
+    if university_id:
+        query = query.eq("university_id", university_id)
+    if major_query:
+        query = query.ilike("major", f"%{major_query}%")
+    return await _count(query)
+
+
+# ============ Organization / Event Functions ============
+
+async def get_organizations_count(university_id: Optional[str] = None) -> int:
+    """Get total count of organizations (cached per university)."""
+    query = table("organizations").select("id", count="exact")
+    if university_id:
+        query = query.eq("university_id", university_id)
+    return await _count(query, ("organizations_count", university_id))
+
+
+async def get_organization(org_id: str) -> Optional[dict]:
+    """Fetch a single public organization."""
+    return _first(await table("organizations").select("*").eq("id", org_id).eq("is_public", True).execute())
+
+
+async def get_events_count(university_id: Optional[str] = None) -> int:
+    """Get total count of events (cached per university)."""
+    query = table("events").select("id", count="exact")
+    if university_id:
+        query = query.eq("university_id", university_id)
+    return await _count(query, ("events_count", university_id))
+
+
+async def get_event(event_id: str) -> Optional[dict]:
+    """Fetch a single event if it is broadly visible."""
+    return _first(
+        await table("events").select("*").eq("id", event_id).in_("visibility", ["public", "school"]).execute()
+    )
+
+
+# ============ Link Conversation/Message Functions ============
+
+async def get_or_create_link_conversation(user_id: str) -> Optional[dict]:
+    """Get or create a Link conversation for the user via RPC."""
+    conversation_id = (await rpc("get_or_create_link_conversation", {"p_user_id": user_id})).data
+    if not conversation_id:
+        return None
+    return (
+        await table("link_conversations").select("*").eq("id", conversation_id).maybe_single().execute()
+    ).data
+
+
+async def get_or_create_link_session(user_id: str, university_id: Optional[str] = None) -> Optional[dict]:
+    """Get or create an active Link session for the user."""
+    session = _first(
+        await table("link_user_sessions")
+        .select("*")
+        .eq("user_id", user_id)
+        .eq("status", "active")
+        .order("started_at", desc=True)
+        .limit(1)
+        .execute()
+    )
+    if not session:
+        payload = {"user_id": user_id, "status": "active"}
+        if university_id:
+            payload["university_id"] = university_id
+        session = _first(await table("link_user_sessions").insert(payload).execute())
+
+    if session:
+        await table("link_user_sessions").update({"last_active_at": _now_iso()}).eq("id", session["id"]).execute()
+    return session
+
+
+async def get_link_session_for_user(session_id: str, user_id: str) -> Optional[dict]:
+    """Fetch a Link session and ensure it belongs to the user."""
+    return (
+        await table("link_user_sessions")
+        .select("*")
+        .eq("id", session_id)
+        .eq("user_id", user_id)
+        .maybe_single()
+        .execute()
+    ).data
+
+
+async def insert_link_message(
+    conversation_id: str,
+    sender_id: Optional[str],
+    content: str,
+    metadata: Optional[dict] = None,
+    session_id: Optional[str] = None,
+    sender_type: str = "link",
+) -> Optional[dict]:
+    """Insert a Link message into link_messages."""
+    payload = {
+        "conversation_id": conversation_id,
+        "sender_type": sender_type,
+        "sender_id": sender_id,
+        "content": content,
+        "metadata": metadata or {},
+    }
+    if session_id:
+        payload["session_id"] = session_id
+    return _first(await table("link_messages").insert(payload).execute())
+
+
+async def list_recent_link_messages(conversation_id: str, sender_type: Optional[str] = None, limit: int = 5) -> list[dict]:
+    """Fetch recent Link messages for dedup/style hints."""
+    query = table("link_messages").select("*").eq("conversation_id", conversation_id)
+    if sender_type:
+        query = query.eq("sender_type", sender_type)
+    return (await query.order("created_at", desc=True).limit(limit).execute()).data
+
+
+async def list_link_messages(conversation_id: str, limit: int = 20) -> list[dict]:
+    """Fetch recent link_messages in chronological order."""
+    rows = (
+        await table("link_messages")
+        .select("sender_type, content, created_at")
+        .eq("conversation_id", conversation_id)
+        .order("created_at", desc=True)
+        .limit(limit)
+        .execute()
+    ).data
+    return list(reversed(rows or []))
+
+
+async def set_link_conversation_session(conversation_id: str, session_id: str) -> None:
+    """Attach a Link session to a conversation."""
+    await table("link_conversations").update({
+        "session_id": session_id,
+        "updated_at": _now_iso(),
+    }).eq("id", conversation_id).execute()
+
+
+# ============ Link Outreach (Runs) ============
+
+async def update_link_outreach_run(run_id: str, payload: dict) -> Optional[dict]:
+    """Update a link outreach run."""
+    return _first(await table("link_outreach_runs").update(payload).eq("id", run_id).execute())
+
+
+async def get_latest_active_outreach_run(requester_user_id: str) -> Optional[dict]:
+    """Fetch the most recent active outreach run for a requester."""
+    return _first(
+        await table("link_outreach_runs")
+        .select("*")
+        .eq("requester_user_id", requester_user_id)
+        .in_("status", ["collecting", "forum_posted", "awaiting_consent"])
+        .order("created_at", desc=True)
+        .limit(1)
+        .execute()
+    )
+
+
+# ============ Link Facts Functions ============
+
+async def get_facts_count() -> int:
+    """Get total count of link_facts."""
+    return await _count(table("link_facts").select("id", count="exact"))
+
+
+async def create_link_fact(fact: dict) -> dict:
+    """Create a new link fact."""
+    return (await table("link_facts").insert(fact).execute()).data[0]
+
+
+# ============ User Memory Functions ============
+
+async def get_user_memory(user_id: str) -> Optional[dict]:
+    """Fetch user memory/style profile."""
+    return _first(await table("link_user_memory").select("*").eq("user_id", user_id).execute())
+
+
+async def upsert_user_memory(user_id: str, data: dict) -> dict:
+    """Create or update user memory."""
+    data["user_id"] = user_id
+    if not data.get("university_id"):
+        existing = await get_user_memory(user_id) or {}
+        data["university_id"] = existing.get("university_id")
+        if not data.get("university_id"):
+            profile = await get_profile(user_id, enforce_public=False) or {}
+            data["university_id"] = profile.get("university_id")
+    try:
+        return (await table("link_user_memory").upsert(data, on_conflict="user_id").execute()).data[0]
+    except Exception:
+        # If schema cache lags (missing new columns), retry without them.
+        if "conversation_state" not in data:
+            raise
+        data = {k: v for k, v in data.items() if k != "conversation_state"}
+        return (await table("link_user_memory").upsert(data, on_conflict="user_id").execute()).data[0]
+
+
+# ============ Link Conversation State ============
+
+async def get_link_conversation_state(user_id: str, conversation_id: str) -> Optional[dict]:
+    """Fetch conversation state for a user + link conversation."""
+    return _first(
+        await table("link_conversation_state")
+        .select("*")
+        .eq("user_id", user_id)
+        .eq("conversation_id", conversation_id)
+        .execute()
+    )
+
+
+async def create_link_conversation_state(user_id: str, conversation_id: str) -> dict:
+    """Create a fresh conversation state row."""
+    payload = {
+        "user_id": user_id,
+        "conversation_id": conversation_id,
+        "mode": "idle",
+        "active_task": None,
+        "pending_consents": [],
+        "resolved_tasks": [],
+    }
+    return (await table("link_conversation_state").insert(payload).execute()).data[0]
+
+
+async def get_or_create_link_conversation_state(user_id: str, conversation_id: str) -> dict:
+    """Fetch existing conversation state or create one."""
+    existing = await get_link_conversation_state(user_id, conversation_id)
+    if existing:
+        return existing
+    return await create_link_conversation_state(user_id, conversation_id)
+
+
+async def update_link_conversation_state(state_id: str, data: dict) -> dict:
+    """Update conversation state by ID."""
+    return (await table("link_conversation_state").update(data).eq("id", state_id).execute()).data[0]
+
+
+# ============ Journal Functions ============
+
+async def get_journal_entries(user_id: str, limit: int = 10) -> list[dict]:
+    """Get journal entries for a user."""
+    return (
+        await table("link_journal_entries")
+        .select("*")
+        .eq("user_id", user_id)
+        .order("created_at", desc=True)
+        .limit(limit)
+        .execute()
+    ).data
+
+
+# ============ Outreach Functions ============
+
+async def get_outreach_request(request_id: str) -> Optional[dict]:
+    """Fetch an outreach request by ID."""
+    return _first(await table("link_outreach_requests").select("*").eq("id", request_id).execute())
+
+
+async def update_outreach_request(request_id: str, data: dict) -> dict:
+    """Update an outreach request."""
+    return (await table("link_outreach_requests").update(data).eq("id", request_id).execute()).data[0]
+
+
+async def list_outreach_messages(request_id: str, target_user_id: Optional[str] = None) -> list[dict]:
+    """List outreach messages for a request."""
+    query = table("link_outreach_messages").select("*").eq("outreach_request_id", request_id)
+    if target_user_id:
+        query = query.eq("target_user_id", target_user_id)
+    return (await query.order("created_at").execute()).data
+
+
+async def update_outreach_message(message_id: str, data: dict) -> dict:
+    """Update an outreach message record."""
+    return (await table("link_outreach_messages").update(data).eq("id", message_id).execute()).data[0]
+
+
+# ============ Connections and Messaging ============
+
+async def create_connection(connection: dict) -> dict:
+    """Create a connection record."""
+    return (await table("link_connections").insert(connection).execute()).data[0]
+
+
+async def create_conversation(payload: dict) -> dict:
+    """Create a conversation row."""
+    return (await table("conversations").insert(payload).execute()).data[0]
+
+
+async def add_conversation_participants(conversation_id: str, user_ids: list[str]) -> list[dict]:
+    """Add participants to a conversation."""
+    rows = [{"conversation_id": conversation_id, "user_id": uid} for uid in user_ids]
+    return (await table("conversation_participants").insert(rows).execute()).data
+
+
+async def insert_message(conversation_id: str, sender_id: str, content: str, metadata: Optional[dict] = None) -> dict:
+    """Insert a message into a conversation."""
+    payload = {
+        "conversation_id": conversation_id,
+        "sender_id": sender_id,
+        "content": content,
+        "metadata": metadata or {},
+    }
+    return (await table("messages").insert(payload).execute()).data[0]
+
+
+# ============ Request Context ============
+
+@dataclass(frozen=True)
+class RequestContext:
+    """What a chat turn reads before calling the LLM; see load_request_context()."""
+
+    conversation: Optional[dict]
+    session: Optional[dict]
+    user_context: dict
+    memory: Optional[dict]
+    conversation_state: Optional[dict]
+    active_run: Optional[dict]
+
+
+async def _resolve_session(user_id: str, session_id: Optional[str], university_id: Optional[str]) -> Optional[dict]:
+    session = await get_link_session_for_user(session_id, user_id) if session_id else None
+    return session or await get_or_create_link_session(user_id, university_id)
+
+
+async def load_request_context(
+    user_id: str,
+    university_id: Optional[str] = None,
+    session_id: Optional[str] = None,
+    access_token: Optional[str] = None,
+) -> RequestContext:
+    """Load everything a chat turn needs up front, independent reads concurrently.
+
+    Gets or creates the Link conversation, session and conversation state,
+    attaches the session, and reads the user's profile/classes/clubs (under
+    RLS when there is a token), memory and latest active outreach run.
+    """
+    conversation, session, user_context, memory, active_run = await asyncio.gather(
+        get_or_create_link_conversation(user_id),
+        _resolve_session(user_id, session_id, university_id),
+        get_user_context_rls(access_token, user_id) if access_token else get_user_context(user_id),
+        get_user_memory(user_id),
+        get_latest_active_outreach_run(user_id),
+    )
+    conversation_state = None
+    if conversation:
+        pending = [get_or_create_link_conversation_state(user_id, conversation["id"])]
+        if session:
+            pending.append(set_link_conversation_session(conversation["id"], session["id"]))
+        conversation_state = (await asyncio.gather(*pending))[0]
+    return RequestContext(
+        conversation=conversation,
+        session=session,
+        user_context=user_context,
+        memory=memory,
+        conversation_state=conversation_state,
+        active_run=active_run,
+    )
@@ -1,12 +1,37 @@
 """Supabase client and data access functions for Link AI."""
 
-from typing import Optional
+import base64
+import json
+import threading
+import time
+from typing import Any, Callable, Iterator, Optional
 from datetime import datetime, timezone, timedelta
+
+import httpx
 from supabase import create_client, Client, ClientOptions
 from config import settings
+from ttl_cache import TTLCache
 
 _client: Optional[Client] = None
-_rls_clients: dict[str, Client] = {}
+# Per-user RLS clients, keyed by access token and expiring with it. They share
+# one connection pool (_rls_transport), so evicting a client just drops it.
+_rls_clients = TTLCache(maxsize=settings.RLS_CLIENT_CACHE_SIZE)
+_rls_transport: Optional[httpx.HTTPTransport] = None
+_rls_shared_pool = True
+_rls_lock = threading.Lock()
+# Near-static per-university lookups (Link system profile, counts), keyed by
+# (kind, university_id); shared with supabase_async
+university_cache = TTLCache(maxsize=settings.UNIVERSITY_CACHE_SIZE, ttl=settings.UNIVERSITY_CACHE_TTL_SECONDS)
+# Per-user profile/classes/clubs bundles, keyed by (user_id, token subject) so
+# RLS and service-role views never mix; shared with supabase_async
+user_context_cache = TTLCache(
+    maxsize=settings.USER_CONTEXT_CACHE_SIZE,
+    ttl=settings.USER_CONTEXT_TTL_SECONDS,
+    max_bytes=settings.USER_CONTEXT_CACHE_MB * 1024 * 1024,
+    sizeof=lambda bundle: len(json.dumps(bundle, default=str)),
+)
+# Direct conversation per canonical user pair; a pair's DM never changes
+dm_conversation_cache = TTLCache(maxsize=settings.DM_CONVERSATION_CACHE_SIZE, ttl=settings.DM_CONVERSATION_CACHE_TTL_SECONDS)
 
 
 def get_supabase_client() -> Client:
@@ -19,37 +44,158 @@ def get_supabase_client() -> Client:
     return _client
 
 
+def token_claims(access_token: str) -> dict:
+    """Decode a JWT's claims without verifying it (PostgREST does that).
+
+    Only for cache bookkeeping (expiry, subject); returns {} if malformed.
+    """
+    try:
+        payload = access_token.split(".")[1]
+        claims = json.loads(base64.urlsafe_b64decode(payload + "=" * (-len(payload) % 4)))
+        return claims if isinstance(claims, dict) else {}
+    except (IndexError, ValueError):
+        return {}
+
+
+def _token_ttl(access_token: str) -> float:
+    exp = token_claims(access_token).get("exp")
+    if not isinstance(exp, (int, float)):
+        return settings.RLS_CLIENT_TTL_SECONDS
+    return min(settings.RLS_CLIENT_TTL_SECONDS, exp - time.time())
+
+
+def _create_rls_client(access_token: str) -> Client:
+    global _rls_transport, _rls_shared_pool
+    headers = {"Authorization": f"Bearer {access_token}"}
+    if _rls_shared_pool:
+        with _rls_lock:
+            if _rls_transport is None:
+                _rls_transport = httpx.HTTPTransport(limits=httpx.Limits(
+                    max_connections=settings.DB_MAX_CONNECTIONS,
+                    max_keepalive_connections=settings.DB_MAX_KEEPALIVE_CONNECTIONS,
+                    keepalive_expiry=settings.DB_KEEPALIVE_SECONDS,
+                ))
+        # A client per user (it carries the user's headers) over the shared pool
+        http_client = httpx.Client(transport=_rls_transport, timeout=settings.DB_TIMEOUT_SECONDS)
+        try:
+            options = ClientOptions(headers=headers, httpx_client=http_client)
+            return create_client(settings.SUPABASE_URL, settings.SUPABASE_ANON_KEY, options=options)
+        except TypeError:
+            _rls_shared_pool = False
+            print("Warning: supabase-py does not accept httpx_client; RLS clients use their own connections")
+    options = ClientOptions(headers=headers)
+    return create_client(settings.SUPABASE_URL, settings.SUPABASE_ANON_KEY, options=options)
+
+
 def get_supabase_client_for_user(access_token: str) -> Client:
-    """Create a Supabase client that enforces RLS for a user."""
+    """Get a Supabase client that enforces RLS for a user.
+
+    Clients are cached until the token's `exp` (at most
+    LINK_RLS_CLIENT_TTL_SECONDS), least recently used first out once
+    LINK_RLS_CLIENT_CACHE_SIZE tokens are cached.
+    """
     if not access_token:
         return get_supabase_client()
     cached = _rls_clients.get(access_token)
-    if cached:
+    if cached is not None:
         return cached
     if not settings.SUPABASE_URL or not settings.SUPABASE_ANON_KEY:
         raise RuntimeError("SUPABASE_URL and SUPABASE_ANON_KEY must be set for RLS client")
-    options = ClientOptions(headers={"Authorization": f"Bearer {access_token}"})
-    client = create_client(settings.SUPABASE_URL, settings.SUPABASE_ANON_KEY, options=options)
-    _rls_clients[access_token] = client
+    client = _create_rls_client(access_token)
+    ttl = _token_ttl(access_token)
+    if ttl > 0:
+        _rls_clients.set(access_token, client, ttl=ttl)
     return client
 
 
+def invalidate_university(university_id: Optional[str] = None) -> int:
+    """Drop cached per-university lookups (all universities if None); returns entries dropped."""
+    if university_id is None:
+        dropped = len(university_cache)
+        university_cache.clear()
+        return dropped
+    keys = [key for key in university_cache.keys() if key[1] == university_id]
+    for key in keys:
+        university_cache.pop(key)
+    return len(keys)
+
+
+def user_context_key(user_id: str, access_token: Optional[str] = None) -> Optional[tuple]:
+    """Cache key for a user's context bundle, None if it shouldn't be cached.
+
+    Service-role reads key on (user_id, None); RLS reads on the token's
+    subject, and tokens without one aren't cached.
+    """
+    if not access_token:
+        return (user_id, None)
+    subject = token_claims(access_token).get("sub")
+    return (user_id, subject) if subject else None
+
+
+def user_context_ttl(access_token: Optional[str] = None) -> float:
+    """How long a bundle may be cached; RLS bundles never outlive their token."""
+    if not access_token:
+        return settings.USER_CONTEXT_TTL_SECONDS
+    return min(settings.USER_CONTEXT_TTL_SECONDS, _token_ttl(access_token))
+
+
+def invalidate_user_context(user_id: str) -> int:
+    """Drop every cached context bundle for a user (after a profile write)."""
+    keys = [key for key in user_context_cache.keys() if key[0] == user_id]
+    for key in keys:
+        user_context_cache.pop(key)
+    return len(keys)
+
+
+def rls_client_stats() -> dict:
+    """Size/hit/eviction counters for the per-user client cache."""
+    return {**_rls_clients.stats(), "shared_pool": _rls_shared_pool}
+
+
+def _iter_keyset(build_query: Callable[[], Any], page_size: Optional[int] = None, key: str = "id") -> Iterator[dict]:
+    """Yield every row of `build_query()`, one page at a time, ordered by `key`.
+
+    Each page asks for rows past the last key seen, so deep pages cost the same
+    as the first (unlike offset paging). Stops on an empty page rather than a
+    short one, in case PostgREST's max-rows caps pages below page_size.
+    """
+    page_size = max(1, page_size or settings.INDEX_PAGE_SIZE)
+    last = None
+    while True:
+        query = build_query()
+        if last is not None:
+            query = query.gt(key, last)
+        rows = query.order(key).limit(page_size).execute().data or []
+        if not rows:
+            return
+        yield from rows
+        last = rows[-1][key]
+
+
 # ============ Profile Functions ============
 
-def get_profiles(university_id: Optional[str] = None, limit: int = 500) -> list[dict]:
-    """Fetch profiles, optionally filtered by university."""
+def _visible_profiles_query(university_id: Optional[str] = None):
     client = get_supabase_client()
     query = client.table("profiles").select("*")
     if university_id:
         query = query.eq("university_id", university_id)
     # Only include visible, non-Link profiles
-    query = (
+    return (
         query
         .neq("is_link", True)
         .in_("friends_visibility", ["school", "public"])
         .eq("yearbook_visible", True)
     )
-    return query.limit(limit).execute().data
+
+
+def get_profiles(university_id: Optional[str] = None, limit: int = 500) -> list[dict]:
+    """Fetch profiles, optionally filtered by university."""
+    return _visible_profiles_query(university_id).limit(limit).execute().data
+
+
+def iter_profiles(university_id: Optional[str] = None, page_size: Optional[int] = None) -> Iterator[dict]:
+    """Stream every visible profile (keyset-paginated, no row cap)."""
+    return _iter_keyset(lambda: _visible_profiles_query(university_id), page_size)
 
 
 def get_profiles_rls(access_token: str, university_id: Optional[str] = None, limit: int = 500) -> list[dict]:
@@ -61,17 +207,22 @@ def get_profiles_rls(access_token: str, university_id: Optional[str] = None, lim
     return query.limit(limit).execute().data
 
 
+def _public_profiles(query):
+    """Restrict a profiles query to students visible school-wide."""
+    return (
+        query
+        .neq("is_link", True)
+        .in_("friends_visibility", ["school", "public"])
+        .eq("yearbook_visible", True)
+    )
+
+
 def get_profile(user_id: str, enforce_public: bool = True) -> Optional[dict]:
     """Fetch a single profile by user ID."""
     client = get_supabase_client()
     query = client.table("profiles").select("*").eq("id", user_id)
     if enforce_public:
-        query = (
-            query
-            .neq("is_link", True)
-            .in_("friends_visibility", ["school", "public"])
-            .eq("yearbook_visible", True)
-        )
+        query = _public_profiles(query)
     result = query.execute()
     return result.data[0] if result.data else None
 
@@ -83,8 +234,20 @@ def get_profile_rls(access_token: str, user_id: str) -> Optional[dict]:
     return result.data if result.data else None
 
 
+def _cached_user_context(user_id: str, access_token: Optional[str], loader: Callable[[], dict]) -> dict:
+    key = user_context_key(user_id, access_token)
+    ttl = user_context_ttl(access_token)
+    if key is None or ttl <= 0:
+        return loader()
+    return user_context_cache.get_or_load(key, loader, ttl=ttl)
+
+
 def get_user_context_rls(access_token: str, user_id: str) -> dict:
-    """Fetch user profile + classes + clubs with RLS (best effort)."""
+    """Fetch user profile + classes + clubs with RLS (best effort, cached per token subject)."""
+    return _cached_user_context(user_id, access_token, lambda: _load_user_context_rls(access_token, user_id))
+
+
+def _load_user_context_rls(access_token: str, user_id: str) -> dict:
     client = get_supabase_client_for_user(access_token)
     profile = (
         client.table("profiles")
@@ -134,7 +297,11 @@ def get_user_context_rls(access_token: str, user_id: str) -> dict:
 
 
 def get_user_context(user_id: str) -> dict:
-    """Fetch user profile + classes + clubs with service role (best effort)."""
+    """Fetch user profile + classes + clubs with service role (best effort, cached)."""
+    return _cached_user_context(user_id, None, lambda: _load_user_context(user_id))
+
+
+def _load_user_context(user_id: str) -> dict:
     client = get_supabase_client()
     profile = (
         client.table("profiles")
@@ -183,7 +350,11 @@ def get_user_context(user_id: str) -> dict:
 
 
 def get_link_system_profile(university_id: str) -> Optional[dict]:
-    """Fetch Link system profile for a university."""
+    """Fetch Link system profile for a university (cached, see university_cache)."""
+    return university_cache.get_or_load(("link_system_profile", university_id), lambda: _load_link_system_profile(university_id))
+
+
+def _load_link_system_profile(university_id: str) -> Optional[dict]:
     client = get_supabase_client()
     result = (
         client.table("link_system_profile")
@@ -199,13 +370,22 @@ def get_link_system_profile(university_id: str) -> Optional[dict]:
 
 # ============ Organization Functions ============
 
-def get_organizations(university_id: Optional[str] = None, limit: int = 200) -> list[dict]:
-    """Fetch organizations, optionally filtered by university."""
+def _public_organizations_query(university_id: Optional[str] = None):
     client = get_supabase_client()
     query = client.table("organizations").select("*").eq("is_public", True)
     if university_id:
         query = query.eq("university_id", university_id)
-    return query.limit(limit).execute().data
+    return query
+
+
+def get_organizations(university_id: Optional[str] = None, limit: int = 200) -> list[dict]:
+    """Fetch organizations, optionally filtered by university."""
+    return _public_organizations_query(university_id).limit(limit).execute().data
+
+
+def iter_organizations(university_id: Optional[str] = None, page_size: Optional[int] = None) -> Iterator[dict]:
+    """Stream every public organization (keyset-paginated, no row cap)."""
+    return _iter_keyset(lambda: _public_organizations_query(university_id), page_size)
 
 
 def get_organizations_rls(access_token: str, university_id: Optional[str] = None, limit: int = 200) -> list[dict]:
@@ -217,28 +397,32 @@ def get_organizations_rls(access_token: str, university_id: Optional[str] = None
     return query.limit(limit).execute().data
 
 
+def _count_rows(table: str, university_id: Optional[str] = None, exclude_link: bool = False) -> int:
+    client = get_supabase_client()
+    query = client.table(table).select("id", count="exact")
+    if exclude_link:
+        query = query.neq("is_link", True)
+    if university_id:
+        query = query.eq("university_id", university_id)
+    return query.execute().count or 0
+
+
 def get_organizations_count(university_id: Optional[str] = None) -> int:
-    """Get total count of organizations."""
+    """Get total count of organizations (cached per university)."""
     try:
-        client = get_supabase_client()
-        query = client.table("organizations").select("id", count="exact")
-        if university_id:
-            query = query.eq("university_id", university_id)
-        result = query.execute()
-        return result.count or 0
+        return university_cache.get_or_load(
+            ("organizations_count", university_id), lambda: _count_rows("organizations", university_id)
+        )
     except Exception:
         return 0
 
 
 def get_profiles_count(university_id: Optional[str] = None) -> int:
-    """Get count of profiles (non-Link)."""
+    """Get count of profiles (non-Link, cached per university)."""
     try:
-        client = get_supabase_client()
-        query = client.table("profiles").select("id", count="exact").neq("is_link", True)
-        if university_id:
-            query = query.eq("university_id", university_id)
-        result = query.execute()
-        return result.count or 0
+        return university_cache.get_or_load(
+            ("profiles_count", university_id), lambda: _count_rows("profiles", university_id, exclude_link=True)
+        )
     except Exception:
         return 0
 
@@ -271,10 +455,17 @@ def get_organization(org_id: str) -> Optional[dict]:
     return result.data[0] if result.data else None
 
 
+def get_organizations_by_ids(org_ids: list[str]) -> list[dict]:
+    """Fetch public organizations by a list of IDs (one query)."""
+    if not org_ids:
+        return []
+    client = get_supabase_client()
+    return client.table("organizations").select("*").in_("id", org_ids).eq("is_public", True).execute().data
+
+
 # ============ Event Functions ============
 
-def get_upcoming_events(university_id: Optional[str] = None, limit: int = 100) -> list[dict]:
-    """Fetch upcoming events."""
+def _upcoming_events_query(university_id: Optional[str] = None):
     client = get_supabase_client()
     query = (
         client.table("events")
@@ -284,7 +475,17 @@ def get_upcoming_events(university_id: Optional[str] = None, limit: int = 100) -
     )
     if university_id:
         query = query.eq("university_id", university_id)
-    return query.order("start_at").limit(limit).execute().data
+    return query
+
+
+def get_upcoming_events(university_id: Optional[str] = None, limit: int = 100) -> list[dict]:
+    """Fetch upcoming events."""
+    return _upcoming_events_query(university_id).order("start_at").limit(limit).execute().data
+
+
+def iter_upcoming_events(university_id: Optional[str] = None, page_size: Optional[int] = None) -> Iterator[dict]:
+    """Stream every upcoming event (keyset-paginated by id, no row cap)."""
+    return _iter_keyset(lambda: _upcoming_events_query(university_id), page_size)
 
 
 def get_upcoming_events_rls(access_token: str, university_id: Optional[str] = None, limit: int = 100) -> list[dict]:
@@ -326,14 +527,9 @@ def list_forum_comments_rls(
 
 
 def get_events_count(university_id: Optional[str] = None) -> int:
-    """Get total count of events."""
+    """Get total count of events (cached per university)."""
     try:
-        client = get_supabase_client()
-        query = client.table("events").select("id", count="exact")
-        if university_id:
-            query = query.eq("university_id", university_id)
-        result = query.execute()
-        return result.count or 0
+        return university_cache.get_or_load(("events_count", university_id), lambda: _count_rows("events", university_id))
     except Exception:
         return 0
 
@@ -351,10 +547,24 @@ def get_event(event_id: str) -> Optional[dict]:
     return result.data[0] if result.data else None
 
 
+def get_events_by_ids(event_ids: list[str]) -> list[dict]:
+    """Fetch broadly visible events by a list of IDs (one query)."""
+    if not event_ids:
+        return []
+    client = get_supabase_client()
+    return (
+        client.table("events")
+        .select("*")
+        .in_("id", event_ids)
+        .in_("visibility", ["public", "school"])
+        .execute()
+        .data
+    )
+
+
 # ============ Post Functions ============
 
-def get_posts(university_id: Optional[str] = None, limit: int = 200) -> list[dict]:
-    """Fetch posts from public forums."""
+def _public_posts_query(university_id: Optional[str] = None):
     client = get_supabase_client()
     query = (
         client.table("posts")
@@ -364,7 +574,17 @@ def get_posts(university_id: Optional[str] = None, limit: int = 200) -> list[dic
     )
     if university_id:
         query = query.eq("forums.university_id", university_id)
-    return query.order("created_at", desc=True).limit(limit).execute().data
+    return query
+
+
+def get_posts(university_id: Optional[str] = None, limit: int = 200) -> list[dict]:
+    """Fetch posts from public forums."""
+    return _public_posts_query(university_id).order("created_at", desc=True).limit(limit).execute().data
+
+
+def iter_posts(university_id: Optional[str] = None, page_size: Optional[int] = None) -> Iterator[dict]:
+    """Stream every post in a public forum (keyset-paginated, no row cap)."""
+    return _iter_keyset(lambda: _public_posts_query(university_id), page_size)
 
 
 def get_post(post_id: str) -> Optional[dict]:
@@ -465,6 +685,31 @@ def insert_link_message(
     return result.data[0] if result.data else None
 
 
+def insert_link_messages_bulk(rows: list[dict]) -> list[dict]:
+    """Insert Link messages in one request, in list order.
+
+    Each row has conversation_id, sender_id, content and optionally metadata,
+    session_id and sender_type (default "link"). link_insert_link_messages
+    (database/011_link_ordered_inserts.sql) stamps created_at 1 ms apart on
+    the database clock. Returns the inserted rows in the same order.
+    """
+    if not rows:
+        return []
+    payload = [
+        {
+            "conversation_id": row["conversation_id"],
+            "session_id": row.get("session_id"),
+            "sender_type": row.get("sender_type") or "link",
+            "sender_id": row.get("sender_id"),
+            "content": row["content"],
+            "metadata": row.get("metadata") or {},
+        }
+        for row in rows
+    ]
+    client = get_supabase_client()
+    return client.rpc("link_insert_link_messages", {"p_rows": payload}).execute().data or []
+
+
 def list_recent_link_messages(conversation_id: str, sender_type: Optional[str] = None, limit: int = 5) -> list[dict]:
     """Fetch recent Link messages for dedup/style hints."""
     client = get_supabase_client()
@@ -573,34 +818,18 @@ def list_link_outreach_targets(run_id: str) -> list[dict]:
 
 
 def list_recent_outreach_target_ids(requester_user_id: str, days: int = 7) -> list[str]:
-    """List target_user_id values contacted by requester in the last N days."""
+    """List target_user_id values contacted by requester in the last N days.
+
+    One round trip (link_recent_outreach_target_ids, database/007), ordered by
+    first contact.
+    """
     client = get_supabase_client()
     since = (datetime.now(timezone.utc) - timedelta(days=days)).isoformat()
-    runs = (
-        client.table("link_outreach_runs")
-        .select("id")
-        .eq("requester_user_id", requester_user_id)
-        .gt("created_at", since)
-        .execute()
-        .data
-    )
-    run_ids = [r.get("id") for r in runs if r.get("id")]
-    if not run_ids:
-        return []
-    target_ids: list[str] = []
-    for run_id in run_ids:
-        rows = (
-            client.table("link_outreach_targets")
-            .select("target_user_id")
-            .eq("run_id", run_id)
-            .execute()
-            .data
-        )
-        for row in rows:
-            tid = row.get("target_user_id")
-            if tid and tid not in target_ids:
-                target_ids.append(tid)
-    return target_ids
+    rows = client.rpc(
+        "link_recent_outreach_target_ids",
+        {"p_requester_user_id": requester_user_id, "p_since": since},
+    ).execute().data
+    return [row["target_user_id"] for row in rows or [] if row.get("target_user_id")]
 
 
 def update_link_outreach_target(target_id: str, payload: dict) -> Optional[dict]:
@@ -654,15 +883,78 @@ def update_link_relay_target(target_id: str, payload: dict) -> Optional[dict]:
 
 # ============ Link Facts Functions ============
 
-def get_link_facts(university_id: Optional[str] = None, consent_only: bool = True) -> list[dict]:
-    """Fetch Link facts, optionally filtered."""
+def _link_facts_query(university_id: Optional[str] = None, consent_only: bool = True):
     client = get_supabase_client()
     query = client.table("link_facts").select("*")
     if consent_only:
         query = query.eq("consent_status", "opt_in")
     if university_id:
         query = query.eq("university_id", university_id)
-    return query.execute().data
+    return query
+
+
+def get_link_facts(university_id: Optional[str] = None, consent_only: bool = True) -> list[dict]:
+    """Fetch Link facts, optionally filtered."""
+    return _link_facts_query(university_id, consent_only).execute().data
+
+
+def iter_link_facts(
+    university_id: Optional[str] = None, consent_only: bool = True, page_size: Optional[int] = None
+) -> Iterator[dict]:
+    """Stream Link facts (keyset-paginated, no row cap)."""
+    return _iter_keyset(lambda: _link_facts_query(university_id, consent_only), page_size)
+
+
+# ============ Index Change Feed ============
+
+# table -> (select, university column, change timestamp column). Visibility
+# filters are deliberately not applied: the index must also see rows that
+# stopped being indexable (hidden, made private, soft-deleted, consent revoked).
+CHANGE_FEEDS = {
+    "profiles": ("*", "university_id", "updated_at"),
+    "organizations": ("*", "university_id", "updated_at"),
+    "events": ("*", "university_id", "updated_at"),
+    "link_facts": ("*", "university_id", "updated_at"),
+    "posts": ("*, forums!inner(id, name, is_public, university_id)", "forums.university_id", "updated_at"),
+    # Hard deletes, recorded by the triggers in database/006_index_change_feed.sql
+    "link_index_deletions": ("*", "university_id", "deleted_at"),
+}
+
+
+def iter_changed_rows(
+    table: str,
+    since: Optional[str],
+    university_id: Optional[str] = None,
+    page_size: Optional[int] = None,
+    all_universities: bool = False,
+) -> Iterator[dict]:
+    """Stream rows of `table` changed at or after `since`, oldest first.
+
+    Keyset-paginated on (timestamp, id), so rows sharing a timestamp aren't
+    lost at page boundaries. A university_id of None selects rows without a
+    university (the global index shard); all_universities skips the filter.
+    """
+    select, university_column, ts_column = CHANGE_FEEDS[table]
+    page_size = max(1, page_size or settings.INDEX_PAGE_SIZE)
+    client = get_supabase_client()
+    last = None
+    while True:
+        query = client.table(table).select(select)
+        if not all_universities:
+            if university_id:
+                query = query.eq(university_column, university_id)
+            else:
+                query = query.is_(university_column, "null")
+        if since:
+            query = query.gte(ts_column, since)
+        if last is not None:
+            ts, row_id = last
+            query = query.or_(f'{ts_column}.gt."{ts}",and({ts_column}.eq."{ts}",id.gt.{row_id})')
+        rows = query.order(ts_column).order("id").limit(page_size).execute().data or []
+        if not rows:
+            return
+        yield from rows
+        last = (rows[-1][ts_column], rows[-1]["id"])
 
 
 def get_link_facts_by_value(university_id: str, fact_value: str) -> list[dict]:
@@ -704,27 +996,14 @@ def create_verified_fact(fact: dict) -> dict:
 
 
 def get_verified_facts(university_id: str, tags: list[str], limit: int = 10) -> list[dict]:
-    """Fetch verified facts that match any tag in fact_value."""
-    client = get_supabase_client()
-    query = client.table("link_verified_facts").select("*").eq("university_id", university_id)
-    query = query.eq("consent_status", "opt_in")
-    if tags:
-        # Supabase doesn't support OR ilike easily; run sequentially and merge.
-        results: list[dict] = []
-        seen: set[str] = set()
-        for tag in tags:
-            if not tag:
-                continue
-            resp = query.ilike("fact_value", f"%{tag}%").limit(limit).execute().data
-            for row in resp:
-                row_id = row.get("id")
-                if row_id and row_id not in seen:
-                    results.append(row)
-                    seen.add(row_id)
-            if len(results) >= limit:
-                break
-        return results[:limit]
-    return query.limit(limit).execute().data
+    """Fetch unexpired opt-in verified facts whose fact_value contains any tag.
+
+    One indexed round trip however many tags (link_match_verified_facts,
+    database/008); newest first.
+    """
+    client = get_supabase_client()
+    params = {"p_university_id": university_id, "p_tags": [tag for tag in tags or [] if tag], "p_limit": limit}
+    return client.rpc("link_match_verified_facts", params).execute().data or []
 
 
 def delete_expired_verified_facts(now_iso: str) -> int:
@@ -896,12 +1175,15 @@ def get_profile_by_username(username: str) -> Optional[dict]:
     return result.data if result.data else None
 
 
-def get_profiles_by_ids(user_ids: list[str]) -> list[dict]:
+def get_profiles_by_ids(user_ids: list[str], enforce_public: bool = False) -> list[dict]:
     """Fetch profiles by a list of user IDs."""
     if not user_ids:
         return []
     client = get_supabase_client()
-    return client.table("profiles").select("*").in_("id", user_ids).execute().data
+    query = client.table("profiles").select("*").in_("id", user_ids)
+    if enforce_public:
+        query = _public_profiles(query)
+    return query.execute().data
 
 
 def create_conversation(payload: dict) -> dict:
@@ -929,6 +1211,29 @@ def insert_message(conversation_id: str, sender_id: str, content: str, metadata:
     return client.table("messages").insert(payload).execute().data[0]
 
 
+def insert_messages_bulk(rows: list[dict]) -> list[dict]:
+    """Insert conversation messages in one request, in list order.
+
+    Each row has conversation_id, sender_id, content and optionally metadata.
+    link_insert_messages (database/011_link_ordered_inserts.sql) stamps
+    created_at 1 ms apart on the database clock. Returns the inserted rows in
+    the same order.
+    """
+    if not rows:
+        return []
+    payload = [
+        {
+            "conversation_id": row["conversation_id"],
+            "sender_id": row["sender_id"],
+            "content": row["content"],
+            "metadata": row.get("metadata") or {},
+        }
+        for row in rows
+    ]
+    client = get_supabase_client()
+    return client.rpc("link_insert_messages", {"p_rows": payload}).execute().data or []
+
+
 def list_messages_for_conversation(
     conversation_id: str,
     after: Optional[str] = None,
@@ -945,64 +1250,32 @@ def list_messages_for_conversation(
     return query.order("created_at", desc=False).limit(limit).execute().data
 
 
-def get_or_create_dm_conversation(user_id: str, other_user_id: str) -> Optional[dict]:
-    """Find or create a direct conversation between two users."""
-    client = get_supabase_client()
-    convo_ids = client.table("conversation_participants").select("conversation_id").eq("user_id", user_id).execute().data
-    convo_ids = [row["conversation_id"] for row in convo_ids]
+def dm_pair_key(user_id: str, other_user_id: str) -> tuple[str, str]:
+    """Order-independent key for a pair of users."""
+    return (user_id, other_user_id) if user_id <= other_user_id else (other_user_id, user_id)
 
-    if convo_ids:
-        shared = (
-            client.table("conversation_participants")
-            .select("conversation_id")
-            .eq("user_id", other_user_id)
-            .in_("conversation_id", convo_ids)
-            .execute()
-            .data
-        )
-        shared_ids = [row["conversation_id"] for row in shared]
-        if shared_ids:
-            convo = (
-                client.table("conversations")
-                .select("*")
-                .in_("id", shared_ids)
-                .eq("type", "direct")
-                .order("created_at", desc=True)
-                .limit(1)
-                .execute()
-                .data
-            )
-            if convo:
-                return convo[0]
-
-    convo = create_conversation(
-        {
-            "type": "direct",
-            "created_by": user_id,
-            "is_system_generated": True,
-        }
-    )
-    add_conversation_participants(convo["id"], [user_id, other_user_id])
+
+def get_or_create_dm_conversation(user_id: str, other_user_id: str) -> Optional[dict]:
+    """Find or create a direct conversation between two users.
+
+    One round trip via link_get_or_create_dm (database/009), which creates the
+    conversation atomically; pairs already seen are served from memory.
+    """
+    def load() -> Optional[dict]:
+        rows = get_supabase_client().rpc(
+            "link_get_or_create_dm", {"p_user_id": user_id, "p_other_user_id": other_user_id}
+        ).execute().data
+        return rows[0] if rows else None
+
+    key = dm_pair_key(user_id, other_user_id)
+    convo = dm_conversation_cache.get_or_load(key, load)
+    if convo is None:
+        dm_conversation_cache.pop(key)
     return convo
 
 
 def get_classmates(user_id: str, semester: Optional[str] = None) -> list[str]:
-    """Get classmate IDs for a user."""
-    client = get_supabase_client()
-    # Get user's classes
-    query = client.table("user_class_enrollments").select("class_id").eq("user_id", user_id)
-    if semester:
-        query = query.eq("semester", semester)
-    user_classes = query.execute().data
-    class_ids = [c["class_id"] for c in user_classes]
-    
-    if not class_ids:
-        return []
-    
-    # Get other students in those classes
-    classmates = []
-    for class_id in class_ids:
-        result = client.table("user_class_enrollments").select("user_id").eq("class_id", class_id).execute()
-        classmates.extend([r["user_id"] for r in result.data if r["user_id"] != user_id])
-    
-    return list(set(classmates))
+    """Get classmate IDs for a user (one round trip via link_classmate_ids, database/007)."""
+    client = get_supabase_client()
+    rows = client.rpc("link_classmate_ids", {"p_user_id": user_id, "p_semester": semester}).execute().data
+    return [row["user_id"] for row in rows or [] if row.get("user_id")]
@@ -0,0 +1,21 @@
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+import index_store
+import rag_index
+
+
+def test_fast_path_skips_started_events():
+    """Exact-keyword (fast path) queries must not return events that have started."""
+    now = datetime.now(timezone.utc)
+    events = [
+        {"id": "started", "title": "CSCI 0150 review session", "start_at": (now - timedelta(hours=1)).isoformat()},
+        {"id": "upcoming", "title": "CSCI 0150 review session", "start_at": (now + timedelta(days=1)).isoformat()},
+    ]
+    nodes = [rag_index._node_record(rag_index.create_event_document(event)) for event in events]
+    shard = index_store.Shard("_test", np.eye(len(nodes), 8, dtype=np.float32), nodes)
+
+    hits = rag_index._keyword_fast_path("CSCI 0150", [shard], top_k=5) or []
+
+    assert [node["id"] for node, _ in hits] == ["upcoming"]
@@ -0,0 +1,212 @@
+"""Small thread-safe LRU cache with optional per-entry expiry."""
+
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+_MISSING = object()
+
+
+class TTLCache:
+    """Bounded LRU mapping; entries optionally expire `ttl` seconds after set().
+
+    With `max_bytes`, entries are also weighed with `sizeof(value)` and the
+    least recently used go once the total is over budget; a value larger than
+    the whole budget is not cached.
+
+    `on_evict(key, value)` is called (outside the lock) for entries dropped to
+    make room or because they expired, not for explicit pop()/clear().
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 128,
+        ttl: Optional[float] = None,
+        on_evict: Optional[Callable[[Hashable, Any], None]] = None,
+        clock: Callable[[], float] = time.monotonic,
+        max_bytes: Optional[int] = None,
+        sizeof: Optional[Callable[[Any], int]] = None,
+    ):
+        self.maxsize = max(1, int(maxsize))
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.bytes = 0
+        self.ttl = ttl
+        self.on_evict = on_evict
+        self._clock = clock
+        # key -> (value, expires_at, size)
+        self._data: OrderedDict[Hashable, tuple[Any, Optional[float], int]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.loads = 0
+        # Loads in progress, so concurrent misses on a key share one load
+        self._flights: dict[Hashable, "_Flight"] = {}
+        self._tasks: dict[Hashable, asyncio.Task] = {}
+        # Bumped by pop()/clear(); a load that started before isn't cached
+        self._epoch = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.get(key, _MISSING) is not _MISSING
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        evicted = []
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[1] is not None and entry[1] <= self._clock():
+                evicted.append((key, self._remove_locked(key)))
+                self.evictions += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                value = default
+            else:
+                self._data.move_to_end(key)
+                self.hits += 1
+                value = entry[0]
+        self._notify(evicted)
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = self._clock() + ttl if ttl is not None else None
+        size = self.sizeof(value) if self.max_bytes is not None and self.sizeof else 0
+        evicted = []
+        with self._lock:
+            self._remove_locked(key)
+            if self.max_bytes is not None and size > self.max_bytes:
+                return
+            self._data[key] = (value, expires_at, size)
+            self.bytes += size
+            while len(self._data) > self.maxsize or (self.max_bytes is not None and self.bytes > self.max_bytes):
+                oldest = next(iter(self._data))
+                evicted.append((oldest, self._remove_locked(oldest)))
+                self.evictions += 1
+        self._notify(evicted)
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any], ttl: Optional[float] = None) -> Any:
+        """Read-through get: on a miss call `loader()` and cache its result.
+
+        Threads that miss on a key while it is loading wait for that load
+        instead of starting their own. Exceptions are re-raised to every
+        waiter and nothing is cached.
+        """
+        value = self.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+        if not leader:
+            return flight.wait()
+        epoch = self._epoch
+        try:
+            flight.value = loader()
+            self.loads += 1
+            if epoch == self._epoch:
+                self.set(key, flight.value, ttl)
+            return flight.value
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.done.set()
+
+    async def aget_or_load(self, key: Hashable, loader: Callable[[], Any], ttl: Optional[float] = None) -> Any:
+        """Async get_or_load; `loader` is a coroutine function.
+
+        Coroutines missing on the same key await one shared load task.
+        """
+        value = self.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+        task = self._tasks.get(key)
+        if task is None:
+            task = self._tasks[key] = asyncio.ensure_future(self._aload(key, loader, ttl))
+        # A cancelled waiter must not cancel the load the others are waiting on
+        return await asyncio.shield(task)
+
+    async def _aload(self, key: Hashable, loader: Callable[[], Any], ttl: Optional[float]) -> Any:
+        epoch = self._epoch
+        try:
+            value = await loader()
+            self.loads += 1
+            if epoch == self._epoch:
+                self.set(key, value, ttl)
+            return value
+        finally:
+            self._tasks.pop(key, None)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            value = self._remove_locked(key, default)
+            self._epoch += 1
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self.bytes = 0
+            self._epoch += 1
+
+    def keys(self) -> list[Hashable]:
+        with self._lock:
+            return list(self._data.keys())
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "loads": self.loads,
+            **({"bytes": self.bytes, "max_bytes": self.max_bytes} if self.max_bytes is not None else {}),
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+        }
+
+    def _remove_locked(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._data.pop(key, None)
+        if entry is None:
+            return default
+        self.bytes -= entry[2]
+        return entry[0]
+
+    def _notify(self, evicted: list[tuple[Hashable, Any]]) -> None:
+        if not self.on_evict:
+            return
+        for key, value in evicted:
+            try:
+                self.on_evict(key, value)
+            except Exception as e:
+                print(f"Warning: cache eviction hook failed for {key}: {e}")
+
+
+class _Flight:
+    """One in-progress get_or_load()."""
+
+    __slots__ = ("done", "value", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value: Any = None
+        self.error: Optional[BaseException] = None
+
+    def wait(self) -> Any:
+        self.done.wait()
+        if self.error is not None:
+            raise self.error
+        return self.value